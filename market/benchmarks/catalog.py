@@ -0,0 +1,349 @@
+"""Seeded synthetic catalog generator for benchmarks.
+
+generate() creates a catalog of any number of ProductInventory rows with
+the shape of a real store: a four level category tree, products with one
+to five variants linked to a few leaf categories, two to five attribute
+values per item, one to four images and a stock row each. The same seed
+always produces the same catalog, apart from the tag that keeps sku, upc
+and name values unique across runs.
+
+Rows are inserted with bulk_create in batches of products, so memory
+stays flat from 10k to 1M items. Like CatalogLoader no signals are sent;
+the snapshots are invalidated on commit with bulk_loaded(), which is
+told not to build the read model and the category counts. Items get
+their product's name directly.
+"""
+import math
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from market.demo.loader import raw_timestamps
+from market.inventory.maintenance import bulk_loaded
+from market.inventory.models import (
+    Brand,
+    Category,
+    Media,
+    Product,
+    ProductAttribute,
+    ProductAttributeLists,
+    ProductAttributeValue,
+    ProductInventory,
+    ProductType,
+    Stock,
+)
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+# Children per category at each level below the roots
+CATEGORY_ROOTS = 6
+CATEGORY_BRANCHING = (6, 5, 4)
+PRODUCT_TYPES = 25
+# Attribute name -> number of distinct values
+ATTRIBUTES = {
+    "colour": 16,
+    "size": 12,
+    "material": 20,
+    "fit": 6,
+    "pattern": 30,
+    "season": 4,
+    "style": 25,
+    "origin": 40,
+}
+VARIANTS = (1, 5)
+CATEGORIES_PER_PRODUCT = (1, 3)
+ATTRIBUTES_PER_ITEM = (2, 5)
+MEDIA_PER_ITEM = (1, 4)
+PRICE_RANGE = (3.0, 2500.0)
+EPOCH = datetime(2022, 1, 1)
+DEFAULT_BATCH_SIZE = 2000
+
+
+def parse_size(value):
+    """An item count given as a number or as one of SIZES"""
+    try:
+        return SIZES[value.lower()]
+    except KeyError:
+        return int(value)
+
+
+class SyntheticCatalog:
+    """Ids of what generate() created, for picking benchmark inputs"""
+
+    def __init__(self, seed, tag):
+        self.seed = seed
+        self.tag = tag
+        self.counts = {}
+        self.elapsed = 0.0
+        self.category_ids = []
+        # Categories with children, and the leaves products are linked to
+        self.branch_category_ids = []
+        self.leaf_category_ids = []
+        self.attribute_value_ids = {}
+        self.product_ids = []
+        self.item_ids = []
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def count(self, model, rows):
+        label = model._meta.label
+        self.counts[label] = self.counts.get(label, 0) + rows
+
+
+class CatalogGenerator:
+    def __init__(
+        self,
+        items,
+        seed=0,
+        tag=None,
+        using=DEFAULT_DB_ALIAS,
+        batch_size=DEFAULT_BATCH_SIZE,
+    ):
+        self.items = items
+        self.rng = random.Random(seed)
+        self.using = using
+        self.batch_size = batch_size
+        self.catalog = SyntheticCatalog(seed, tag or uuid.uuid4().hex[:4])
+        self.sequence = 0
+
+    def insert(self, model, objs):
+        with raw_timestamps(model):
+            objs = model._base_manager.using(self.using).bulk_create(
+                objs, batch_size=self.batch_size
+            )
+        self.catalog.count(model, len(objs))
+        return objs
+
+    def name(self, kind, n):
+        return "%s %s %d" % (kind, self.catalog.tag, n)
+
+    def timestamp(self):
+        return EPOCH + timedelta(seconds=self.rng.randrange(3 * 365 * 86400))
+
+    def generate(self):
+        start = time.perf_counter()
+        with transaction.atomic(using=self.using):
+            self.create_categories()
+            brands = self.insert(
+                Brand,
+                [
+                    Brand(name=self.name("brand", n))
+                    for n in range(max(20, min(self.items // 100, 5000)))
+                ],
+            )
+            product_types = self.insert(
+                ProductType,
+                [
+                    ProductType(name=self.name("type", n))
+                    for n in range(PRODUCT_TYPES)
+                ],
+            )
+            self.create_attributes()
+            self.brand_ids = [brand.pk for brand in brands]
+            self.product_type_ids = [kind.pk for kind in product_types]
+
+            remaining = self.items
+            while remaining:
+                remaining -= self.create_products(remaining)
+
+            bulk_loaded(using=self.using, derived=False)
+        self.catalog.elapsed = time.perf_counter() - start
+        return self.catalog
+
+    def create_categories(self):
+        level = self.insert(
+            Category,
+            [
+                self.category(self.name("category", n), None, 0)
+                for n in range(CATEGORY_ROOTS)
+            ],
+        )
+        self.catalog.category_ids = [node.pk for node in level]
+        for depth, branching in enumerate(CATEGORY_BRANCHING, start=1):
+            level = self.insert(
+                Category,
+                [
+                    self.category("%s.%d" % (parent.name, n), parent.pk, depth)
+                    for parent in level
+                    for n in range(branching)
+                ],
+            )
+            self.catalog.category_ids.extend(node.pk for node in level)
+        self.catalog.leaf_category_ids = [node.pk for node in level]
+        self.catalog.branch_category_ids = self.catalog.category_ids[
+            : -len(level)
+        ]
+        Category._tree_manager.db_manager(self.using).rebuild()
+
+    def category(self, name, parent_id, level):
+        return Category(
+            name=name,
+            slug=name.replace(" ", "-").replace(".", "-"),
+            parent_id=parent_id,
+            # Placeholders, fixed by the rebuild
+            lft=0,
+            rght=0,
+            tree_id=0,
+            level=level,
+        )
+
+    def create_attributes(self):
+        attributes = self.insert(
+            ProductAttribute,
+            [
+                ProductAttribute(
+                    name=self.name(name, 0), description="synthetic %s" % name
+                )
+                for name in ATTRIBUTES
+            ],
+        )
+        values = self.insert(
+            ProductAttributeValue,
+            [
+                ProductAttributeValue(
+                    product_attribute_id=attribute.pk,
+                    attribute_value="%s-%d" % (name, n),
+                )
+                for attribute, (name, size) in zip(
+                    attributes, ATTRIBUTES.items()
+                )
+                for n in range(size)
+            ],
+        )
+        for value in values:
+            self.catalog.attribute_value_ids.setdefault(
+                value.product_attribute_id, []
+            ).append(value.pk)
+
+    def create_products(self, remaining):
+        """Create one batch of products with their items; returns the
+        number of items created"""
+        rng = self.rng
+        variants = []
+        while remaining > 0 and len(variants) < self.batch_size:
+            count = min(rng.randint(*VARIANTS), remaining)
+            variants.append(count)
+            remaining -= count
+
+        first = len(self.catalog.product_ids)
+        products = self.insert(
+            Product,
+            [
+                Product(
+                    web_id="syn-%s-%d" % (self.catalog.tag, first + n),
+                    slug="synthetic-product-%d" % (first + n),
+                    name=self.product_name(),
+                    description="Synthetic product %d" % (first + n),
+                    is_active=rng.random() > 0.05,
+                    created_at=self.timestamp(),
+                    updated_at=EPOCH,
+                )
+                for n in range(len(variants))
+            ],
+        )
+        self.catalog.product_ids.extend(product.pk for product in products)
+
+        through = Product.category.through
+        self.insert(
+            through,
+            [
+                through(product_id=product.pk, category_id=category_id)
+                for product in products
+                for category_id in rng.sample(
+                    self.catalog.leaf_category_ids,
+                    rng.randint(*CATEGORIES_PER_PRODUCT),
+                )
+            ],
+        )
+
+        items = self.insert(
+            ProductInventory,
+            [
+                self.item(product)
+                for product, count in zip(products, variants)
+                for _ in range(count)
+            ],
+        )
+        self.catalog.item_ids.extend(item.pk for item in items)
+        self.create_item_rows(items)
+        return len(items)
+
+    def product_name(self):
+        words = ("classic", "slim", "organic", "travel", "pro", "everyday")
+        kinds = ("shirt", "boot", "kettle", "lamp", "jacket", "backpack")
+        return "%s %s %s" % (
+            self.rng.choice(words),
+            self.rng.choice(words),
+            self.rng.choice(kinds),
+        )
+
+    def item(self, product):
+        rng = self.rng
+        self.sequence += 1
+        low, high = map(math.log, PRICE_RANGE)
+        sale = Decimal(math.exp(rng.uniform(low, high))).quantize(
+            Decimal("0.01")
+        )
+        retail = min(sale * Decimal("1.25"), Decimal("9999.99"))
+        return ProductInventory(
+            sku="syn-%s-%d" % (self.catalog.tag, self.sequence),
+            upc="%s%08d" % (self.catalog.tag, self.sequence),
+            product_type_id=rng.choice(self.product_type_ids),
+            product_id=product.pk,
+            product_name=product.name,
+            brand_id=rng.choice(self.brand_ids),
+            is_active=rng.random() > 0.1,
+            retail_price=retail.quantize(Decimal("0.01")),
+            store_price=sale,
+            sale_price=sale,
+            weight=round(rng.uniform(0.05, 30), 2),
+            created_at=product.created_at + timedelta(days=rng.randrange(60)),
+            updated_at=EPOCH,
+        )
+
+    def create_item_rows(self, items):
+        rng = self.rng
+        value_ids = self.catalog.attribute_value_ids
+        links, media, stock = [], [], []
+        for item in items:
+            for attribute_id in rng.sample(
+                sorted(value_ids), rng.randint(*ATTRIBUTES_PER_ITEM)
+            ):
+                links.append(
+                    ProductAttributeLists(
+                        attributevalues_id=rng.choice(value_ids[attribute_id]),
+                        productinventory_id=item.pk,
+                    )
+                )
+            media.extend(
+                Media(
+                    product_inventory_id=item.pk,
+                    image="images/synthetic-%d-%d.png" % (item.pk, n),
+                    alt_text="synthetic image",
+                    is_featured=n == 0,
+                    created_at=item.created_at,
+                    updated_at=EPOCH,
+                )
+                for n in range(rng.randint(*MEDIA_PER_ITEM))
+            )
+            stock.append(
+                Stock(
+                    product_inventory_id=item.pk,
+                    units=0 if rng.random() < 0.1 else rng.randint(1, 200),
+                    units_sold=rng.randint(0, 500),
+                )
+            )
+        self.insert(ProductAttributeLists, links)
+        self.insert(Media, media)
+        self.insert(Stock, stock)
+
+
+def generate(items, seed=0, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Generate a synthetic catalog of ``items`` ProductInventory rows"""
+    return CatalogGenerator(items, seed=seed, using=using, **kwargs).generate()
@@ -0,0 +1,59 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from market.benchmarks import query_plans
+
+
+class Command(BaseCommand):
+    help = (
+        "Explain and time the catalog's hot queries and report full table "
+        "scans, index usage and temporary sorts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "queries",
+            nargs="*",
+            help="Names of the queries to audit, all by default.",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "--fail-on-scan",
+            action="store_true",
+            help="Exit with an error if a query does a full table scan.",
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options["queries"]) - set(query_plans.HOT_QUERIES)
+        if unknown:
+            raise CommandError(
+                "Unknown queries: %s" % ", ".join(sorted(unknown))
+            )
+        plans = query_plans.audit(
+            options["queries"],
+            repeat=options["repeat"],
+            using=options["database"],
+        )
+        for plan in plans:
+            status = "ok" if plan.ok else "SCAN"
+            self.stdout.write(
+                "%-24s %-4s %8.2f ms %6d row(s)  index: %s%s%s"
+                % (
+                    plan.name,
+                    status,
+                    plan.median_ms,
+                    plan.rows,
+                    ", ".join(plan.indexes) or "-",
+                    "  scan: %s" % ", ".join(plan.full_scans)
+                    if plan.full_scans
+                    else "",
+                    "  temp sorts: %d" % plan.sorts if plan.sorts else "",
+                )
+            )
+            if options["verbosity"] > 1:
+                for line in plan.lines:
+                    self.stdout.write("    " + line)
+        failed = [plan.name for plan in plans if not plan.ok]
+        if failed and options["fail_on_scan"]:
+            raise CommandError("Full table scans in: %s" % ", ".join(failed))
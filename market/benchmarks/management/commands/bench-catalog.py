@@ -0,0 +1,98 @@
+import json
+
+from django.core.management import BaseCommand, CommandError
+
+from market.benchmarks import suite
+from market.benchmarks.catalog import parse_size
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic catalog, time the key catalog operations on "
+        "it and optionally compare the results with a baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "cases",
+            nargs="*",
+            help="Cases to run, all by default: %s" % ", ".join(suite.CASES),
+        )
+        parser.add_argument(
+            "--items",
+            type=parse_size,
+            default="10k",
+            help="ProductInventory rows: a number, 10k, 100k or 1m.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--repeat", type=int, default=suite.DEFAULT_REPEAT)
+        parser.add_argument("--output", help="Write the results to this file.")
+        parser.add_argument(
+            "--baseline", help="Results file of an earlier run to compare to."
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=suite.DEFAULT_TOLERANCE,
+            help="Allowed slowdown against the baseline, 0.25 is 25%%.",
+        )
+        parser.add_argument(
+            "--no-fixtures",
+            action="store_false",
+            dest="fixtures",
+            help="Skip timing the load of the demo fixtures.",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the generated catalog instead of rolling it back.",
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options["cases"]) - set(suite.CASES)
+        if unknown:
+            raise CommandError(
+                "Unknown cases: %s" % ", ".join(sorted(unknown))
+            )
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as stream:
+                baseline = json.load(stream)
+
+        report = suite.run(
+            options["items"],
+            seed=options["seed"],
+            repeat=options["repeat"],
+            cases=options["cases"],
+            keep=options["keep"],
+            fixtures=options["fixtures"],
+        )
+        for name, result in report["results"].items():
+            self.stdout.write(
+                "%-20s %10.2f ms median (%d run(s), %.2f-%.2f ms)"
+                % (
+                    name,
+                    result["median_ms"],
+                    result["runs"],
+                    result["min_ms"],
+                    result["max_ms"],
+                )
+            )
+        if options["output"]:
+            with open(options["output"], "w") as stream:
+                json.dump(report, stream, indent=2)
+
+        if baseline:
+            try:
+                slower = suite.compare(
+                    report, baseline, tolerance=options["tolerance"]
+                )
+            except ValueError as error:
+                raise CommandError(error)
+            if slower:
+                raise CommandError(
+                    "Slower than the baseline: %s"
+                    % ", ".join(
+                        "%s (%.2f -> %.2f ms)" % line for line in slower
+                    )
+                )
@@ -0,0 +1,41 @@
+from django.core.management import BaseCommand, CommandError
+
+from market.benchmarks import serving
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput and tail latency of the catalog endpoints "
+        "served through WSGI and ASGI under concurrent load."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=16,
+            help="WSGI worker threads and concurrent ASGI requests.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            reports = serving.run(
+                options["requests"], concurrency=options["concurrency"]
+            )
+        except ValueError as e:
+            raise CommandError(e)
+        for interface, report in reports.items():
+            self.stdout.write(
+                "%s: %d request(s), %d error(s), %.1f req/s, "
+                "p50 %.2f ms, p95 %.2f ms, p99 %.2f ms"
+                % (
+                    interface.upper(),
+                    report["requests"],
+                    report["errors"],
+                    report["requests_per_second"],
+                    report["p50_ms"],
+                    report["p95_ms"],
+                    report["p99_ms"],
+                )
+            )
@@ -0,0 +1,55 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from market.benchmarks import sqlite
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare read and mixed read/write throughput of an SQLite "
+        "database under Django's defaults and under the tuned profile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seconds",
+            type=float,
+            default=5.0,
+            help="Duration of each workload.",
+        )
+        parser.add_argument("--processes", type=int, default=4)
+        parser.add_argument(
+            "--write-ratio",
+            type=float,
+            default=0.1,
+            help="Share of writes in the mixed workload.",
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        connection = connections[using]
+        if connection.vendor != "sqlite" or connection.is_in_memory_db():
+            raise CommandError("Needs an SQLite database on disk.")
+        if options["processes"] < 1:
+            raise CommandError("Needs at least one worker process.")
+        try:
+            report = sqlite.run(
+                seconds=options["seconds"],
+                processes=options["processes"],
+                write_ratio=options["write_ratio"],
+                using=using,
+            )
+        except ValueError as e:
+            raise CommandError(e)
+        columns = ["ops_per_second", "p50_ms", "p95_ms", "p99_ms", "errors"]
+        self.stdout.write(
+            "%-9s %-6s " % ("profile", "load")
+            + " ".join("%14s" % column for column in columns)
+        )
+        for profile, workloads in report.items():
+            for workload, result in workloads.items():
+                self.stdout.write(
+                    "%-9s %-6s " % (profile, workload)
+                    + " ".join("%14.1f" % result[c] for c in columns)
+                )
@@ -0,0 +1,50 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from market.benchmarks import stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer a single hot SKU with concurrent reserve+commit checkouts "
+        "and check that it never oversells."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--units", type=int, default=1000)
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=0,
+            help="Worker processes, each running --threads threads.",
+        )
+        parser.add_argument(
+            "--attempts", type=int, help="Checkouts per worker thread."
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        connection = connections[using]
+        if (
+            options["processes"]
+            and connection.vendor == "sqlite"
+            and connection.is_in_memory_db()
+        ):
+            raise CommandError(
+                "Worker processes need a database on disk, not in memory."
+            )
+        report = stock.run(
+            options["units"],
+            threads=options["threads"],
+            processes=options["processes"],
+            attempts=options["attempts"],
+            using=using,
+        )
+        for key, value in report.items():
+            if isinstance(value, float):
+                value = "%.2f" % value
+            self.stdout.write("%s: %s" % (key, value))
+        if report["oversold"]:
+            raise CommandError("Stock was oversold")
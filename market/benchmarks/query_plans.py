@@ -0,0 +1,250 @@
+"""Query plan audit of the catalog's hot queries.
+
+Each entry of the registry builds one canonical queryset from sample
+values taken from the database (a real slug, item, category...). audit()
+asks the database how it would run each query (EXPLAIN QUERY PLAN on
+SQLite, EXPLAIN elsewhere), classifies every step as an index lookup, a
+full table scan or a temporary sort, and times a few executions.
+
+Run it against a realistically sized database: on a nearly empty one the
+planner may legitimately prefer scans. Register more queries with the
+@hot_query decorator.
+"""
+import re
+import statistics
+import time
+from dataclasses import dataclass, field
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from market.inventory.models import (
+    Category,
+    Media,
+    Product,
+    ProductAttributeLists,
+    ProductInventory,
+    ProductReadModel,
+    Stock,
+    StockReservation,
+)
+from market.inventory.pagination import DEFAULT_PAGE_SIZE
+
+HOT_QUERIES = {}
+
+# Plan lines, SQLite first then PostgreSQL
+FULL_SCAN_RE = re.compile(r"^SCAN (\w+)$|Seq Scan on (\w+)")
+INDEX_RE = re.compile(
+    r"USING (?:COVERING )?INDEX (\w+)|USING (INTEGER PRIMARY KEY)"
+    r"|Index (?:Only )?Scan (?:Backward )?using (\w+)"
+    r"|Bitmap Index Scan on (\w+)"
+)
+SORT_RE = re.compile(r"USE TEMP B-TREE|^\s*(?:->\s*)?Sort\b")
+
+
+def hot_query(name, allow_scan=False):
+    """Register a function building a queryset from the sample dict.
+
+    ``allow_scan`` marks queries expected to read a whole (small) table.
+    """
+
+    def register(build):
+        HOT_QUERIES[name] = (build, allow_scan)
+        return build
+
+    return register
+
+
+@dataclass
+class QueryPlan:
+    name: str
+    sql: str
+    lines: list
+    seconds: list = field(default_factory=list)
+    rows: int = 0
+    allow_scan: bool = False
+
+    @property
+    def full_scans(self):
+        return [
+            next(table for table in match.groups() if table)
+            for match in map(FULL_SCAN_RE.search, self.lines)
+            if match
+        ]
+
+    @property
+    def indexes(self):
+        return [
+            next(index for index in match.groups() if index)
+            for line in self.lines
+            for match in INDEX_RE.finditer(line)
+        ]
+
+    @property
+    def sorts(self):
+        return sum(1 for line in self.lines if SORT_RE.search(line))
+
+    @property
+    def median_ms(self):
+        return statistics.median(self.seconds) * 1000 if self.seconds else 0
+
+    @property
+    def ok(self):
+        return self.allow_scan or not self.full_scans
+
+
+def samples(using=DEFAULT_DB_ALIAS):
+    """Real lookup values from the database, placeholders if it is empty"""
+    item = (
+        ProductInventory.objects.using(using)
+        .select_related("product")
+        .order_by("pk")
+        .first()
+    )
+    category = (
+        Category.objects.using(using)
+        .filter(level=0)
+        .order_by("tree_id")
+        .first()
+    ) or Category(pk=0, slug="", tree_id=0, lft=0, rght=0)
+    return {
+        "category": category,
+        "product_id": item.product_id if item else 0,
+        "slug": item.product.slug if item else "",
+        "web_id": item.product.web_id if item else "",
+        "product_inventory_id": item.pk if item else 0,
+        "sku": item.sku if item else "",
+        "sale_price": item.sale_price if item else 0,
+    }
+
+
+@hot_query("product_by_slug")
+def product_by_slug(sample):
+    return Product.objects.filter(slug=sample["slug"], is_active=True)
+
+
+@hot_query("product_by_web_id")
+def product_by_web_id(sample):
+    return Product.objects.filter(web_id=sample["web_id"])
+
+
+@hot_query("category_by_slug")
+def category_by_slug(sample):
+    return Category.objects.filter(
+        slug=sample["category"].slug, is_active=True
+    )
+
+
+@hot_query("newest_products")
+def newest_products(sample):
+    return Product.objects.active().order_by("-created_at", "-id")[
+        :DEFAULT_PAGE_SIZE
+    ]
+
+
+@hot_query("newest_items")
+def newest_items(sample):
+    return ProductInventory.objects.filter(is_active=True).order_by(
+        "-created_at", "-id"
+    )[:DEFAULT_PAGE_SIZE]
+
+
+@hot_query("cheapest_items")
+def cheapest_items(sample):
+    return ProductInventory.objects.filter(is_active=True).order_by(
+        "sale_price", "id"
+    )[:DEFAULT_PAGE_SIZE]
+
+
+@hot_query("items_in_price_range")
+def items_in_price_range(sample):
+    price = sample["sale_price"]
+    return ProductInventory.objects.filter(
+        sale_price__gte=price, sale_price__lte=price + 10
+    )
+
+
+@hot_query("item_by_sku")
+def item_by_sku(sample):
+    return ProductInventory.objects.filter(sku=sample["sku"])
+
+
+@hot_query("active_items_of_product")
+def active_items_of_product(sample):
+    return ProductInventory.objects.filter(
+        product_id=sample["product_id"], is_active=True
+    )
+
+
+@hot_query("featured_image")
+def featured_image(sample):
+    return Media.objects.filter(
+        product_inventory_id=sample["product_inventory_id"],
+        is_featured=True,
+    )
+
+
+@hot_query("item_stock")
+def item_stock(sample):
+    return Stock.objects.filter(
+        product_inventory_id=sample["product_inventory_id"]
+    )
+
+
+@hot_query("item_attributes")
+def item_attributes(sample):
+    return ProductAttributeLists.objects.filter(
+        productinventory_id=sample["product_inventory_id"]
+    ).select_related("attributevalues__product_attribute")
+
+
+@hot_query("subtree_listing")
+def subtree_listing(sample):
+    return (
+        ProductInventory.objects.active()
+        .in_category(sample["category"])
+        .select_related("product")
+        .order_by("-created_at", "-id")[: DEFAULT_PAGE_SIZE + 1]
+    )
+
+
+@hot_query("read_model_by_sku")
+def read_model_by_sku(sample):
+    return ProductReadModel.objects.filter(sku=sample["sku"])
+
+
+@hot_query("expired_reservations")
+def expired_reservations(sample):
+    return StockReservation.objects.filter(expires_at__lte=timezone.now())
+
+
+def explain(queryset, using=DEFAULT_DB_ALIAS):
+    """The plan of a queryset as a list of text lines"""
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return queryset.using(using).explain().splitlines()
+    sql, params = queryset.query.get_compiler(using).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def audit(names=None, repeat=5, using=DEFAULT_DB_ALIAS):
+    """Explain and time the registered queries; returns QueryPlans"""
+    sample = samples(using)
+    plans = []
+    for name in names or HOT_QUERIES:
+        build, allow_scan = HOT_QUERIES[name]
+        queryset = build(sample).using(using)
+        plan = QueryPlan(
+            name=name,
+            sql=str(queryset.query),
+            lines=explain(queryset, using),
+            allow_scan=allow_scan,
+        )
+        for _ in range(repeat):
+            start = time.perf_counter()
+            plan.rows = len(list(queryset.all()))
+            plan.seconds.append(time.perf_counter() - start)
+        plans.append(plan)
+    return plans
@@ -0,0 +1,169 @@
+"""WSGI vs ASGI throughput benchmark for the catalog endpoints.
+
+The same mix of catalog requests is sent to the project's WSGI and ASGI
+applications in process, without a network server in between. WSGI
+requests run on a pool of ``concurrency`` threads, like a threaded WSGI
+server; ASGI requests run as ``concurrency`` concurrent tasks on one
+event loop. Throughput and latency percentiles are reported for each.
+
+Run it against a database with a realistic catalog, e.g. one left by
+``bench-catalog --keep``.
+"""
+import asyncio
+import io
+import itertools
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.urls import reverse
+
+from market.inventory.category_tree import get_category_tree
+from market.inventory.models import ProductInventory
+
+HOST = "localhost"
+
+
+def sample_paths(count=50):
+    """Catalog request paths (with query strings) for existing data"""
+    items = list(
+        ProductInventory.objects.active()
+        .select_related("product")
+        .order_by("pk")[:count]
+    )
+    tree = get_category_tree()
+    paths = []
+    for item in items:
+        paths.append(
+            reverse(
+                "inventory:product-detail",
+                kwargs={"web_id": item.product.web_id},
+            )
+        )
+        paths.append(
+            reverse("inventory:stock-availability") + "?sku=" + item.sku
+        )
+    for node in itertools.islice(iter(tree), count):
+        paths.append(
+            reverse("inventory:category-listing", kwargs={"path": node.path})
+        )
+    return paths
+
+
+def wsgi_request(application, url):
+    path, _, query = url.partition("?")
+    status = []
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "SCRIPT_NAME": "",
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "SERVER_NAME": HOST,
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": HOST,
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": io.StringIO(),
+        "wsgi.url_scheme": "http",
+        "wsgi.version": (1, 0),
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    response = application(
+        environ, lambda code, headers, exc_info=None: status.append(code)
+    )
+    try:
+        b"".join(response)
+    finally:
+        response.close()
+    return int(status[0].split()[0])
+
+
+async def asgi_request(application, url):
+    path, _, query = url.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", HOST.encode())],
+        "server": (HOST, 80),
+        "client": ("127.0.0.1", 0),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    return messages[0]["status"]
+
+
+def report(latencies, statuses, elapsed):
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "requests": len(latencies),
+        "errors": sum(1 for status in statuses if status >= 400),
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+    }
+
+
+def run_wsgi(urls, concurrency):
+    from market.wsgi import application
+
+    def timed(url):
+        start = time.perf_counter()
+        status = wsgi_request(application, url)
+        return time.perf_counter() - start, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, urls))
+    elapsed = time.perf_counter() - start
+    return report(*zip(*results), elapsed)
+
+
+def run_asgi(urls, concurrency):
+    from market.asgi import application
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def timed(url):
+            async with semaphore:
+                start = time.perf_counter()
+                status = await asgi_request(application, url)
+                return time.perf_counter() - start, status
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*map(timed, urls))
+        return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(main())
+    return report(*zip(*results), elapsed)
+
+
+def run(requests=500, concurrency=16, paths=None):
+    """Send ``requests`` requests through each interface; returns
+    {"wsgi": report, "asgi": report}"""
+    paths = paths or sample_paths()
+    if not paths:
+        raise ValueError("No catalog data to request")
+    urls = list(itertools.islice(itertools.cycle(paths), requests))
+    return {
+        "wsgi": run_wsgi(urls, concurrency),
+        "asgi": run_asgi(urls, concurrency),
+    }
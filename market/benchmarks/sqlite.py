@@ -0,0 +1,190 @@
+"""Throughput of an SQLite database before and after its tuning profile.
+
+Worker processes run against the same database file for a fixed time,
+first with reads only, then with a share of writes mixed in. Reads fetch
+an item with its product, brand and type, plus its stock; writes read a
+stock row and write it back in a transaction, the read-then-write shape
+that fails with "database is locked" under deferred transactions. Each
+workload runs under two profiles:
+
+- baseline: Django's defaults. Rollback journal, synchronous=FULL, the
+  2MB page cache, no mmap, deferred transactions, Python's 5s busy
+  timeout, and a new connection per request (CONN_MAX_AGE=0).
+- tuned: settings.SQLITE_PRAGMAS and SQLITE_TRANSACTION_MODE, see
+  market.inventory.sqlite, with connections kept open.
+
+Model imports are kept inside the functions because worker processes
+import this module before Django is set up.
+"""
+import multiprocessing
+import random
+import statistics
+import time
+
+from django.db import DEFAULT_DB_ALIAS
+
+BASELINE = {
+    "pragmas": {
+        "journal_mode": "delete",
+        "synchronous": "full",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "default",
+    },
+    "transaction_mode": None,
+    "persistent": False,
+}
+# Ids sampled for the workers to pick from
+SAMPLE_SIZE = 5000
+
+
+def profiles():
+    from django.conf import settings
+
+    from market.inventory import sqlite
+
+    return {
+        "baseline": BASELINE,
+        "tuned": {
+            "pragmas": sqlite.pragmas(),
+            "transaction_mode": getattr(
+                settings, "SQLITE_TRANSACTION_MODE", None
+            ),
+            "persistent": True,
+        },
+    }
+
+
+def hammer(seconds, item_ids, stock_ids, write_ratio, persistent, using, seed):
+    """Run random reads and writes for ``seconds``"""
+    from django.db import OperationalError, connections, transaction
+
+    from market.inventory.models import ProductInventory, Stock
+
+    rnd = random.Random(seed)
+    items = ProductInventory.objects.using(using).select_related(
+        "product", "brand", "product_type"
+    )
+    stock = Stock.objects.using(using)
+    result = {"reads": 0, "writes": 0, "errors": 0, "latencies": []}
+    deadline = time.perf_counter() + seconds
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if rnd.random() < write_ratio:
+                    with transaction.atomic(using=using):
+                        row = stock.get(pk=rnd.choice(stock_ids))
+                        stock.filter(pk=row.pk).update(units=row.units)
+                    result["writes"] += 1
+                else:
+                    item = items.get(pk=rnd.choice(item_ids))
+                    stock.filter(product_inventory=item).first()
+                    result["reads"] += 1
+            except OperationalError:
+                # "database is locked" once the busy timeout expires, or at
+                # once for a deferred transaction upgrading to a writer
+                result["errors"] += 1
+            result["latencies"].append(time.perf_counter() - start)
+            if not persistent:
+                connections[using].close()
+    finally:
+        connections[using].close()
+    return result
+
+
+def _process_worker(profile, args, queue):
+    import django
+
+    django.setup()
+    from django.conf import settings
+
+    settings.SQLITE_PRAGMAS = profile["pragmas"]
+    settings.SQLITE_TRANSACTION_MODE = profile["transaction_mode"]
+    queue.put(hammer(*args))
+
+
+def set_journal_mode(mode, using):
+    """Switch the database file's journal mode; needs no other open
+    connections"""
+    from django.db import connections
+
+    from market.inventory import sqlite
+
+    connection = connections[using]
+    connection.ensure_connection()
+    sqlite.apply_pragmas(connection.connection, {"journal_mode": mode})
+    connection.close()
+
+
+def summarize(results, seconds):
+    latencies = sorted(t for r in results for t in r["latencies"])
+    quantiles = statistics.quantiles(latencies, n=100)
+    operations = len(latencies)
+    return {
+        "reads": sum(r["reads"] for r in results),
+        "writes": sum(r["writes"] for r in results),
+        "errors": sum(r["errors"] for r in results),
+        "ops_per_second": operations / seconds,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+    }
+
+
+def run(seconds=5.0, processes=4, write_ratio=0.1, using=DEFAULT_DB_ALIAS):
+    """Run both workloads under both profiles and return a report dict
+    of profile -> workload -> results"""
+    from django.db import connections
+
+    from market.inventory.models import ProductInventory, Stock
+
+    item_ids = list(
+        ProductInventory.objects.using(using)
+        .order_by("?")
+        .values_list("pk", flat=True)[:SAMPLE_SIZE]
+    )
+    stock_ids = list(
+        Stock.objects.using(using)
+        .order_by("?")
+        .values_list("pk", flat=True)[:SAMPLE_SIZE]
+    )
+    if not item_ids or not stock_ids:
+        raise ValueError("The database has no items or stock to work on")
+
+    report = {}
+    context = multiprocessing.get_context("spawn")
+    for name, profile in profiles().items():
+        connections.close_all()
+        set_journal_mode(
+            profile["pragmas"].get("journal_mode", "delete"), using
+        )
+        report[name] = {}
+        for workload, ratio in (("read", 0.0), ("mixed", write_ratio)):
+            queue = context.Queue()
+            children = [
+                context.Process(
+                    target=_process_worker,
+                    args=(
+                        profile,
+                        (
+                            seconds,
+                            item_ids,
+                            stock_ids,
+                            ratio,
+                            profile["persistent"],
+                            using,
+                            seed,
+                        ),
+                        queue,
+                    ),
+                )
+                for seed in range(processes)
+            ]
+            for child in children:
+                child.start()
+            results = [queue.get() for _ in children]
+            for child in children:
+                child.join()
+            report[name][workload] = summarize(results, seconds)
+    return report
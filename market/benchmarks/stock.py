@@ -0,0 +1,186 @@
+"""Concurrency benchmark for the stock reservation service.
+
+Many threads and/or processes reserve and commit one unit at a time of
+a single hot SKU until it sells out. Afterwards the sales are compacted
+into the stock row, which is checked for oversell: units sold must
+equal successful checkouts and never exceed the starting stock.
+
+Model imports are kept inside the functions because worker processes
+import this module before Django is set up.
+"""
+import multiprocessing
+import statistics
+import threading
+import time
+import uuid
+
+from django.db import DEFAULT_DB_ALIAS
+
+
+def create_hot_sku(units, using=DEFAULT_DB_ALIAS):
+    """Create a throwaway ProductInventory with ``units`` in stock"""
+    from market.inventory import models
+
+    tag = uuid.uuid4().hex[:10]
+    db = models.ProductInventory.objects.db_manager(using)
+    item = db.create(
+        sku="bench-%s" % tag,
+        upc=tag,
+        product_type=models.ProductType.objects.db_manager(using).create(
+            name="bench-type-%s" % tag
+        ),
+        product=models.Product.objects.db_manager(using).create(
+            web_id="bench-%s" % tag,
+            slug="bench-%s" % tag,
+            name="bench %s" % tag,
+            description="benchmark product",
+        ),
+        brand=models.Brand.objects.db_manager(using).create(
+            name="bench-brand-%s" % tag
+        ),
+        retail_price=1,
+        store_price=1,
+        sale_price=1,
+        weight=1,
+    )
+    models.Stock.objects.db_manager(using).create(
+        product_inventory=item, units=units
+    )
+    return item.pk
+
+
+def drop_hot_sku(product_inventory_id, using=DEFAULT_DB_ALIAS):
+    from market.inventory import models
+
+    item = models.ProductInventory.objects.using(using).get(
+        pk=product_inventory_id
+    )
+    models.StockReservation.objects.using(using).filter(
+        product_inventory=item
+    ).delete()
+    models.StockMovement.objects.using(using).filter(
+        product_inventory=item
+    ).delete()
+    models.Stock.objects.using(using).filter(product_inventory=item).delete()
+    item.delete()
+    item.product.delete()
+    item.product_type.delete()
+    item.brand.delete()
+
+
+def hammer(product_inventory_id, attempts, using=DEFAULT_DB_ALIAS):
+    """Reserve and commit one unit ``attempts`` times"""
+    from django.db import OperationalError, connections
+
+    from market.inventory import stock
+
+    result = {"checkouts": 0, "sold_out": 0, "errors": 0, "latencies": []}
+    try:
+        for _ in range(attempts):
+            start = time.perf_counter()
+            try:
+                reservation = stock.reserve(
+                    {product_inventory_id: 1}, using=using
+                )
+                stock.commit_reservation(reservation, using=using)
+                result["checkouts"] += 1
+            except stock.InsufficientStock:
+                result["sold_out"] += 1
+            except OperationalError:
+                # e.g. "database is locked" once the busy timeout expires
+                result["errors"] += 1
+            result["latencies"].append(time.perf_counter() - start)
+    finally:
+        connections[using].close()
+    return result
+
+
+def _process_worker(product_inventory_id, attempts, using, threads, queue):
+    import django
+
+    django.setup()
+    queue.put(_run_threads(product_inventory_id, attempts, using, threads))
+
+
+def _run_threads(product_inventory_id, attempts, using, threads):
+    results = []
+
+    def work():
+        results.append(hammer(product_inventory_id, attempts, using))
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def run(units, threads=8, processes=0, attempts=None, using=DEFAULT_DB_ALIAS):
+    """Run the benchmark and return a report dict.
+
+    With processes > 0, each process runs ``threads`` threads; otherwise
+    all threads run in this process. Each worker makes ``attempts``
+    checkouts, by default enough for all workers together to try twice
+    the available stock.
+    """
+    from django.db import connections
+
+    from market.inventory import stock as stock_service
+    from market.inventory.models import Stock
+
+    workers = threads * max(processes, 1)
+    attempts = attempts or max(2 * units // workers, 1)
+    pk = create_hot_sku(units, using=using)
+    try:
+        start = time.perf_counter()
+        if processes:
+            # Children open their own connections to the same database.
+            connections.close_all()
+            context = multiprocessing.get_context("spawn")
+            queue = context.Queue()
+            children = [
+                context.Process(
+                    target=_process_worker,
+                    args=(pk, attempts, using, threads, queue),
+                )
+                for _ in range(processes)
+            ]
+            for child in children:
+                child.start()
+            results = [r for _ in children for r in queue.get()]
+            for child in children:
+                child.join()
+        else:
+            results = _run_threads(pk, attempts, using, threads)
+        elapsed = time.perf_counter() - start
+
+        # Fold the sales into the stock row before checking it
+        stock_service.compact(using=using)
+        stock = Stock.objects.using(using).get(product_inventory_id=pk)
+    finally:
+        drop_hot_sku(pk, using=using)
+
+    checkouts = sum(r["checkouts"] for r in results)
+    latencies = sorted(t for r in results for t in r["latencies"])
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "units": units,
+        "threads": threads,
+        "processes": processes,
+        "attempts": len(latencies),
+        "checkouts": checkouts,
+        "sold_out": sum(r["sold_out"] for r in results),
+        "errors": sum(r["errors"] for r in results),
+        "seconds": elapsed,
+        "attempts_per_second": len(latencies) / elapsed,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+        "units_left": stock.units,
+        "units_sold": stock.units_sold,
+        "units_reserved": stock.units_reserved,
+        "oversold": stock.units < 0
+        or stock.units_sold != checkouts
+        or checkouts > units,
+    }
@@ -0,0 +1,243 @@
+"""Catalog-scale benchmark suite.
+
+run() generates a seeded synthetic catalog (see catalog.py) and times
+the catalog's key operations against it. Everything happens inside one
+transaction that is rolled back at the end unless ``keep`` is set, so a
+run leaves the database as it found it.
+
+Each case runs ``repeat`` times with inputs drawn from a generator
+seeded like the catalog. Results are a JSON-serializable dict; compare()
+checks them against a baseline run of the same size and returns the
+cases whose median got slower than the tolerance allows.
+"""
+import platform
+import random
+import statistics
+import time
+from datetime import datetime
+
+import django
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Prefetch
+
+from market.benchmarks.catalog import generate
+from market.demo.loader import CATALOG_FIXTURES, CatalogLoader, FixtureError
+from market.inventory import stock
+from market.inventory.category_tree import (
+    get_category_tree,
+    invalidate_category_tree,
+)
+from market.inventory.facets import (
+    PRICE_BUCKETS,
+    FacetEngine,
+    invalidate_facet_engine,
+)
+from market.inventory.models import (
+    Category,
+    Product,
+    ProductAttributeLists,
+    ProductInventory,
+    Stock,
+)
+
+CASES = {}
+DEFAULT_REPEAT = 20
+DEFAULT_TOLERANCE = 0.25
+
+
+def case(name):
+    """Register a benchmark case: a function taking the Context and
+    running the operation once"""
+
+    def register(function):
+        CASES[name] = function
+        return function
+
+    return register
+
+
+class Context:
+    def __init__(self, catalog, rng, facets):
+        self.catalog = catalog
+        self.rng = rng
+        self.facets = facets
+        self.tree = get_category_tree()
+        self.in_stock = list(
+            Stock.objects.filter(
+                product_inventory_id__in=catalog.item_ids[:100_000],
+                units__gt=0,
+            ).values_list("product_inventory_id", flat=True)
+        )
+
+
+def timed(function, *args, repeat=1):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        seconds.append(time.perf_counter() - start)
+    return summarize(seconds)
+
+
+def summarize(seconds):
+    return {
+        "runs": len(seconds),
+        "median_ms": statistics.median(seconds) * 1000,
+        "min_ms": min(seconds) * 1000,
+        "max_ms": max(seconds) * 1000,
+    }
+
+
+@case("subtree_listing")
+def subtree_listing(context):
+    """First two pages of a random category above the leaves"""
+    category = context.tree.get(
+        context.rng.choice(context.catalog.branch_category_ids)
+    )
+    page = ProductInventory.objects.subtree_listing(category)
+    list(page)
+    if page.has_next:
+        list(
+            ProductInventory.objects.subtree_listing(
+                category, cursor=page.next_cursor
+            )
+        )
+
+
+@case("facet_filtering")
+def facet_filtering(context):
+    """One or two attribute selections and maybe a price bucket"""
+    rng = context.rng
+    values = context.catalog.attribute_value_ids
+    selected = {
+        attribute_id: rng.sample(values[attribute_id], 2)
+        for attribute_id in rng.sample(sorted(values), rng.randint(1, 2))
+    }
+    buckets = (
+        [rng.randrange(len(PRICE_BUCKETS))] if rng.random() < 0.5 else None
+    )
+    context.facets.query(selected, price_buckets=buckets).count
+
+
+@case("product_detail")
+def product_detail(context):
+    """A product page: the product, its categories and every variant with
+    brand, type, stock, images and attributes"""
+    items = ProductInventory.objects.select_related(
+        "brand", "product_type", "product_inventory"
+    ).prefetch_related(
+        "media_product_inventory",
+        Prefetch(
+            "product_inventory_atribute",
+            queryset=ProductAttributeLists.objects.select_related(
+                "attributevalues__product_attribute"
+            ),
+        ),
+    )
+    product = (
+        Product.objects.prefetch_related(
+            "category", Prefetch("product", queryset=items)
+        )
+        .filter(pk=context.rng.choice(context.catalog.product_ids))
+        .get()
+    )
+    for item in product.product.all():
+        item.brand.name, item.product_type.name
+        list(item.media_product_inventory.all())
+        for link in item.product_inventory_atribute.all():
+            link.attributevalues.product_attribute.name
+    list(product.category.all())
+
+
+@case("stock_decrement")
+def stock_decrement(context):
+    """A checkout of one unit of three items, or of what is left"""
+    count = min(3, len(context.in_stock))
+    if not count:
+        return
+    lines = {pk: 1 for pk in context.rng.sample(context.in_stock, count)}
+    try:
+        stock.decrement_many(lines)
+    except stock.InsufficientStock as error:
+        for pk in error.product_inventory_ids:
+            context.in_stock.remove(pk)
+
+
+def fixture_load():
+    """Load the demo fixtures in a transaction that is rolled back, if
+    they exist and the catalog tables are empty"""
+    if Category.objects.exists() or Product.objects.exists():
+        return None
+    loader = CatalogLoader()
+    try:
+        with transaction.atomic():
+            loader.load(CATALOG_FIXTURES)
+            transaction.set_rollback(True)
+    except FixtureError:
+        return None
+    result = summarize([loader.elapsed])
+    result["rows"] = loader.total
+    return result
+
+
+def run(
+    items,
+    seed=0,
+    repeat=DEFAULT_REPEAT,
+    cases=None,
+    keep=False,
+    fixtures=True,
+):
+    """Generate a catalog and time the cases; returns the results"""
+    results = {}
+    loaded = fixture_load() if fixtures else None
+    if loaded:
+        results["fixture_load"] = loaded
+    try:
+        with transaction.atomic():
+            catalog = generate(items, seed=seed)
+            results["bulk_import"] = summarize([catalog.elapsed])
+            results["bulk_import"]["rows"] = catalog.total
+            invalidate_category_tree()
+            start = time.perf_counter()
+            facets = FacetEngine.load()
+            results["facet_engine_load"] = summarize(
+                [time.perf_counter() - start]
+            )
+            context = Context(catalog, random.Random(seed), facets)
+            for name in cases or CASES:
+                results[name] = timed(CASES[name], context, repeat=repeat)
+            transaction.set_rollback(not keep)
+    finally:
+        invalidate_category_tree()
+        invalidate_facet_engine()
+    return {
+        "meta": {
+            "items": items,
+            "seed": seed,
+            "repeat": repeat,
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connections[DEFAULT_DB_ALIAS].vendor,
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Cases slower than the baseline by more than ``tolerance`` (0.25 is
+    25%), as (name, baseline ms, current ms) tuples"""
+    if report["meta"]["items"] != baseline["meta"]["items"]:
+        raise ValueError(
+            "The baseline was run with %d items, not %d"
+            % (baseline["meta"]["items"], report["meta"]["items"])
+        )
+    slower = []
+    for name, result in report["results"].items():
+        before = baseline["results"].get(name)
+        if before and result["median_ms"] > before["median_ms"] * (
+            1 + tolerance
+        ):
+            slower.append((name, before["median_ms"], result["median_ms"]))
+    return slower
@@ -0,0 +1,32 @@
+import io
+
+from django.core.management import call_command
+
+from market.benchmarks.query_plans import QueryPlan
+
+
+def test_benchmarks_query_plan_classification():
+    plan = QueryPlan(
+        name="listing",
+        sql="",
+        lines=[
+            "SCAN inventory_product",
+            "SEARCH inventory_media USING INDEX media_featured_idx (x=?)",
+            "SCAN inventory_stock USING COVERING INDEX stock_idx",
+            "USE TEMP B-TREE FOR ORDER BY",
+        ],
+    )
+    assert plan.full_scans == ["inventory_product"]
+    assert plan.indexes == ["media_featured_idx", "stock_idx"]
+    assert plan.sorts == 1
+    assert not plan.ok
+
+
+def test_benchmarks_hot_queries_use_indexes(db, media_factory, stock_factory):
+    media = media_factory.create()
+    stock_factory.create(product_inventory=media.product_inventory)
+    out = io.StringIO()
+    call_command(
+        "audit-query-plans", "--fail-on-scan", "--repeat=1", stdout=out
+    )
+    assert "featured_image" in out.getvalue()
@@ -0,0 +1,38 @@
+import io
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from market.benchmarks import serving
+from market.benchmarks.catalog import generate
+from market.inventory.category_tree import invalidate_category_tree
+
+
+# Requests run in other threads, which only see committed data
+@pytest.mark.django_db(transaction=True)
+def test_benchmarks_serving_wsgi_and_asgi(settings):
+    # Tests run with DEBUG off, which drops the implicit localhost
+    settings.ALLOWED_HOSTS = [serving.HOST]
+    generate(10, seed=1)
+    invalidate_category_tree()
+    paths = serving.sample_paths(count=3)
+    assert len(paths) == 9
+
+    reports = serving.run(requests=18, concurrency=3, paths=paths)
+    for interface in ("wsgi", "asgi"):
+        report = reports[interface]
+        assert report["requests"] == 18
+        assert report["errors"] == 0
+        assert report["p50_ms"] <= report["p99_ms"]
+
+    out = io.StringIO()
+    call_command("bench-serving", "--requests", "6", stdout=out)
+    lines = out.getvalue().splitlines()
+    assert [line.split(":")[0] for line in lines] == ["WSGI", "ASGI"]
+    assert all(" 0 error(s)" in line for line in lines)
+
+
+def test_benchmarks_serving_needs_data(db):
+    invalidate_category_tree()
+    with pytest.raises(CommandError):
+        call_command("bench-serving", stdout=io.StringIO())
@@ -0,0 +1,69 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from market.benchmarks import suite
+from market.benchmarks.catalog import generate, parse_size
+from market.inventory import models
+
+
+def test_benchmarks_generate_synthetic_catalog(db):
+    catalog = generate(40, seed=1, batch_size=7)
+    assert len(catalog.item_ids) == 40
+    assert models.ProductInventory.objects.count() == 40
+    assert models.Stock.objects.count() == 40
+    assert models.Category.objects.filter(level=3).count() == len(
+        catalog.leaf_category_ids
+    )
+    assert not models.Product.objects.filter(category__level__lt=3).exists()
+    links = models.ProductAttributeLists.objects.count()
+    assert 2 * 40 <= links <= 5 * 40
+    assert models.Media.objects.filter(is_featured=True).count() == 40
+
+    # The same seed gives the same catalog shape
+    again = generate(40, seed=1, batch_size=7)
+    assert again.counts == catalog.counts
+
+
+def test_benchmarks_suite_run_rolls_back(db):
+    report = suite.run(30, repeat=2, fixtures=False)
+    assert set(report["results"]) == {
+        "bulk_import",
+        "facet_engine_load",
+        *suite.CASES,
+    }
+    assert report["results"]["product_detail"]["runs"] == 2
+    assert not models.ProductInventory.objects.exists()
+
+
+def test_benchmarks_stock_decrement_with_few_items(db, stock_factory):
+    stocks = stock_factory.create_batch(2, units=1)
+    context = SimpleNamespace(
+        rng=random.Random(1),
+        in_stock=[row.product_inventory_id for row in stocks],
+    )
+    suite.CASES["stock_decrement"](context)
+    # Sold out: the next checkout drops both, then there is nothing left
+    suite.CASES["stock_decrement"](context)
+    assert context.in_stock == []
+    suite.CASES["stock_decrement"](context)
+
+
+def test_benchmarks_compare_with_baseline():
+    def report(items, **medians):
+        return {
+            "meta": {"items": items},
+            "results": {
+                name: {"median_ms": value} for name, value in medians.items()
+            },
+        }
+
+    baseline = report(100, listing=10.0, detail=4.0)
+    current = report(100, listing=13.0, detail=4.9, new_case=1.0)
+    assert suite.compare(current, baseline, tolerance=0.25) == [
+        ("listing", 10.0, 13.0)
+    ]
+    assert parse_size("100K") == 100_000
+    with pytest.raises(ValueError):
+        suite.compare(report(10, listing=1.0), baseline)
@@ -0,0 +1,336 @@
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import DateField
+from mptt.models import MPTTModel
+
+from market.inventory.maintenance import bulk_loaded
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+# Same fixtures, in the same order, as the load-fixtures command.
+CATALOG_FIXTURES = [
+    "db_admin_fixture.json",
+    "db_category_fixture.json",
+    "db_product_fixture.json",
+    "db_type_fixture.json",
+    "db_brand_fixture.json",
+    "db_product_inventory_fixture.json",
+    "db_media_fixture.json",
+    "db_stock_fixture.json",
+    "db_product_attribute_fixture.json",
+    "db_product_attribute_value_fixture.json",
+    "db_product_attribute_lists_fixture.json",
+]
+
+DEFAULT_BATCH_SIZE = 2000
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class FixtureError(Exception):
+    """Raised when a fixture file can not be found or parsed"""
+
+
+def find_fixture(name):
+    """Resolve a fixture name the way loaddata does: app fixture
+    directories first, then FIXTURE_DIRS, then the name as a path."""
+    dirs = [
+        Path(app_config.path) / "fixtures"
+        for app_config in apps.get_app_configs()
+    ]
+    dirs += [Path(d) for d in settings.FIXTURE_DIRS]
+    for directory in dirs:
+        candidate = directory / name
+        if candidate.is_file():
+            return candidate
+    if os.path.isfile(name):
+        return Path(name)
+    raise FixtureError("No fixture named '%s' found." % name)
+
+
+def iter_json_array(stream, chunk_size=READ_CHUNK_SIZE):
+    """Yield the items of a top-level JSON array one at a time.
+
+    Only one read chunk plus the item being decoded is held in memory,
+    so file size does not affect the memory footprint.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    started = False
+
+    while True:
+        # Skip whitespace and item separators.
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(buffer):
+            if eof:
+                raise FixtureError("Unexpected end of JSON array")
+            buffer = stream.read(chunk_size)
+            pos = 0
+            eof = not buffer
+            continue
+        if not started:
+            if buffer[pos] != "[":
+                raise FixtureError("Fixture must contain a JSON array")
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise FixtureError("Malformed JSON near offset %d" % pos)
+            # Item is split across chunks: drop what has been consumed
+            # and read more.
+            chunk = stream.read(chunk_size)
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            eof = not chunk
+            continue
+        yield item
+        pos = end
+
+
+def fixture_model(path):
+    """Return the model of the first object in a fixture file, or None
+    for an empty fixture."""
+    with open(path, encoding="utf-8") as stream:
+        for record in iter_json_array(stream):
+            return apps.get_model(record["model"])
+    return None
+
+
+def peak_memory():
+    """Peak resident set size of this process in bytes, when known"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def sort_models(models):
+    """Order models so every model comes after the models it references.
+
+    The input order is kept wherever the foreign keys allow it. Self
+    references are ignored and cycles fall back to the input order.
+    """
+    pending = list(models)
+    ordered = []
+    while pending:
+        for model in pending:
+            opts = model._meta
+            related = {
+                field.related_model
+                for field in opts.fields + opts.many_to_many
+                if field.is_relation
+            }
+            related.discard(model)
+            if not related & set(pending):
+                break
+        else:
+            model = pending[0]
+        pending.remove(model)
+        ordered.append(model)
+    return ordered
+
+
+class CatalogLoader:
+    """Bulk loader for catalog fixtures.
+
+    Fixture files are stream-parsed and every model is inserted with
+    batched bulk_create, in dependency order and inside one transaction.
+    MPTT tree fields are rebuilt once at the end instead of on every
+    insert. Unlike loaddata no save signals are sent.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS, batch_size=DEFAULT_BATCH_SIZE):
+        self.using = using
+        self.batch_size = batch_size
+        self.counts = {}
+        self.elapsed = 0.0
+        self._pending = {}
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    @property
+    def rows_per_second(self):
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def load(self, fixture_names):
+        """Load fixtures by name and return the number of rows inserted"""
+        paths = [find_fixture(name) for name in fixture_names]
+        start = time.perf_counter()
+        connection = connections[self.using]
+        with transaction.atomic(using=self.using):
+            with connection.constraint_checks_disabled():
+                for path in self.sort_paths(paths):
+                    self.load_file(path)
+                self.flush_all()
+            models = [apps.get_model(label) for label in self.counts]
+            connection.check_constraints(
+                table_names=[model._meta.db_table for model in models]
+            )
+            for model in models:
+                if issubclass(model, MPTTModel):
+                    model._tree_manager.rebuild()
+            self.reset_sequences(connection, models)
+            # bulk_create sends no signals
+            bulk_loaded(using=self.using)
+        self.elapsed = time.perf_counter() - start
+        return self.total
+
+    def sort_paths(self, paths):
+        """Order fixture files so that referenced models load first"""
+        by_model = {}
+        for path in paths:
+            by_model.setdefault(fixture_model(path), []).append(path)
+        by_model.pop(None, None)
+        return [
+            path
+            for model in sort_models(list(by_model))
+            for path in by_model[model]
+        ]
+
+    def load_file(self, path):
+        with open(path, encoding="utf-8") as stream:
+            for record in iter_json_array(stream):
+                self.add(record)
+
+    def add(self, record):
+        model = apps.get_model(record["model"])
+        obj, m2m = self.build(model, record)
+        batch = self._pending.setdefault(model, [])
+        batch.append((obj, m2m))
+        if len(batch) >= self.batch_size:
+            self.flush(model)
+
+    def build(self, model, record):
+        """Build an unsaved instance and its m2m links from a record.
+
+        Fixtures in this repo carry their primary key as either "pk" or
+        "id"; both are honoured.
+        """
+        opts = model._meta
+        obj = model()
+        pk = record.get("pk", record.get("id"))
+        if pk is not None:
+            obj.pk = opts.pk.to_python(pk)
+        fields = record.get("fields", {})
+        m2m = {}
+        for name, value in fields.items():
+            field = opts.get_field(name)
+            if field.many_to_many:
+                m2m[field] = value
+            elif field.is_relation:
+                target = field.remote_field.model._meta.pk
+                setattr(
+                    obj,
+                    field.attname,
+                    None if value is None else target.to_python(value),
+                )
+            else:
+                setattr(obj, field.attname, field.to_python(value))
+        for field in opts.concrete_fields:
+            if field.name in fields:
+                continue
+            if isinstance(field, DateField) and (
+                field.auto_now or field.auto_now_add
+            ):
+                setattr(obj, field.attname, field.pre_save(obj, add=True))
+        if isinstance(obj, MPTTModel):
+            mptt_opts = opts.model._mptt_meta
+            for attr in (
+                mptt_opts.left_attr,
+                mptt_opts.right_attr,
+                mptt_opts.tree_id_attr,
+                mptt_opts.level_attr,
+            ):
+                if getattr(obj, attr) is None:
+                    # Placeholder, fixed by the rebuild after loading.
+                    setattr(obj, attr, 0)
+        return obj, m2m
+
+    def flush(self, model):
+        batch = self._pending.pop(model, [])
+        if not batch:
+            return
+        objs = [obj for obj, _ in batch]
+        with raw_timestamps(model):
+            model._base_manager.using(self.using).bulk_create(objs)
+        self.count(model, len(objs))
+
+        links = {}
+        for obj, m2m in batch:
+            for field, values in m2m.items():
+                through = field.remote_field.through
+                source = "%s_id" % field.m2m_field_name()
+                target = "%s_id" % field.m2m_reverse_field_name()
+                links.setdefault(through, []).extend(
+                    through(**{source: obj.pk, target: value})
+                    for value in values
+                )
+        for through, rows in links.items():
+            through._base_manager.using(self.using).bulk_create(
+                rows, batch_size=self.batch_size
+            )
+            self.count(through, len(rows))
+
+    def flush_all(self):
+        for model in list(self._pending):
+            self.flush(model)
+
+    def count(self, model, rows):
+        label = model._meta.label
+        self.counts[label] = self.counts.get(label, 0) + rows
+
+    def reset_sequences(self, connection, models):
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+
+class raw_timestamps:
+    """Keep fixture values for auto_now/auto_now_add fields.
+
+    bulk_create calls pre_save() on every field, which would overwrite
+    the timestamps stored in the fixtures with the current time.
+    """
+
+    def __init__(self, model):
+        self.fields = [
+            field
+            for field in model._meta.concrete_fields
+            if isinstance(field, DateField)
+            and (field.auto_now or field.auto_now_add)
+        ]
+        self.saved = []
+
+    def __enter__(self):
+        for field in self.fields:
+            self.saved.append((field, field.auto_now, field.auto_now_add))
+            field.auto_now = field.auto_now_add = False
+
+    def __exit__(self, *exc_info):
+        for field, auto_now, auto_now_add in self.saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+        self.saved = []
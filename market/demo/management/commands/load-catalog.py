@@ -0,0 +1,59 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from market.demo.loader import (
+    CATALOG_FIXTURES,
+    DEFAULT_BATCH_SIZE,
+    CatalogLoader,
+    FixtureError,
+    peak_memory,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk load catalog fixtures with streaming parsing and batched "
+        "inserts. Loads the demo catalog when no fixtures are given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "fixtures",
+            nargs="*",
+            help="Fixture file names or paths (default: demo catalog).",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database to load the fixtures into.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Rows per bulk_create batch.",
+        )
+
+    def handle(self, *args, **options):
+        loader = CatalogLoader(
+            using=options["database"], batch_size=options["batch_size"]
+        )
+        try:
+            loader.load(options["fixtures"] or CATALOG_FIXTURES)
+        except FixtureError as e:
+            raise CommandError(e)
+
+        if options["verbosity"] >= 2:
+            for label, rows in loader.counts.items():
+                self.stdout.write("  %s: %d row(s)" % (label, rows))
+        if options["verbosity"] >= 1:
+            peak = peak_memory()
+            self.stdout.write(
+                "Installed %d row(s) in %.2fs (%d rows/s, peak memory %s)"
+                % (
+                    loader.total,
+                    loader.elapsed,
+                    loader.rows_per_second,
+                    "%.1f MB" % (peak / 2**20) if peak else "n/a",
+                )
+            )
@@ -5,14 +5,5 @@ class Command(BaseCommand):
     def handle(self, *args, **kwargs):
         call_command("makemigrations")
         call_command("migrate")
-        call_command("loaddata", "db_admin_fixture.json")
-        call_command("loaddata", "db_category_fixture.json")
-        call_command("loaddata", "db_product_fixture.json")
-        call_command("loaddata", "db_type_fixture.json")
-        call_command("loaddata", "db_brand_fixture.json")
-        call_command("loaddata", "db_product_inventory_fixture.json")
-        call_command("loaddata", "db_media_fixture.json")
-        call_command("loaddata", "db_stock_fixture.json")
-        call_command("loaddata", "db_product_attribute_fixture.json")
-        call_command("loaddata", "db_product_attribute_value_fixture.json")
-        call_command("loaddata", "db_product_attribute_lists_fixture.json")
+        # Also rebuilds the read model and recounts the categories
+        call_command("load-catalog")
@@ -0,0 +1,100 @@
+"""Reusable SQLite images of a database with the catalog loaded.
+
+Loading the demo catalog parses eleven JSON fixtures. load_cached()
+does that once, saves the resulting database with the SQLite backup API
+and restores the image in later runs, which is a page copy instead of
+tens of thousands of inserts. Images are named after a hash of the
+fixture files and of every migration, so editing either makes the next
+run load from the fixtures again and replace the stale image.
+
+Images are written to a temporary file and renamed into place, so
+parallel test workers can share a directory.
+"""
+import hashlib
+import os
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from market.demo.loader import CATALOG_FIXTURES, CatalogLoader, find_fixture
+from market.inventory.maintenance import bulk_loaded
+
+# Bump to discard existing images when the image format changes.
+SNAPSHOT_VERSION = 2
+PREFIX = "catalog-"
+
+
+def is_supported(using=DEFAULT_DB_ALIAS):
+    return connections[using].vendor == "sqlite"
+
+
+def migration_files():
+    """(app label, path) of every migration of the installed apps"""
+    for app_config in apps.get_app_configs():
+        directory = Path(app_config.path) / "migrations"
+        for path in sorted(directory.glob("*.py")):
+            yield app_config.label, path
+
+
+def fingerprint(fixture_names=CATALOG_FIXTURES):
+    """Hash of the fixture files and migrations an image depends on"""
+    digest = hashlib.sha256(b"%d" % SNAPSHOT_VERSION)
+    files = [("fixture", find_fixture(name)) for name in fixture_names]
+    files += migration_files()
+    for label, path in files:
+        # Hash names relative to the app, not absolute paths, so
+        # checkouts in different places share images.
+        digest.update(("%s/%s\0" % (label, path.name)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:20]
+
+
+def snapshot_path(directory, fixture_names=CATALOG_FIXTURES):
+    return Path(directory) / (
+        "%s%s.sqlite3" % (PREFIX, fingerprint(fixture_names))
+    )
+
+
+def save(path, using=DEFAULT_DB_ALIAS):
+    """Copy the database to ``path`` and drop older images next to it"""
+    path = Path(path)
+    connection = connections[using]
+    connection.ensure_connection()
+    temporary = path.with_name("%s.%d.tmp" % (path.name, os.getpid()))
+    with closing(sqlite3.connect(temporary)) as target:
+        connection.connection.backup(target)
+    os.replace(temporary, path)
+    for stale in path.parent.glob(PREFIX + "*.sqlite3"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+
+
+def restore(path, using=DEFAULT_DB_ALIAS):
+    """Overwrite the database with the image at ``path``"""
+    connection = connections[using]
+    connection.ensure_connection()
+    with closing(sqlite3.connect(path)) as source:
+        source.backup(connection.connection)
+    # Images are saved after a load, with the read model and the
+    # category counts already built
+    bulk_loaded(using=using, derived=False)
+
+
+def load_cached(
+    directory, fixture_names=CATALOG_FIXTURES, using=DEFAULT_DB_ALIAS
+):
+    """Restore the catalog image from ``directory`` or load the fixtures
+    and save one. Returns True if an image was restored."""
+    if not is_supported(using):
+        CatalogLoader(using=using).load(fixture_names)
+        return False
+    path = snapshot_path(directory, fixture_names)
+    if path.exists():
+        restore(path, using)
+        return True
+    CatalogLoader(using=using).load(fixture_names)
+    save(path, using)
+    return False
@@ -0,0 +1,76 @@
+import io
+import json
+
+from market.demo.loader import CatalogLoader, iter_json_array
+from market.inventory import models
+
+
+def test_demo_iter_json_array_across_chunks():
+    data = [
+        {"model": "inventory.brand", "fields": {"name": "brand_%d" % n}}
+        for n in range(50)
+    ]
+    stream = io.StringIO(json.dumps(data, indent=4))
+    # A tiny chunk size forces every item to be split across reads.
+    result = list(iter_json_array(stream, chunk_size=7))
+    assert result == data
+
+
+def test_demo_iter_json_array_empty():
+    assert list(iter_json_array(io.StringIO(" [ ] "))) == []
+
+
+def test_demo_catalog_loader_bulk_insert(db, tmp_path):
+    categories = [
+        {
+            "model": "inventory.category",
+            "pk": 1,
+            "fields": {"name": "fashion", "slug": "fashion", "parent": None},
+        },
+        {
+            "model": "inventory.category",
+            "pk": 2,
+            "fields": {"name": "shoes", "slug": "shoes", "parent": 1},
+        },
+    ]
+    products = [
+        {
+            "model": "inventory.product",
+            "id": str(n),
+            "fields": {
+                "web_id": "web_%d" % n,
+                "slug": "slug_%d" % n,
+                "name": "name_%d" % n,
+                "description": "description",
+                "category": [2],
+                "created_at": "2023-01-01 14:18:33",
+                "updated_at": "2023-01-01 14:18:33",
+            },
+        }
+        for n in range(1, 6)
+    ]
+    # Products reference categories, so they must load second even when
+    # they are listed first.
+    product_file = tmp_path / "products.json"
+    product_file.write_text(json.dumps(products))
+    category_file = tmp_path / "categories.json"
+    category_file.write_text(json.dumps(categories))
+
+    loader = CatalogLoader(batch_size=2)
+    total = loader.load([str(product_file), str(category_file)])
+
+    assert total == 12
+    assert loader.counts["inventory.Product_category"] == 5
+    shoes = models.Category.objects.get(pk=2)
+    # Tree fields are rebuilt after loading.
+    assert (shoes.level, shoes.lft, shoes.rght) == (1, 2, 3)
+    product = models.Product.objects.get(pk=3)
+    assert product.created_at.strftime("%Y-%m-%d %H:%M:%S") == (
+        "2023-01-01 14:18:33"
+    )
+    assert list(product.category.all()) == [shoes]
+    # Derived tables are brought up to date, bulk_create sends no signals
+    assert {
+        count.category_id: (count.direct, count.cumulative)
+        for count in models.CategoryProductCount.objects.all()
+    } == {1: (0, 5), 2: (5, 5)}
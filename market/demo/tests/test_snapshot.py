@@ -0,0 +1,46 @@
+import json
+
+from market.demo import snapshot
+from market.inventory import models
+
+
+def write_fixture(path, *names):
+    path.write_text(
+        json.dumps(
+            [
+                {
+                    "model": "inventory.brand",
+                    "pk": pk,
+                    "fields": {"name": name},
+                }
+                for pk, name in enumerate(names, start=1)
+            ]
+        )
+    )
+    return str(path)
+
+
+def test_demo_snapshot_load_cached(transactional_db, tmp_path):
+    fixture = write_fixture(tmp_path / "brands.json", "first", "second")
+    images = tmp_path / "images"
+    images.mkdir()
+
+    assert not snapshot.load_cached(images, [fixture])
+    [image] = images.iterdir()
+    models.Brand.objects.all().delete()
+
+    assert snapshot.load_cached(images, [fixture])
+    assert set(models.Brand.objects.values_list("name", flat=True)) == {
+        "first",
+        "second",
+    }
+
+    # A changed fixture is loaded again and replaces the stale image
+    models.Brand.objects.all().delete()
+    write_fixture(tmp_path / "brands.json", "third")
+    assert not snapshot.load_cached(images, [fixture])
+    assert list(images.iterdir()) != [image]
+    assert len(list(images.iterdir())) == 1
+    assert list(models.Brand.objects.values_list("name", flat=True)) == [
+        "third"
+    ]
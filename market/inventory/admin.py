@@ -1,5 +1,387 @@
+"""Admin for the inventory tables, built for large row counts.
+
+- Changelists join what ``__str__`` and list_display need
+  (list_select_related) instead of one query per row.
+- Foreign keys to big tables are autocomplete widgets, never a
+  <select> holding every row.
+- EstimatedCountPaginator answers the unfiltered row count from the
+  database's statistics instead of COUNT(*), and show_full_result_count
+  is off so filtered pages do not count the whole table a second time.
+- Categories are shown as a tree whose levels load on demand, and
+  moves are saved in batches (see CategoryAdmin).
+- Search only uses indexed lookups: exact matches on indexed columns
+  (see LargeTableAdmin.get_search_results), prefix matches on small
+  tables, and the FTS5 index for product names and descriptions. The
+  ``=`` prefix is avoided: it means iexact, a LIKE that SQLite answers
+  by scanning the table.
+"""
+import json
+from functools import reduce
+from operator import or_
+
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+
+from market.inventory.category_moves import move_categories
+from market.inventory.models import (
+    Brand,
+    Category,
+    Media,
+    Product,
+    ProductAttribute,
+    ProductAttributeLists,
+    ProductAttributeValue,
+    ProductInventory,
+    ProductType,
+    Stock,
+    StockMovement,
+)
+from market.inventory.pagination import (
+    MAX_PAGE_SIZE,
+    InvalidCursor,
+    paginate_keyset,
+)
+from market.inventory.search import match_filter
+
+# Below this many rows an exact count is cheap enough
+EXACT_COUNT_THRESHOLD = 10000
+
+
+def estimated_count(model, using):
+    """The row count of ``model``'s table from planner statistics, or
+    None if the backend keeps none"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class "
+                "WHERE oid = %s::regclass",
+                [table],
+            )
+        elif connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+        elif connection.vendor == "sqlite":
+            # An integer primary key is the rowid: MAX() is one b-tree
+            # descent, and a fair estimate unless many rows were deleted
+            cursor.execute(
+                "SELECT MAX(%s) FROM %s"
+                % (
+                    connection.ops.quote_name(model._meta.pk.column),
+                    connection.ops.quote_name(table),
+                )
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimates the count of unfiltered large tables"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > EXACT_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    # Newest first along the primary key; also orders autocomplete pages
+    ordering = ["-pk"]
+
+    def get_search_results(self, request, queryset, search_term):
+        """Rows where any search field equals the whole term, matched
+        by one primary key subquery per field. A plain OR of fields
+        across joins makes SQLite scan the table."""
+        search_term = search_term.strip()
+        search_fields = self.get_search_fields(request)
+        if not search_term or not search_fields:
+            return queryset, False
+        rows = self.model._default_manager.db_manager(queryset.db)
+        matches = [
+            Q(pk__in=rows.filter(**{field: search_term}).values("pk"))
+            for field in search_fields
+        ]
+        return queryset.filter(reduce(or_, matches)), False
+
+
+class NameSearchAdmin(admin.ModelAdmin):
+    """Small lookup tables, searchable by the autocomplete widgets"""
+
+    search_fields = ["^name"]
+    ordering = ["name"]
+
+
+@admin.register(Category)
+class CategoryAdmin(NameSearchAdmin):
+    """The changelist is a tree that loads each level on demand; moves
+    made by dragging are saved together, see category_moves. Searching
+    or filtering shows the flat list."""
+
+    list_display = ["name", "slug", "is_active"]
+    list_filter = ["is_active"]
+    ordering = ["tree_id", "lft"]
+    tree_template = "admin/inventory/category/tree.html"
+
+    def get_urls(self):
+        wrap = self.admin_site.admin_view
+        info = self.opts.app_label, self.opts.model_name
+        return [
+            path(
+                "tree/children/",
+                wrap(self.tree_children_view),
+                name="%s_%s_tree_children" % info,
+            ),
+            path(
+                "tree/move/",
+                wrap(self.tree_move_view),
+                name="%s_%s_tree_move" % info,
+            ),
+        ] + super().get_urls()
+
+    def changelist_view(self, request, extra_context=None):
+        if request.GET or not self.has_view_permission(request):
+            return super().changelist_view(request, extra_context)
+        info = self.opts.app_label, self.opts.model_name
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.opts,
+            "title": self.opts.verbose_name_plural.capitalize(),
+            "has_add_permission": self.has_add_permission(request),
+            "has_change_permission": self.has_change_permission(request),
+            "children_url": reverse("admin:%s_%s_tree_children" % info),
+            "move_url": reverse("admin:%s_%s_tree_move" % info),
+            **(extra_context or {}),
+        }
+        request.current_app = self.admin_site.name
+        return TemplateResponse(request, self.tree_template, context)
+
+    def tree_children_view(self, request):
+        """One page of the children of ?parent (the roots without it)"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        parent = request.GET.get("parent") or None
+        order = "lft" if parent else "tree_id"
+        try:
+            page = paginate_keyset(
+                Category.objects.filter(parent_id=parent).annotate(
+                    products=Coalesce("product_count__cumulative", 0)
+                ),
+                order,
+                {order: order},
+                cursor=request.GET.get("cursor"),
+                page_size=MAX_PAGE_SIZE,
+            )
+        except (InvalidCursor, ValueError):
+            return JsonResponse(
+                {"error": "Invalid parent or cursor"}, status=400
+            )
+        info = self.opts.app_label, self.opts.model_name
+        return JsonResponse(
+            {
+                "results": [
+                    {
+                        "id": category.pk,
+                        "name": category.name,
+                        "is_active": category.is_active,
+                        "descendants": category.get_descendant_count(),
+                        "products": category.products,
+                        "url": reverse(
+                            "admin:%s_%s_change" % info, args=[category.pk]
+                        ),
+                    }
+                    for category in page
+                ],
+                "next": page.next_cursor,
+            }
+        )
+
+    def tree_move_view(self, request):
+        """Apply {"moves": [[id, parent id or null], ...]} in one batch"""
+        if request.method != "POST":
+            return HttpResponseNotAllowed(["POST"])
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        try:
+            moves = {
+                int(pk): None if parent is None else int(parent)
+                for pk, parent in json.loads(request.body)["moves"]
+            }
+            changed = move_categories(moves)
+        except (ValueError, TypeError, KeyError) as e:
+            # MoveError and malformed bodies alike
+            return JsonResponse({"error": str(e)}, status=400)
+        return JsonResponse({"moved": len(moves), "renumbered": changed})
+
+
+@admin.register(Brand)
+class BrandAdmin(NameSearchAdmin):
+    pass
+
+
+@admin.register(ProductType)
+class ProductTypeAdmin(NameSearchAdmin):
+    pass
+
+
+@admin.register(ProductAttribute)
+class ProductAttributeAdmin(NameSearchAdmin):
+    list_display = ["name", "description"]
+
+
+@admin.register(ProductAttributeValue)
+class ProductAttributeValueAdmin(LargeTableAdmin):
+    list_display = ["attribute_value", "product_attribute"]
+    list_select_related = ["product_attribute"]
+    autocomplete_fields = ["product_attribute"]
+    search_fields = [
+        "attribute_value__exact",
+        "product_attribute__name__exact",
+    ]
+
+    def get_queryset(self, request):
+        # Autocomplete results render __str__, which reads the attribute
+        return (
+            super().get_queryset(request).select_related("product_attribute")
+        )
+
+
+@admin.register(Product)
+class ProductAdmin(LargeTableAdmin):
+    list_display = ["name", "web_id", "is_active", "created_at"]
+    list_filter = ["is_active"]
+    autocomplete_fields = ["category"]
+    search_fields = ["web_id__exact"]
+    search_help_text = "Exact web id, or words of the name or description"
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return (
+            queryset.filter(
+                Q(web_id=search_term) | match_filter(search_term, queryset.db)
+            ),
+            False,
+        )
+
+
+class StockInline(admin.StackedInline):
+    model = Stock
+
+
+class MediaInline(admin.TabularInline):
+    model = Media
+    extra = 0
+
+
+class AttributeInline(admin.TabularInline):
+    model = ProductAttributeLists
+    autocomplete_fields = ["attributevalues"]
+    extra = 0
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .select_related("attributevalues__product_attribute")
+        )
+
+
+@admin.register(ProductInventory)
+class ProductInventoryAdmin(LargeTableAdmin):
+    list_display = [
+        "sku",
+        "product",
+        "brand",
+        "product_type",
+        "sale_price",
+        "is_active",
+    ]
+    list_filter = ["is_active"]
+    list_select_related = ["product", "brand", "product_type"]
+    autocomplete_fields = ["product", "brand", "product_type"]
+    search_fields = ["sku__exact", "upc__exact", "product__web_id__exact"]
+    inlines = [StockInline, MediaInline, AttributeInline]
+
+    def get_queryset(self, request):
+        # __str__ is the product name, also in autocomplete results. The
+        # changelist skips list_select_related for a queryset that
+        # already joins something, so join all of it here.
+        return (
+            super()
+            .get_queryset(request)
+            .select_related(*self.list_select_related)
+        )
+
+
+@admin.register(Media)
+class MediaAdmin(LargeTableAdmin):
+    list_display = ["image", "product_inventory", "is_featured"]
+    list_filter = ["is_featured"]
+    list_select_related = ["product_inventory__product"]
+    autocomplete_fields = ["product_inventory"]
+    search_fields = ["product_inventory__sku__exact"]
+
+
+@admin.register(Stock)
+class StockAdmin(LargeTableAdmin):
+    list_display = [
+        "product_inventory",
+        "units",
+        "units_reserved",
+        "units_sold",
+        "last_checked",
+    ]
+    list_select_related = ["product_inventory__product"]
+    autocomplete_fields = ["product_inventory"]
+    search_fields = ["product_inventory__sku__exact"]
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(LargeTableAdmin):
+    """The ledger is the audit trail of stock changes, so it is read
+    only here; see market.inventory.stock to record movements"""
+
+    list_display = [
+        "product_inventory",
+        "delta",
+        "reason",
+        "reference",
+        "created_at",
+        "compacted_at",
+    ]
+    list_filter = ["reason"]
+    list_select_related = ["product_inventory__product"]
+    search_fields = ["product_inventory__sku__exact", "reference__exact"]
+
+    def has_add_permission(self, request):
+        return False
 
-from market.inventory.models import Category
+    def has_change_permission(self, request, obj=None):
+        return False
 
-admin.site.register(Category)
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class InventoryConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "market.inventory"
+
+    def ready(self):
+        # Connect signal receivers
+        from market.inventory import (  # noqa: F401
+            category_counts,
+            category_tree,
+            facets,
+            identifiers,
+            read_model,
+            sqlite,
+        )
@@ -0,0 +1,299 @@
+"""Active product counts per Category, maintained by delta.
+
+CategoryProductCount holds how many active products are linked to each
+category (direct) and to it or any of its descendants (cumulative). Like
+mptt's add_related_count(cumulative=True) it counts links, so a product
+filed under two categories of one subtree counts twice there.
+
+Signal receivers turn every change into per-category deltas and apply
+them in the same transaction: adding, removing or clearing
+Product.category links from either side, a product's is_active flipping
+on save, and deleting a product. A category's delta goes to its own
+direct count and to the cumulative count of the ancestors found by
+lft/rght, one UPDATE per distinct delta. Moving or deleting categories
+schedules one recount() of everything per transaction, run once it
+commits, however many categories it touched. The
+recount-category-products command recounts too; run it after queryset
+updates of Product.is_active, which send no signals.
+
+Readers call get_product_counts(): an in-process snapshot versioned
+through the cache like the category tree, so showing counts next to
+every node of a menu costs no queries.
+"""
+import threading
+import uuid
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, Q
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from mptt.signals import node_moved
+
+from market.inventory.models import Category, CategoryProductCount, Product
+
+VERSION_CACHE_KEY = "inventory:category-counts:version"
+
+Link = Product.category.through
+
+
+def apply_deltas(deltas, using=DEFAULT_DB_ALIAS):
+    """Add ``deltas`` (category id -> change in active products) to the
+    direct counts and to the cumulative counts up the tree"""
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    categories = Category.objects.using(using)
+    nodes = list(
+        categories.filter(pk__in=deltas).values_list(
+            "pk", "tree_id", "lft", "rght"
+        )
+    )
+    if not nodes:
+        return
+    ancestors = categories.filter(
+        reduce(
+            or_,
+            (
+                Q(tree_id=tree_id, lft__lte=lft, rght__gte=rght)
+                for _, tree_id, lft, rght in nodes
+            ),
+        )
+    ).values_list("pk", "tree_id", "lft", "rght")
+    cumulative = Counter()
+    for ancestor, tree_id, lft, rght in ancestors:
+        for pk, node_tree_id, node_lft, node_rght in nodes:
+            if node_tree_id == tree_id and lft <= node_lft <= rght:
+                cumulative[ancestor] += deltas[pk]
+
+    counts = CategoryProductCount.objects.using(using)
+    counts.bulk_create(
+        [CategoryProductCount(category_id=pk) for pk in cumulative],
+        ignore_conflicts=True,
+    )
+    by_delta = defaultdict(lambda: ([], []))
+    for pk, delta in deltas.items():
+        by_delta[delta][0].append(pk)
+    for pk, delta in cumulative.items():
+        if delta:
+            by_delta[delta][1].append(pk)
+    for delta, (direct_ids, cumulative_ids) in by_delta.items():
+        if direct_ids:
+            counts.filter(pk__in=direct_ids).update(direct=F("direct") + delta)
+        if cumulative_ids:
+            counts.filter(pk__in=cumulative_ids).update(
+                cumulative=F("cumulative") + delta
+            )
+    transaction.on_commit(invalidate_product_counts, using=using)
+
+
+def recount(using=DEFAULT_DB_ALIAS):
+    """Recount every category from the links; returns the number of
+    categories"""
+    direct = dict(
+        Link.objects.using(using)
+        .filter(product__is_active=True)
+        .values("category_id")
+        .annotate(products=Count("pk"))
+        .values_list("category_id", "products")
+    )
+    rows = list(
+        Category.objects.using(using)
+        .order_by("-level")
+        .values_list("pk", "parent_id")
+    )
+    cumulative = Counter(direct)
+    # Deepest first, so every subtree is complete before its parent
+    for pk, parent_id in rows:
+        if parent_id is not None:
+            cumulative[parent_id] += cumulative[pk]
+    with transaction.atomic(using=using):
+        CategoryProductCount.objects.using(using).bulk_create(
+            [
+                CategoryProductCount(
+                    category_id=pk,
+                    direct=direct.get(pk, 0),
+                    cumulative=cumulative[pk],
+                )
+                for pk, _ in rows
+            ],
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=["category_id"],
+            update_fields=["direct", "cumulative"],
+        )
+        transaction.on_commit(invalidate_product_counts, using=using)
+    return len(rows)
+
+
+class ScheduledRecount:
+    """An on_commit callback running recount() once"""
+
+    def __init__(self, using):
+        self.using = using
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        recount(using=self.using)
+
+
+def schedule_recount(using=DEFAULT_DB_ALIAS):
+    """recount() once the current transaction commits; repeated calls
+    in one transaction schedule it once"""
+    # Rolled back callbacks are dropped from run_on_commit, so a later
+    # transaction schedules its own
+    pending = transaction.get_connection(using).run_on_commit
+    if not any(
+        isinstance(entry[1], ScheduledRecount) and not entry[1].done
+        for entry in pending
+    ):
+        transaction.on_commit(ScheduledRecount(using), using=using)
+
+
+class ProductCounts:
+    """Immutable snapshot of every category's counts"""
+
+    def __init__(self, rows, version=None):
+        self.version = version
+        self._counts = {pk: (direct, total) for pk, direct, total in rows}
+
+    @classmethod
+    def load(cls, version=None):
+        return cls(
+            CategoryProductCount.objects.using(DEFAULT_DB_ALIAS).values_list(
+                "category_id", "direct", "cumulative"
+            ),
+            version=version,
+        )
+
+    def direct(self, pk):
+        """Active products linked to the category itself"""
+        return self._counts.get(pk, (0, 0))[0]
+
+    def cumulative(self, pk):
+        """Active products linked anywhere in the category's subtree"""
+        return self._counts.get(pk, (0, 0))[1]
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def get_product_counts():
+    """Return the current snapshot, reloading it if the shared version
+    has changed since it was built"""
+    global _snapshot
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_CACHE_KEY, version, timeout=None):
+            version = cache.get(VERSION_CACHE_KEY, version)
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = ProductCounts.load(version=version)
+        return _snapshot
+
+
+def invalidate_product_counts():
+    global _snapshot
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+    _snapshot = None
+
+
+def active_links(instance, reverse, pk_set, using):
+    """Category ids, repeated per link, of the active product links an
+    m2m change touches"""
+    links = Link.objects.using(using).filter(product__is_active=True)
+    if reverse:
+        links = links.filter(category_id=instance.pk)
+        if pk_set is not None:
+            links = links.filter(product_id__in=pk_set)
+    else:
+        links = links.filter(product_id=instance.pk)
+        if pk_set is not None:
+            links = links.filter(category_id__in=pk_set)
+    return Counter(links.values_list("category_id", flat=True))
+
+
+@receiver(m2m_changed, sender=Link)
+def category_links_changed(
+    sender, instance, action, reverse, pk_set, using, **kwargs
+):
+    # Removals are counted before they happen, while the links can
+    # still be found; pk_set may name links that do not exist.
+    if action == "post_add":
+        apply_deltas(active_links(instance, reverse, pk_set, using), using)
+    elif action in ("pre_remove", "pre_clear"):
+        removed = active_links(instance, reverse, pk_set, using)
+        apply_deltas({pk: -n for pk, n in removed.items()}, using)
+
+
+@receiver(pre_save, sender=Product)
+def product_saving(sender, instance, using, update_fields, **kwargs):
+    instance._counted_active = None
+    if instance._state.adding or (
+        update_fields is not None and "is_active" not in update_fields
+    ):
+        return
+    loaded = instance.loaded_values()
+    if "is_active" in loaded:
+        instance._counted_active = loaded["is_active"]
+    else:
+        # Built by hand, or loaded with is_active deferred
+        instance._counted_active = (
+            Product.objects.using(using)
+            .filter(pk=instance.pk)
+            .values_list("is_active", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, using, **kwargs):
+    was_active = getattr(instance, "_counted_active", None)
+    if was_active is None or was_active == instance.is_active:
+        return
+    delta = 1 if instance.is_active else -1
+    categories = Link.objects.using(using).filter(product_id=instance.pk)
+    apply_deltas(
+        {pk: delta for pk in categories.values_list("category_id", flat=True)},
+        using,
+    )
+
+
+@receiver(pre_delete, sender=Product)
+def product_deleting(sender, instance, using, **kwargs):
+    # The links go with the product without an m2m_changed signal
+    if instance.is_active:
+        removed = active_links(instance, False, None, using)
+        apply_deltas({pk: -n for pk, n in removed.items()}, using)
+
+
+@receiver(node_moved, sender=Category)
+def category_moving(sender, instance, **kwargs):
+    # Sent before the node's own row is written; recount after that
+    instance._counts_moved = True
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, using, **kwargs):
+    if instance.__dict__.pop("_counts_moved", False):
+        schedule_recount(using)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, using, **kwargs):
+    schedule_recount(using)
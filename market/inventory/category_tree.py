@@ -0,0 +1,220 @@
+"""In-process snapshot of the Category tree.
+
+The whole taxonomy is loaded with one query into an immutable
+CategoryTree that answers parent, children, ancestor and descendant
+lookups without SQL. Every worker keeps its own snapshot and compares it
+with a version token stored in the Django cache on each access. Saving,
+moving or deleting a Category replaces the token, so each worker reloads
+its snapshot lazily the next time it is read.
+
+The version token only reaches other worker processes when CACHES points
+at a shared backend (memcached, redis, database); the default local
+memory cache invalidates the current process only.
+"""
+import threading
+import uuid
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from mptt.signals import node_moved
+
+from market.inventory.models import Category
+
+VERSION_CACHE_KEY = "inventory:category-tree:version"
+
+
+@dataclass(frozen=True)
+class CategoryNode:
+    """A single category as stored in the tree snapshot"""
+
+    id: int
+    name: str
+    slug: str
+    is_active: bool
+    parent_id: int
+    tree_id: int
+    level: int
+    lft: int
+    rght: int
+    # Slug path from the root, e.g. "fashion/woman/shoes".
+    path: str
+    # Ids of the ancestors from the root down to the parent.
+    ancestor_ids: tuple
+    # Ids of the direct children, in tree order.
+    children_ids: tuple
+
+
+class CategoryTree:
+    """Immutable, versioned view of every Category.
+
+    Nodes are kept in tree (preorder) order, so the descendants of a node
+    are the contiguous run of nodes that follows it.
+    """
+
+    def __init__(self, rows, version=None):
+        self.version = version
+        children = {}
+        by_id = {}
+        for row in rows:
+            by_id[row["id"]] = row
+            children.setdefault(row["parent_id"], []).append(row["id"])
+
+        def sort_key(pk):
+            return (by_id[pk]["tree_id"], by_id[pk]["lft"])
+
+        nodes = {}
+        order = []
+        # Children are walked explicitly instead of trusting lft/rght, so
+        # the snapshot stays consistent even with a stale tree.
+        stack = [
+            (pk, (), "") for pk in sorted(children.get(None, ()), key=sort_key)
+        ]
+        stack.reverse()
+        while stack:
+            pk, ancestor_ids, parent_path = stack.pop()
+            row = by_id[pk]
+            kids = tuple(sorted(children.get(pk, ()), key=sort_key))
+            path = row["slug"]
+            if parent_path:
+                path = "%s/%s" % (parent_path, path)
+            nodes[pk] = CategoryNode(
+                path=path,
+                ancestor_ids=ancestor_ids,
+                children_ids=kids,
+                **row,
+            )
+            order.append(pk)
+            stack.extend(
+                (kid, ancestor_ids + (pk,), path) for kid in reversed(kids)
+            )
+
+        self._nodes = MappingProxyType(nodes)
+        self._order = tuple(order)
+        self._position = MappingProxyType(
+            {pk: position for position, pk in enumerate(order)}
+        )
+        self._size = MappingProxyType(self._subtree_sizes())
+        self._by_path = MappingProxyType(
+            {node.path: node for node in nodes.values()}
+        )
+        self.roots = tuple(pk for pk in order if nodes[pk].parent_id is None)
+
+    def _subtree_sizes(self):
+        sizes = {}
+        for pk in reversed(self._order):
+            sizes[pk] = 1 + sum(
+                sizes[kid] for kid in self._nodes[pk].children_ids
+            )
+        return sizes
+
+    @classmethod
+    def load(cls, version=None):
+        """Build a snapshot from the primary with a single query"""
+        rows = (
+            Category.objects.using(DEFAULT_DB_ALIAS)
+            .order_by("tree_id", "lft")
+            .values(
+                "id",
+                "name",
+                "slug",
+                "is_active",
+                "parent_id",
+                "tree_id",
+                "level",
+                "lft",
+                "rght",
+            )
+        )
+        return cls(rows, version=version)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, pk):
+        return pk in self._nodes
+
+    def __iter__(self):
+        """Iterate over all nodes in tree order"""
+        return (self._nodes[pk] for pk in self._order)
+
+    def get(self, pk):
+        """Return the node with this id, raise KeyError if missing"""
+        return self._nodes[pk]
+
+    def get_by_path(self, path):
+        """Return the node for a slug path, e.g. fashion/woman/shoes"""
+        return self._by_path[path.strip("/")]
+
+    def parent(self, pk):
+        parent_id = self._nodes[pk].parent_id
+        return None if parent_id is None else self._nodes[parent_id]
+
+    def children(self, pk):
+        return [self._nodes[kid] for kid in self._nodes[pk].children_ids]
+
+    def ancestors(self, pk, include_self=False):
+        """Ancestors from the root down, like get_ancestors()"""
+        node = self._nodes[pk]
+        result = [self._nodes[a] for a in node.ancestor_ids]
+        if include_self:
+            result.append(node)
+        return result
+
+    def descendant_ids(self, pk, include_self=False):
+        """Ids of the whole subtree in tree order, like
+        get_descendants()"""
+        start = self._position[pk]
+        end = start + self._size[pk]
+        return self._order[start if include_self else start + 1 : end]
+
+    def descendants(self, pk, include_self=False):
+        return [self._nodes[d] for d in self.descendant_ids(pk, include_self)]
+
+    def subtree_ids(self, pk):
+        """The category and all its descendants, for id__in filters"""
+        return frozenset(self.descendant_ids(pk, include_self=True))
+
+    def descendant_count(self, pk):
+        return self._size[pk] - 1
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def get_category_tree():
+    """Return the current tree snapshot, reloading it if the shared
+    version has changed since it was built"""
+    global _snapshot
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        # Another worker may have set it first; use whatever is stored.
+        if not cache.add(VERSION_CACHE_KEY, version, timeout=None):
+            version = cache.get(VERSION_CACHE_KEY, version)
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = CategoryTree.load(version=version)
+        return _snapshot
+
+
+def invalidate_category_tree():
+    """Mark every worker's snapshot as stale"""
+    global _snapshot
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+    _snapshot = None
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(node_moved, sender=Category)
+def category_changed(sender, **kwargs):
+    # Wait for the commit so other workers never reload uncommitted rows.
+    transaction.on_commit(invalidate_category_tree)
@@ -0,0 +1,43 @@
+"""Conditional GET for catalog responses.
+
+Validators are computed from one aggregate query over the rows a
+response covers: MAX(updated_at) of each table, plus cheap row counts
+and checksums that also catch what timestamps miss (rows added to or
+removed from a listing, stock level changes). The ETag is a hash of all
+of it, so it changes whenever the payload can.
+
+No Last-Modified is sent. Stock, attribute links and category
+membership carry no timestamp, and on a listing MAX(updated_at) goes
+back when an item leaves the page, so a client or CDN revalidating with
+If-Modified-Since alone would be told a stale copy is current. Such
+requests get the full response; If-None-Match is the way to revalidate.
+
+The validator query runs before the payload is built; a client whose
+copy is current gets a 304, carrying the ETag, without the payload
+queries ever running.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return '"%s"' % digest[:32]
+
+
+class Validators:
+    def __init__(self, etag):
+        self.etag = etag
+
+    def not_modified(self, request):
+        """A 304 (or 412) response if the client's copy is current"""
+        response = get_conditional_response(request, etag=self.etag)
+        if response is not None and response.status_code == 304:
+            # A 304 repeats the validators of the 200 it stands for
+            self.apply(response)
+        return response
+
+    def apply(self, response):
+        response["ETag"] = self.etag
+        return response
@@ -0,0 +1,482 @@
+"""In-memory facet engine over product attributes and sale prices.
+
+For every ProductAttributeValue the engine keeps a posting list of the
+ProductInventory ids linked to it, stored as a bitmap in a Python int
+(bit n set = inventory id n). The same is done for sale_price buckets
+and for the set of active items. Filtering is a bitwise AND/OR of
+bitmaps, and a facet count is the popcount of an intersection, so a
+facet sidebar costs no SQL at all.
+
+Link, inventory and product changes are applied to the bitmaps of the
+current process on commit. Each change also bumps a counter in the
+Django cache and is logged there under its number for CHANGES_TIMEOUT
+seconds, so other processes replay it on next access instead of
+reloading; a process only reloads when a change it missed has expired.
+
+Updates never modify the maps a query may be reading: they build new
+ones and swap them in, so queries take no lock.
+"""
+import threading
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from market.inventory.models import (
+    Product,
+    ProductAttribute,
+    ProductAttributeLists,
+    ProductAttributeValue,
+    ProductInventory,
+)
+
+VERSION_CACHE_KEY = "inventory:facets:version"
+CHANGES_CACHE_KEY = "inventory:facets:changes:%d"
+# Seconds other processes have to replay a change before they reload
+CHANGES_TIMEOUT = 60 * 60
+# Changes replayed at most; a process further behind reloads
+MAX_REPLAY = 1000
+
+# Lower bounds of the sale_price buckets; the last bucket is open ended.
+PRICE_BUCKETS = (
+    Decimal("0"),
+    Decimal("25"),
+    Decimal("50"),
+    Decimal("100"),
+    Decimal("200"),
+    Decimal("500"),
+    Decimal("1000"),
+)
+
+
+def to_bitmap(ids):
+    """Build a bitmap from an iterable of non negative ids in O(n)"""
+    ids = list(ids)
+    if not ids:
+        return 0
+    data = bytearray(max(ids) // 8 + 1)
+    for pk in ids:
+        data[pk >> 3] |= 1 << (pk & 7)
+    return int.from_bytes(data, "little")
+
+
+def from_bitmap(bitmap):
+    """Return the ids set in a bitmap, in ascending order"""
+    ids = []
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    for index, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            ids.append((index << 3) + low.bit_length() - 1)
+            byte ^= low
+    return ids
+
+
+if hasattr(int, "bit_count"):
+
+    def popcount(bitmap):
+        return bitmap.bit_count()
+
+else:  # Python 3.9, which the README still lists
+    # Builds a string of every bit, ~25x slower at a million items
+    def popcount(bitmap):
+        return bin(bitmap).count("1")
+
+
+def price_bucket(price):
+    """Index in PRICE_BUCKETS of the bucket holding this price"""
+    return max(bisect_right(PRICE_BUCKETS, Decimal(price)) - 1, 0)
+
+
+def price_bucket_label(bucket):
+    low = PRICE_BUCKETS[bucket]
+    if bucket + 1 < len(PRICE_BUCKETS):
+        return "%s-%s" % (low, PRICE_BUCKETS[bucket + 1])
+    return "%s+" % low
+
+
+class FacetResult:
+    """Matching ids plus counts for every facet value"""
+
+    def __init__(self, bitmap, attribute_counts, price_counts):
+        self.bitmap = bitmap
+        # {attribute_id: {value_id: count}}
+        self.attribute_counts = attribute_counts
+        # {bucket_index: count}
+        self.price_counts = price_counts
+
+    @property
+    def count(self):
+        return popcount(self.bitmap)
+
+    @property
+    def ids(self):
+        return from_bitmap(self.bitmap)
+
+
+class FacetEngine:
+    """Posting lists of ProductInventory ids per attribute value and per
+    sale_price bucket"""
+
+    def __init__(self, version=None):
+        self.version = version
+        self.attribute_names = {}
+        # value_id -> (attribute_id, attribute_value)
+        self.values = {}
+        # attribute_id -> set of value ids
+        self.attribute_values = {}
+        # value_id -> bitmap of inventory ids
+        self.postings = {}
+        # bucket index -> bitmap of inventory ids
+        self.price_postings = {}
+        self.active = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, version=None):
+        """Build the engine from the primary in four queries"""
+        engine = cls(version=version)
+        engine.attribute_names = dict(
+            ProductAttribute.objects.using(DEFAULT_DB_ALIAS).values_list(
+                "id", "name"
+            )
+        )
+        values = ProductAttributeValue.objects.using(
+            DEFAULT_DB_ALIAS
+        ).values_list("id", "product_attribute_id", "attribute_value")
+        for pk, attribute_id, value in values:
+            engine.values[pk] = (attribute_id, value)
+            engine.attribute_values.setdefault(attribute_id, set()).add(pk)
+
+        links = ProductAttributeLists.objects.using(
+            DEFAULT_DB_ALIAS
+        ).values_list("attributevalues_id", "productinventory_id")
+        postings = {}
+        for value_id, item_id in links.iterator(chunk_size=10000):
+            postings.setdefault(value_id, []).append(item_id)
+        engine.postings = {
+            value_id: to_bitmap(ids) for value_id, ids in postings.items()
+        }
+
+        buckets = {}
+        active = []
+        items = ProductInventory.objects.using(DEFAULT_DB_ALIAS).values_list(
+            "id", "sale_price", "is_active", "product__is_active"
+        )
+        for pk, sale_price, is_active, product_active in items.iterator(
+            chunk_size=10000
+        ):
+            buckets.setdefault(price_bucket(sale_price), []).append(pk)
+            if is_active and product_active:
+                active.append(pk)
+        engine.price_postings = {
+            bucket: to_bitmap(ids) for bucket, ids in buckets.items()
+        }
+        engine.active = to_bitmap(active)
+        return engine
+
+    def query(
+        self, selected=None, price_buckets=None, within=None, active_only=True
+    ):
+        """Filter by attribute values and price buckets.
+
+        ``selected`` maps attribute ids to the chosen value ids; values of
+        the same attribute are OR-ed and attributes are AND-ed. The counts
+        for each attribute are computed with every *other* selection
+        applied, so shoppers see how many items each extra choice gives.
+        ``within`` optionally restricts the items to an iterable of ids,
+        e.g. a category subtree listing.
+        """
+        selected = {a: set(v) for a, v in (selected or {}).items() if v}
+        # The maps are replaced, never modified, by updates
+        postings = self.postings
+        price_postings = self.price_postings
+        base = (
+            self.active
+            if active_only
+            else self._union(price_postings, price_postings)
+        )
+        if within is not None:
+            base &= to_bitmap(within)
+
+        masks = {
+            attribute_id: self._union(postings, value_ids)
+            for attribute_id, value_ids in selected.items()
+        }
+        price_mask = (
+            self._union(price_postings, price_buckets)
+            if price_buckets
+            else None
+        )
+
+        def apply(bitmap, skip=None, skip_price=False):
+            for attribute_id, mask in masks.items():
+                if attribute_id != skip:
+                    bitmap &= mask
+            if price_mask is not None and not skip_price:
+                bitmap &= price_mask
+            return bitmap
+
+        attribute_counts = {}
+        for attribute_id, value_ids in self.attribute_values.items():
+            scope = apply(base, skip=attribute_id)
+            attribute_counts[attribute_id] = {
+                value_id: popcount(scope & postings.get(value_id, 0))
+                for value_id in value_ids
+            }
+        scope = apply(base, skip_price=True)
+        price_counts = {
+            bucket: popcount(scope & bitmap)
+            for bucket, bitmap in price_postings.items()
+        }
+        return FacetResult(apply(base), attribute_counts, price_counts)
+
+    def all_items(self):
+        """Bitmap of every item, active or not"""
+        return self._union(self.price_postings, self.price_postings)
+
+    def _union(self, postings, keys):
+        bitmap = 0
+        for key in keys:
+            bitmap |= postings.get(key, 0)
+        return bitmap
+
+    # Incremental updates, applied on commit by the signal receivers and
+    # replayed by other processes. Each builds new maps and swaps them in.
+
+    def apply(self, changes):
+        """Apply logged changes, (method name, *arguments) tuples"""
+        for name, *args in changes:
+            getattr(self, name)(*args)
+
+    def link(self, value_id, item_id):
+        with self._lock:
+            postings = dict(self.postings)
+            postings[value_id] = postings.get(value_id, 0) | (1 << item_id)
+            self.postings = postings
+
+    def unlink(self, value_id, item_id):
+        with self._lock:
+            postings = dict(self.postings)
+            bitmap = postings.get(value_id, 0) & ~(1 << item_id)
+            if bitmap:
+                postings[value_id] = bitmap
+            else:
+                postings.pop(value_id, None)
+            self.postings = postings
+
+    def update_item(self, item_id, sale_price, is_active):
+        with self._lock:
+            bit = 1 << item_id
+            price_postings = {
+                bucket: bitmap & ~bit
+                for bucket, bitmap in self.price_postings.items()
+            }
+            new = price_bucket(sale_price)
+            price_postings[new] = price_postings.get(new, 0) | bit
+            self.price_postings = price_postings
+            if is_active:
+                self.active |= bit
+            else:
+                self.active &= ~bit
+
+    def set_active(self, item_ids, is_active):
+        with self._lock:
+            bitmap = to_bitmap(item_ids)
+            if is_active:
+                self.active |= bitmap
+            else:
+                self.active &= ~bitmap
+
+    def remove_item(self, item_id):
+        with self._lock:
+            bit = 1 << item_id
+            self.price_postings = {
+                bucket: bitmap & ~bit
+                for bucket, bitmap in self.price_postings.items()
+            }
+            self.postings = {
+                value_id: bitmap & ~bit
+                for value_id, bitmap in self.postings.items()
+            }
+            self.active &= ~bit
+
+
+_lock = threading.Lock()
+_engine = None
+
+
+def _shared_version():
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, 0, timeout=None)
+        version = cache.get(VERSION_CACHE_KEY, 0)
+    return version
+
+
+def get_facet_engine():
+    """Return this process's engine, caught up with the changes other
+    processes made since it was built"""
+    global _engine
+    version = _shared_version()
+    engine = _engine
+    if engine is not None and engine.version == version:
+        return engine
+    with _lock:
+        if _engine is None or not _catch_up(_engine, version):
+            _engine = FacetEngine.load(version=version)
+        return _engine
+
+
+def _catch_up(engine, version):
+    """Replay the logged changes between the engine's version and
+    ``version``; False if the engine must be reloaded instead. Call with
+    _lock held."""
+    if engine.version == version:
+        return True
+    if engine.version is None or not (
+        0 < version - engine.version <= MAX_REPLAY
+    ):
+        return False
+    keys = [
+        CHANGES_CACHE_KEY % number
+        for number in range(engine.version + 1, version + 1)
+    ]
+    logged = cache.get_many(keys)
+    if len(logged) != len(keys):
+        return False
+    for key in keys:
+        engine.apply(logged[key])
+    engine.version = version
+    return True
+
+
+def invalidate_facet_engine():
+    """Force every process to reload its engine"""
+    global _engine
+    _bump_version()
+    _engine = None
+
+
+def _bump_version():
+    try:
+        return cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+        return None
+
+
+def _apply(changes):
+    """Log changes for other processes and apply them to the loaded
+    engine, if any, along with those it missed"""
+    global _engine
+    version = _bump_version()
+    if version is None:
+        # The counter was lost; every process reloads
+        _engine = None
+        return
+    cache.set(CHANGES_CACHE_KEY % version, changes, CHANGES_TIMEOUT)
+    with _lock:
+        if _engine is not None and not _catch_up(_engine, version):
+            _engine = None
+
+
+@receiver(post_save, sender=ProductAttributeLists)
+def attribute_link_saved(sender, instance, **kwargs):
+    changes = [
+        ("link", instance.attributevalues_id, instance.productinventory_id)
+    ]
+    transaction.on_commit(lambda: _apply(changes))
+
+
+@receiver(m2m_changed, sender=ProductInventory.attribute_values.through)
+def attribute_links_added(sender, instance, action, reverse, pk_set, **kwargs):
+    # add() and set() bulk create the links without post_save; remove()
+    # and clear() delete them with post_delete
+    if action != "post_add" or not pk_set:
+        return
+    if reverse:
+        pairs = [(instance.pk, item_id) for item_id in pk_set]
+    else:
+        pairs = [(value_id, instance.pk) for value_id in pk_set]
+    changes = [("link", value_id, item_id) for value_id, item_id in pairs]
+    transaction.on_commit(lambda: _apply(changes))
+
+
+@receiver(post_delete, sender=ProductAttributeLists)
+def attribute_link_deleted(sender, instance, **kwargs):
+    changes = [
+        ("unlink", instance.attributevalues_id, instance.productinventory_id)
+    ]
+    transaction.on_commit(lambda: _apply(changes))
+
+
+@receiver(post_save, sender=ProductInventory)
+def inventory_saved(sender, instance, **kwargs):
+    item_id = instance.pk
+    sale_price = instance.sale_price
+    is_active = instance.is_active
+    product_id = instance.product_id
+
+    def changed():
+        active = (
+            is_active
+            and Product.objects.using(DEFAULT_DB_ALIAS)
+            .filter(pk=product_id, is_active=True)
+            .exists()
+        )
+        _apply([("update_item", item_id, sale_price, active)])
+
+    transaction.on_commit(changed)
+
+
+@receiver(post_delete, sender=ProductInventory)
+def inventory_deleted(sender, instance, **kwargs):
+    changes = [("remove_item", instance.pk)]
+    transaction.on_commit(lambda: _apply(changes))
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    product_id = instance.pk
+    product_active = instance.is_active
+
+    def changed():
+        items = ProductInventory.objects.using(DEFAULT_DB_ALIAS).filter(
+            product_id=product_id
+        )
+        changes = [
+            (
+                "set_active",
+                list(
+                    items.filter(is_active=True).values_list("id", flat=True)
+                ),
+                product_active,
+            )
+        ]
+        if product_active:
+            changes.append(
+                (
+                    "set_active",
+                    list(
+                        items.filter(is_active=False).values_list(
+                            "id", flat=True
+                        )
+                    ),
+                    False,
+                )
+            )
+        _apply(changes)
+
+    transaction.on_commit(changed)
+
+
+@receiver(post_save, sender=ProductAttribute)
+@receiver(post_save, sender=ProductAttributeValue)
+@receiver(post_delete, sender=ProductAttributeValue)
+def facet_labels_changed(sender, **kwargs):
+    # Attribute labels change rarely, so just reload.
+    transaction.on_commit(invalidate_facet_engine)
@@ -0,0 +1,322 @@
+"""In-memory index of the identifiers already in the catalog.
+
+Imports need to know which rows of a feed are new and which already
+exist, by ProductInventory.sku or upc or Product.web_id. Asking the
+database costs a lookup per row, or a long IN list per chunk. The
+IdentifierIndex answers from memory instead, with no queries at all.
+It is loaded with a count and a single pass per model, and holds for
+each field the exact set of its values, roughly a hundred bytes per
+value per process.
+
+With IDENTIFIER_INDEX_EXACT = False a process keeps a Bloom filter per
+field instead: about 1.2 bytes per value at a 1% false positive rate
+and no false negatives. A value the filter has never seen is new; the
+few it lets through, existing values and false positives, are settled
+with chunked IN queries. A process keeps one or the other, not both:
+in CPython the set lookup is exact and already faster than the
+filter's hash probes, so a filter in front of the set would only cost
+time.
+
+Rows created, deleted or renamed through the ORM are patched into the
+index of the current process on commit. Renames are found by comparing
+with the row the instance was loaded with (LoadedRowMixin), so saves
+cost no extra query. A version counter in the Django cache makes other
+processes reload theirs lazily, as for the facet engine. bulk_create()
+sends no signals: pass the new values to add_identifiers() afterwards.
+Filters are sized for twice the rows loaded; past that the index is
+rebuilt to keep the error rate.
+"""
+import math
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from market.inventory.models import Product, ProductInventory
+
+VERSION_CACHE_KEY = "inventory:identifiers:version"
+
+# Field -> model holding it; every one is unique
+FIELDS = {
+    "sku": ProductInventory,
+    "upc": ProductInventory,
+    "web_id": Product,
+}
+ERROR_RATE = 0.01
+# Room for growth before the filters are rebuilt
+GROWTH = 2
+MIN_CAPACITY = 1024
+# Values per IN query when the exact sets are not kept
+CHUNK_SIZE = 1000
+
+
+class BloomFilter:
+    """Set membership without false negatives.
+
+    Positions come from the value's own hash() by double hashing, so a
+    filter is only valid within the process that built it; Python
+    caches the hash of a str, which makes repeated checks cheap.
+    """
+
+    def __init__(self, capacity, error_rate=ERROR_RATE):
+        self.capacity = max(capacity, 1)
+        self.size = max(
+            math.ceil(
+                -self.capacity * math.log(error_rate) / math.log(2) ** 2
+            ),
+            8,
+        )
+        self.hashes = max(round(self.size / self.capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        h = hash(value) & 0xFFFFFFFFFFFFFFFF
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, value):
+        bits = self.bits
+        for position in self._positions(value):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        # _positions() inlined, stopping at the first clear bit
+        h = hash(value) & 0xFFFFFFFFFFFFFFFF
+        position, step = h & 0xFFFFFFFF, (h >> 32) | 1
+        bits, size = self.bits, self.size
+        for _ in range(self.hashes):
+            position %= size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+            position += step
+        return True
+
+    @property
+    def saturated(self):
+        return self.count > self.capacity
+
+
+class IdentifierIndex:
+    """Exact sets of the FIELDS values, or Bloom filters of them"""
+
+    def __init__(self, counts, version=None, exact=True):
+        self.version = version
+        self.exact = exact
+        # field -> set of values, with exact sets
+        self.values = {}
+        # field -> BloomFilter, without
+        self.filters = {}
+        for field in FIELDS:
+            if exact:
+                self.values[field] = set()
+            else:
+                self.filters[field] = BloomFilter(
+                    max(counts[field] * GROWTH, MIN_CAPACITY)
+                )
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, version=None, exact=True, using=DEFAULT_DB_ALIAS):
+        """Build the index from the primary with a count and a single
+        pass per model"""
+        items = ProductInventory.objects.using(using)
+        products = Product.objects.using(using)
+        item_count = items.count()
+        index = cls(
+            {
+                "sku": item_count,
+                "upc": item_count,
+                "web_id": products.count(),
+            },
+            version=version,
+            exact=exact,
+        )
+        for sku, upc in items.values_list("sku", "upc").iterator(
+            chunk_size=10000
+        ):
+            index._add("sku", sku)
+            index._add("upc", upc)
+        for (web_id,) in products.values_list("web_id").iterator(
+            chunk_size=10000
+        ):
+            index._add("web_id", web_id)
+        return index
+
+    def _add(self, field, value):
+        if self.exact:
+            self.values[field].add(value)
+        else:
+            self.filters[field].add(value)
+
+    def add(self, field, values):
+        with self._lock:
+            for value in values:
+                self._add(field, value)
+
+    def discard(self, field, values):
+        # A Bloom filter can not forget a value; it becomes a false
+        # positive, which the database settles
+        if self.exact:
+            with self._lock:
+                self.values[field].difference_update(values)
+
+    @property
+    def saturated(self):
+        return any(f.saturated for f in self.filters.values())
+
+    def classify(self, field, values, using=DEFAULT_DB_ALIAS):
+        """Split ``values`` of ``field`` into two sets, (new, existing)"""
+        values = set(values)
+        if self.exact:
+            with self._lock:
+                existing = values & self.values[field]
+            return values - existing, existing
+        bloom = self.filters[field]
+        maybe = [value for value in values if value in bloom]
+        existing = set()
+        queryset = FIELDS[field].objects.using(using)
+        for start in range(0, len(maybe), CHUNK_SIZE):
+            chunk = maybe[start : start + CHUNK_SIZE]
+            existing.update(
+                queryset.filter(**{field + "__in": chunk}).values_list(
+                    field, flat=True
+                )
+            )
+        return values - existing, existing
+
+
+_lock = threading.Lock()
+_index = None
+
+
+def _shared_version():
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, 0, timeout=None)
+        version = cache.get(VERSION_CACHE_KEY, 0)
+    return version
+
+
+def get_identifier_index():
+    """Return this process's index, reloading it if other processes
+    changed the identifiers since it was built"""
+    global _index
+    version = _shared_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _lock:
+        if _index is None or _index.version != version:
+            _index = IdentifierIndex.load(
+                version=version,
+                exact=getattr(settings, "IDENTIFIER_INDEX_EXACT", True),
+            )
+        return _index
+
+
+def classify(field, values, using=DEFAULT_DB_ALIAS):
+    """(new, existing) sets of values of sku, upc or web_id"""
+    if field not in FIELDS:
+        raise ValueError("Unknown identifier field %r" % field)
+    return get_identifier_index().classify(field, values, using=using)
+
+
+def invalidate_identifier_index():
+    """Force every process to reload its index"""
+    global _index
+    _bump_version()
+    _index = None
+
+
+def add_identifiers(field, values):
+    """Record values inserted without signals, e.g. by bulk_create()"""
+    values = list(values)
+    _apply(lambda index: index.add(field, values))
+
+
+def _bump_version():
+    try:
+        return cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+        return None
+
+
+def _apply(update):
+    """Apply an incremental update to the loaded index, if any.
+
+    The shared version is bumped so other processes reload. If it moved
+    on by more than this update, another process changed the data too
+    and the local index is dropped instead of patched.
+    """
+    global _index
+    index = _index
+    version = _bump_version()
+    if index is None:
+        return
+    if version is not None and version == index.version + 1:
+        update(index)
+        index.version = version
+        if index.saturated:
+            _index = None
+    else:
+        _index = None
+
+
+def _fields_of(model):
+    return [field for field, owner in FIELDS.items() if owner is model]
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductInventory)
+def identifiers_saved(sender, instance, created, update_fields, **kwargs):
+    after = {
+        field: instance.__dict__[field]
+        for field in _fields_of(sender)
+        if field in instance.__dict__
+        and (update_fields is None or field in update_fields)
+    }
+    if not after:
+        return
+    before = instance.loaded_values()
+    if created:
+        removed = {}
+    elif set(after) - set(before):
+        # Deferred when loaded, or never loaded: the old value is not
+        # known, so let every process reload
+        transaction.on_commit(invalidate_identifier_index)
+        return
+    else:
+        # Only renames touch the index, so other saves leave every
+        # process's index loaded
+        changed = [f for f in after if before[f] != after[f]]
+        if not changed:
+            return
+        removed = {field: before[field] for field in changed}
+        after = {field: after[field] for field in changed}
+
+    def update(index):
+        for field, value in removed.items():
+            index.discard(field, [value])
+        for field, value in after.items():
+            index.add(field, [value])
+
+    transaction.on_commit(lambda: _apply(update))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductInventory)
+def identifiers_deleted(sender, instance, **kwargs):
+    values = {field: getattr(instance, field) for field in _fields_of(sender)}
+
+    def update(index):
+        for field, value in values.items():
+            index.discard(field, [value])
+
+    transaction.on_commit(lambda: _apply(update))
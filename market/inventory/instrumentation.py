@@ -0,0 +1,153 @@
+"""Per-request SQL instrumentation.
+
+QueryCountMiddleware wraps every database connection with an execute
+wrapper for the duration of a sampled request. Statements are reduced to
+fingerprints (literals and IN lists collapsed) and counted; a fingerprint
+repeated N_PLUS_ONE_THRESHOLD times is reported as a probable N+1 query
+together with the innermost project frame that issued it. The stack is
+only inspected once per fingerprint, when the threshold is reached.
+
+The totals are sent in a Server-Timing header and are available to
+views as ``request.query_stats``. Unsampled requests are not touched, so
+with a small SQL_INSTRUMENTATION_SAMPLE_RATE the middleware can stay on
+in production.
+
+Under ASGI the middleware runs asynchronously, so async views are not
+pushed onto a thread. Database connections belong to the thread that
+runs the request's ORM calls, so the wrappers are installed from there.
+"""
+import asyncio
+import logging
+import random
+import re
+import time
+import traceback
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = getattr(settings, "SQL_INSTRUMENTATION_SAMPLE_RATE", 1.0)
+N_PLUS_ONE_THRESHOLD = getattr(settings, "SQL_N_PLUS_ONE_THRESHOLD", 5)
+
+IN_LIST_RE = re.compile(r"\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)")
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IGNORED_FRAMES = ("/django/", "/asgiref/", "/mptt/", __file__)
+
+
+def fingerprint(sql):
+    """The statement with literals and IN lists collapsed"""
+    sql = IN_LIST_RE.sub("IN (...)", sql)
+    return LITERAL_RE.sub("?", sql)
+
+
+def call_site():
+    """The innermost frame outside Django and this module"""
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if not any(part in frame.filename for part in IGNORED_FRAMES):
+            return "%s:%d in %s" % (frame.filename, frame.lineno, frame.name)
+    return "unknown"
+
+
+class QueryStats:
+    """Queries recorded during one request; usable as an execute
+    wrapper"""
+
+    def __init__(self, threshold=N_PLUS_ONE_THRESHOLD):
+        self.threshold = threshold
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+        # fingerprint -> call site, for probable N+1 queries
+        self.repeated = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+            key = fingerprint(sql)
+            self.fingerprints[key] += 1
+            if self.fingerprints[key] == self.threshold:
+                self.repeated[key] = call_site()
+
+    @property
+    def duplicates(self):
+        return sum(n - 1 for n in self.fingerprints.values() if n > 1)
+
+    def server_timing(self):
+        return 'db;dur=%.1f;desc="%d queries, %d duplicates"' % (
+            self.seconds * 1000,
+            self.count,
+            self.duplicates,
+        )
+
+
+def sampled():
+    return SAMPLE_RATE >= 1 or random.random() < SAMPLE_RATE
+
+
+def wrap_connections(stats):
+    """Install ``stats`` on this thread's connections; close the
+    returned stack to remove it"""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(stats))
+    return stack
+
+
+class QueryCountMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark the instance as a coroutine function the way Django
+            # 4.1's MiddlewareMixin does; asgiref 3.5 has no helper
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not sampled():
+            return self.get_response(request)
+
+        stats = request.query_stats = QueryStats()
+        with wrap_connections(stats):
+            response = self.get_response(request)
+        return self.report(request, response, stats)
+
+    async def __acall__(self, request):
+        if not sampled():
+            return await self.get_response(request)
+
+        stats = request.query_stats = QueryStats()
+        stack = await sync_to_async(wrap_connections)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.report(request, response, stats)
+
+    def report(self, request, response, stats):
+        timing = stats.server_timing()
+        if response.has_header("Server-Timing"):
+            timing = "%s, %s" % (response["Server-Timing"], timing)
+        response["Server-Timing"] = timing
+        for key, site in stats.repeated.items():
+            logger.warning(
+                "Probable N+1 query on %s: %d times from %s: %s",
+                request.path,
+                stats.fingerprints[key],
+                site,
+                key,
+            )
+        return response
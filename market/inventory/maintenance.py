@@ -0,0 +1,36 @@
+"""Bring derived data up to date after bulk writes.
+
+Bulk inserts and database restores send no signals, so nothing keeps
+ProductInventory.product_name, ProductReadModel, CategoryProductCount
+or the in-process snapshots in step with them. Whatever writes the
+catalog that way calls bulk_loaded() once it is done: CatalogLoader,
+the snapshot restore and, through the loader, the load-fixtures
+command.
+"""
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from market.inventory import category_counts, read_model
+from market.inventory.category_tree import invalidate_category_tree
+from market.inventory.facets import invalidate_facet_engine
+from market.inventory.identifiers import invalidate_identifier_index
+from market.inventory.models import ProductInventory
+
+INVALIDATIONS = [
+    invalidate_category_tree,
+    invalidate_facet_engine,
+    invalidate_identifier_index,
+    category_counts.invalidate_product_counts,
+]
+
+
+def bulk_loaded(using=DEFAULT_DB_ALIAS, derived=True):
+    """Copy product names to the items, rebuild the read model and
+    recount the categories unless ``derived`` is False, then invalidate
+    every snapshot on commit"""
+    with transaction.atomic(using=using):
+        if derived:
+            ProductInventory.objects.using(using).sync_product_names()
+            read_model.rebuild(using=using)
+            category_counts.recount(using=using)
+        for invalidate in INVALIDATIONS:
+            transaction.on_commit(invalidate, using=using)
@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from market.inventory import identifiers, pricing
+
+
+class Command(BaseCommand):
+    help = (
+        "Count which sku, upc and/or web_id values of a CSV or JSONL feed "
+        "are new to the catalog and which already exist."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="Feed file, or - for stdin.")
+        parser.add_argument(
+            "--format",
+            choices=pricing.FORMATS,
+            help="File format (default: from the file extension).",
+        )
+        parser.add_argument(
+            "--field",
+            action="append",
+            choices=list(identifiers.FIELDS),
+            help="Column to check; repeat for several (default: sku).",
+        )
+        parser.add_argument(
+            "--list-new",
+            action="store_true",
+            help="Print the new values, one per line.",
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        path = options["file"]
+        format = options["format"]
+        if format is None:
+            format = os.path.splitext(path)[1].lstrip(".").lower()
+            if format not in pricing.FORMATS:
+                raise CommandError("Pass --format for %s" % path)
+        fields = options["field"] or ["sku"]
+
+        start = time.perf_counter()
+        if path == "-":
+            values = self.read_values(sys.stdin, format, fields)
+        else:
+            with open(path, encoding="utf-8", newline="") as stream:
+                values = self.read_values(stream, format, fields)
+        read = time.perf_counter()
+        identifiers.get_identifier_index()
+        loaded = time.perf_counter()
+        for field in fields:
+            new, existing = identifiers.classify(
+                field, values[field], using=options["database"]
+            )
+            if options["list_new"]:
+                for value in sorted(new):
+                    self.stdout.write(value)
+            self.stdout.write(
+                "%s: %d new, %d existing" % (field, len(new), len(existing))
+            )
+        self.stdout.write(
+            "Read in %.2fs, index loaded in %.2fs, classified in %.2fs"
+            % (
+                read - start,
+                loaded - read,
+                time.perf_counter() - loaded,
+            )
+        )
+
+    def read_values(self, stream, format, fields):
+        values = {field: [] for field in fields}
+        for line, record in pricing.read_records(stream, format):
+            if isinstance(record, Exception):
+                self.stderr.write("line %d: %s" % (line, record))
+                continue
+            for field in fields:
+                value = str(record.get(field) or "").strip()
+                if value:
+                    values[field].append(value)
+        return values
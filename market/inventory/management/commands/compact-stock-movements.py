@@ -0,0 +1,38 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from market.inventory.stock import DEFAULT_CHUNK_SIZE, compact
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold pending stock movements into the Stock rows; schedule it, "
+        "e.g. every minute."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Movements folded per transaction.",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database to compact the movements in.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("The batch size must be at least 1.")
+        start = time.perf_counter()
+        folded = compact(
+            batch_size=options["batch_size"], using=options["database"]
+        )
+        self.stdout.write(
+            "Compacted %d stock movement(s) in %.2fs"
+            % (folded, time.perf_counter() - start)
+        )
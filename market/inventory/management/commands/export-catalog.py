@@ -0,0 +1,60 @@
+import sys
+import time
+
+from django.core.management import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from market.inventory import export
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream the catalog (items with their product, brand, type, stock, "
+        "image and attributes) to CSV or JSONL in constant memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format", choices=sorted(export.FORMATS), default="csv"
+        )
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument(
+            "--output", default="-", help="Output file, - for stdout."
+        )
+        parser.add_argument(
+            "--active-only",
+            action="store_true",
+            help="Skip inactive items and items of inactive products.",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=export.DEFAULT_CHUNK_SIZE
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        blocks = export.export(
+            options["format"],
+            gzip=options["gzip"],
+            active_only=options["active_only"],
+            chunk_size=options["chunk_size"],
+            using=options["database"],
+        )
+        written = 0
+        if options["output"] == "-":
+            output = sys.stdout.buffer
+        else:
+            output = open(options["output"], "wb")
+        try:
+            for block in blocks:
+                output.write(block)
+                written += len(block)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+            else:
+                output.flush()
+        self.stderr.write(
+            "Wrote %d byte(s) in %.2fs"
+            % (written, time.perf_counter() - start)
+        )
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management import BaseCommand
+
+from market.inventory import renditions
+from market.inventory.models import Brand, Media
+
+MODELS = {"media": Media, "brand": Brand}
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the declared renditions of product and brand images "
+        "and record their dimensions, using a pool of processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "models",
+            nargs="*",
+            choices=sorted(MODELS),
+            help="Image tables to process (default: all).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Worker processes (default: one per CPU; 0: none).",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate renditions that are already current.",
+        )
+
+    def handle(self, *args, **options):
+        for name in options["models"] or sorted(MODELS):
+            start = time.perf_counter()
+            rendered, failed = renditions.generate(
+                MODELS[name].objects.all(),
+                workers=options["workers"],
+                force=options["force"],
+            )
+            self.stdout.write(
+                "%s: rendered %d image(s), %d unreadable, in %.2fs"
+                % (name, rendered, failed, time.perf_counter() - start)
+            )
@@ -0,0 +1,99 @@
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from market.inventory.models import Brand, Media, ProductReadModel
+from market.inventory.storage import (
+    ContentAddressedStorage,
+    content_hash,
+    hashed_name,
+    is_hashed,
+)
+
+# Models storing image names; the ones with updated_at get it bumped
+REFERENCES = [Media, Brand, ProductReadModel]
+
+
+def referenced_names():
+    names = set()
+    for model in REFERENCES:
+        names.update(
+            model.objects.order_by().values_list("image", flat=True).distinct()
+        )
+    return sorted(name for name in names if name and not is_hashed(name))
+
+
+def rewrite(old, new):
+    """Point every row referencing ``old`` at ``new``; returns the
+    number of rows changed"""
+    rows = 0
+    with transaction.atomic():
+        for model in REFERENCES:
+            changes = {"image": new}
+            if any(f.name == "updated_at" for f in model._meta.fields):
+                changes["updated_at"] = timezone.now()
+            rows += model.objects.filter(image=old).update(**changes)
+    return rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the images referenced by the catalog into content-addressed "
+        "sharded storage and rewrite the rows that reference them. "
+        "Identical files are stored once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would move without writing anything.",
+        )
+        parser.add_argument(
+            "--delete-originals",
+            action="store_true",
+            help="Delete each original once no row references it.",
+        )
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, ContentAddressedStorage):
+            raise CommandError(
+                "DEFAULT_FILE_STORAGE is not "
+                "market.inventory.storage.ContentAddressedStorage"
+            )
+        dry_run = options["dry_run"]
+        moved, rows, missing, stored = 0, 0, 0, set()
+        for name in referenced_names():
+            if not default_storage.exists(name):
+                self.stderr.write("Missing file, row(s) left as is: " + name)
+                missing += 1
+                continue
+            with default_storage.open(name) as file:
+                if dry_run:
+                    new = hashed_name(name, content_hash(file))
+                else:
+                    new = default_storage.save(name, file)
+            stored.add(new)
+            moved += 1
+            if dry_run:
+                self.stdout.write("%s -> %s" % (name, new))
+                continue
+            rows += rewrite(name, new)
+            if options["delete_originals"]:
+                default_storage.delete(name)
+        self.stdout.write(
+            "%s %d file(s) into %d content-addressed file(s), rewrote %d "
+            "row(s), %d missing"
+            % (
+                "Would move" if dry_run else "Moved",
+                moved,
+                len(stored),
+                rows,
+                missing,
+            )
+        )
+        if moved and not dry_run:
+            self.stdout.write(
+                "Image renditions are stale now; run generate-renditions."
+            )
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from market.inventory import read_model
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized product read model in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database whose read model is rebuilt.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        items = read_model.rebuild(using=options["database"])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            "Rebuilt %d read model row(s) in %.2fs" % (items, elapsed)
+        )
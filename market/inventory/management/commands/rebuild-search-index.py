@@ -0,0 +1,38 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from market.inventory import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product full text search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database whose index is rebuilt.",
+        )
+        parser.add_argument(
+            "--optimize",
+            action="store_true",
+            help="Also merge the index into a single b-tree.",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        if not search.is_supported(using):
+            raise CommandError(
+                "Full text search index requires an SQLite database."
+            )
+        connection = connections[using]
+        start = time.perf_counter()
+        with transaction.atomic(using=using):
+            search.rebuild_index(connection)
+            if options["optimize"]:
+                search.optimize_index(connection)
+        self.stdout.write(
+            "Rebuilt search index in %.2fs" % (time.perf_counter() - start)
+        )
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from market.inventory import category_counts
+
+
+class Command(BaseCommand):
+    help = "Recount the active products of every category in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database whose counts are recounted.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        categories = category_counts.recount(using=options["database"])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            "Recounted %d categories in %.2fs" % (categories, elapsed)
+        )
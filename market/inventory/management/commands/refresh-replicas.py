@@ -0,0 +1,46 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from market.inventory import replicas
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database onto the local read replicas in "
+        "settings.DATABASE_REPLICAS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "aliases",
+            nargs="*",
+            help="Replicas to refresh; all of them by default.",
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "--every",
+            type=float,
+            help="Keep refreshing, waiting this many seconds between runs.",
+        )
+
+    def handle(self, *args, **options):
+        aliases = options["aliases"] or replicas.replicas()
+        if not aliases:
+            raise CommandError("No replicas configured.")
+        while True:
+            start = time.perf_counter()
+            try:
+                copied = replicas.refresh(aliases, using=options["database"])
+            except ValueError as e:
+                raise CommandError(e)
+            for alias, pages in copied.items():
+                self.stdout.write("Copied %d page(s) to %s" % (pages, alias))
+            self.stdout.write(
+                "Refreshed %d replica(s) in %.2fs"
+                % (len(copied), time.perf_counter() - start)
+            )
+            if not options["every"]:
+                return
+            time.sleep(options["every"])
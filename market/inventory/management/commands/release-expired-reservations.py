@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from market.inventory.stock import release_expired
+
+
+class Command(BaseCommand):
+    help = "Return the units of expired stock reservations to stock."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database to release reservations in.",
+        )
+
+    def handle(self, *args, **options):
+        units = release_expired(using=options["database"])
+        self.stdout.write("Released %d reserved unit(s)" % units)
@@ -0,0 +1,68 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from market.inventory import sqlite
+
+
+class Command(BaseCommand):
+    help = (
+        "Run PRAGMA optimize and checkpoint the write-ahead log of an "
+        "SQLite database; schedule it, e.g. hourly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "--checkpoint",
+            default="TRUNCATE",
+            choices=["PASSIVE", "FULL", "RESTART", "TRUNCATE"],
+            help="wal_checkpoint mode; PASSIVE never waits for readers.",
+        )
+        parser.add_argument(
+            "--vacuum",
+            action="store_true",
+            help="Also rebuild the file to reclaim free pages. Holds the "
+            "write lock for the whole run.",
+        )
+        parser.add_argument(
+            "--show",
+            action="store_true",
+            help="Print the pragmas in effect on this connection.",
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if connection.vendor != "sqlite":
+            raise CommandError("%s is not an SQLite database" % connection)
+        if options["show"]:
+            for name, value in sqlite.read_pragmas(connection).items():
+                self.stdout.write("%s: %s" % (name, value))
+
+        start = time.perf_counter()
+        sqlite.optimize(connection)
+        if options["vacuum"]:
+            with connection.cursor() as cursor:
+                cursor.execute("VACUUM")
+        journal_mode = sqlite.read_pragmas(connection, ["journal_mode"])[
+            "journal_mode"
+        ]
+        if journal_mode != "wal":
+            self.stdout.write(
+                "Optimized in %.2fs; no WAL to checkpoint (journal_mode=%s)"
+                % (time.perf_counter() - start, journal_mode)
+            )
+            return
+        busy, log, checkpointed = sqlite.checkpoint(
+            connection, options["checkpoint"]
+        )
+        if busy:
+            self.stderr.write(
+                "Checkpoint blocked by readers or writers; "
+                "%d of %d WAL pages copied" % (checkpointed, log)
+            )
+        self.stdout.write(
+            "Optimized and checkpointed %d WAL page(s) in %.2fs"
+            % (checkpointed, time.perf_counter() - start)
+        )
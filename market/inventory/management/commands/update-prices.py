@@ -0,0 +1,91 @@
+import os
+import sys
+
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from market.inventory import pricing
+
+
+class Command(BaseCommand):
+    help = (
+        "Reprice product inventory from a CSV or JSONL file of sku and "
+        "retail_price, store_price and/or sale_price, in chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="Price file, or - for stdin.")
+        parser.add_argument(
+            "--format",
+            choices=pricing.FORMATS,
+            help="File format (default: from the file extension).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print the price changes without applying them.",
+        )
+        parser.add_argument(
+            "--skip-invalid",
+            action="store_true",
+            help="Apply the valid records even if others are invalid.",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=pricing.DEFAULT_CHUNK_SIZE
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        path = options["file"]
+        format = options["format"]
+        if format is None:
+            format = os.path.splitext(path)[1].lstrip(".").lower()
+            if format not in pricing.FORMATS:
+                raise CommandError("Pass --format for %s" % path)
+
+        def diff(sku, field, old, new):
+            self.stdout.write("%s %s: %s -> %s" % (sku, field, old, new))
+
+        options = {
+            "chunk_size": options["chunk_size"],
+            "dry_run": options["dry_run"],
+            "skip_invalid": options["skip_invalid"],
+            "diff": diff if options["dry_run"] else None,
+            "using": options["database"],
+        }
+        try:
+            if path == "-":
+                report = pricing.update_prices_from(
+                    sys.stdin, format, **options
+                )
+            else:
+                with open(path, encoding="utf-8", newline="") as stream:
+                    report = pricing.update_prices_from(
+                        stream, format, **options
+                    )
+        except pricing.PriceUpdateError as e:
+            self.write_errors(e.report)
+            raise CommandError("%s; nothing was changed" % e)
+        self.write_errors(report)
+        self.stdout.write(
+            "%s %d item(s), %d unchanged, %d unknown sku(s), %d invalid; "
+            "%d record(s) in %.2fs (%.0f/s)"
+            % (
+                "Would update" if report.dry_run else "Updated",
+                report.updated,
+                report.unchanged,
+                report.unknown,
+                report.invalid,
+                report.read,
+                report.seconds,
+                report.rows_per_second,
+            )
+        )
+
+    def write_errors(self, report):
+        for line, message in report.errors:
+            self.stderr.write("line %d: %s" % (line, message))
+        if report.invalid > len(report.errors):
+            self.stderr.write(
+                "... and %d more" % (report.invalid - len(report.errors))
+            )
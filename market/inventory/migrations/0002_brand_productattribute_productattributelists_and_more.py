@@ -0,0 +1,411 @@
+# Generated by Django 4.1.3 on 2026-10-18 17:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Brand",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="format: required, unique, max-255",
+                        max_length=255,
+                        unique=True,
+                        verbose_name="brand name",
+                    ),
+                ),
+                (
+                    "image",
+                    models.ImageField(
+                        default="images/default.png",
+                        help_text="format: required, default-default.png",
+                        upload_to="images/",
+                        verbose_name="brand image",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ProductAttribute",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="format: required, unique, max characters-255",
+                        max_length=255,
+                        unique=True,
+                        verbose_name="product attribute name",
+                    ),
+                ),
+                (
+                    "description",
+                    models.TextField(
+                        help_text="format: required",
+                        verbose_name="product attribute description",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ProductAttributeLists",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ProductAttributeValue",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "attribute_value",
+                    models.CharField(
+                        help_text="format: required, max characters-255",
+                        max_length=255,
+                        verbose_name="attribute value",
+                    ),
+                ),
+                (
+                    "product_attribute",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="product_attribute",
+                        to="inventory.productattribute",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ProductInventory",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "sku",
+                    models.CharField(
+                        help_text="format: required, unique, max characters-20",
+                        max_length=20,
+                        unique=True,
+                        verbose_name="stock keeping unit",
+                    ),
+                ),
+                (
+                    "upc",
+                    models.CharField(
+                        help_text="format: required, unique, max characters-12",
+                        max_length=12,
+                        unique=True,
+                        verbose_name="universal product code",
+                    ),
+                ),
+                (
+                    "is_active",
+                    models.BooleanField(
+                        default=True,
+                        help_text="format: true=product visible",
+                        verbose_name="product visibility",
+                    ),
+                ),
+                (
+                    "retail_price",
+                    models.DecimalField(
+                        decimal_places=2,
+                        error_messages={
+                            "name": {
+                                "max_length": "the price must be between 0 and 9999.99 ."
+                            }
+                        },
+                        help_text="format: maximum price 9999.99",
+                        max_digits=6,
+                        verbose_name="recommended retail price",
+                    ),
+                ),
+                (
+                    "store_price",
+                    models.DecimalField(
+                        decimal_places=2,
+                        error_messages={
+                            "name": {
+                                "max_length": "the price must be between 0 and 9999.99."
+                            }
+                        },
+                        help_text="format: maximum price 9999.99",
+                        max_digits=6,
+                        verbose_name="regular store price",
+                    ),
+                ),
+                (
+                    "sale_price",
+                    models.DecimalField(
+                        decimal_places=2,
+                        error_messages={
+                            "name": {
+                                "max_length": "the price must be between 0 and 9999.99."
+                            }
+                        },
+                        help_text="format: maximum price 9999.99",
+                        max_digits=6,
+                        verbose_name="sale price",
+                    ),
+                ),
+                ("weight", models.FloatField(verbose_name="product weight")),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="format: Y-m-d H:M:S",
+                        verbose_name="date sub-product created",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True,
+                        help_text="format: Y-m-d H:M:S",
+                        verbose_name="date sub-product updated",
+                    ),
+                ),
+                (
+                    "attribute_values",
+                    models.ManyToManyField(
+                        related_name="product_attribute_values",
+                        through="inventory.ProductAttributeLists",
+                        to="inventory.productattributevalue",
+                    ),
+                ),
+                (
+                    "brand",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="brand",
+                        to="inventory.brand",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="product",
+                        to="inventory.product",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ProductType",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="format: required, unique, max characters-255",
+                        max_length=255,
+                        unique=True,
+                        verbose_name="type of product",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Stock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "last_checked",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="format: Y-m-d H:M:S, null-true, blank-true",
+                        null=True,
+                        verbose_name="inventory stock check date",
+                    ),
+                ),
+                (
+                    "units",
+                    models.IntegerField(
+                        default=0,
+                        help_text="format: required, default-0",
+                        verbose_name="units/qty of stock",
+                    ),
+                ),
+                (
+                    "units_sold",
+                    models.IntegerField(
+                        default=0,
+                        help_text="format: required, default-0",
+                        verbose_name="units sold to date",
+                    ),
+                ),
+                (
+                    "product_inventory",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="product_inventory",
+                        to="inventory.productinventory",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="productinventory",
+            name="product_type",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="product_type",
+                to="inventory.producttype",
+            ),
+        ),
+        migrations.AddField(
+            model_name="productattributelists",
+            name="attributevalues",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="attribute_values",
+                to="inventory.productattributevalue",
+            ),
+        ),
+        migrations.AddField(
+            model_name="productattributelists",
+            name="productinventory",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="product_inventory_atribute",
+                to="inventory.productinventory",
+            ),
+        ),
+        migrations.CreateModel(
+            name="Media",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "image",
+                    models.ImageField(
+                        default="images/default.png",
+                        help_text="format: required, default-default.png",
+                        upload_to="images/",
+                        verbose_name="product image",
+                    ),
+                ),
+                (
+                    "alt_text",
+                    models.CharField(
+                        help_text="format: required, max characters-255",
+                        max_length=255,
+                        verbose_name="alternative text",
+                    ),
+                ),
+                (
+                    "is_featured",
+                    models.BooleanField(
+                        default=False,
+                        help_text="format: default=false, true=default image",
+                        verbose_name="product default image",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="format: Y-m-d H:M:S",
+                        verbose_name="product visibility",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True,
+                        help_text="format: Y-m-d H:M:S",
+                        verbose_name="date sub-product created",
+                    ),
+                ),
+                (
+                    "product_inventory",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="media_product_inventory",
+                        to="inventory.productinventory",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "product image",
+                "verbose_name_plural": "product images",
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name="productattributelists",
+            unique_together={("attributevalues", "productinventory")},
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.3 on 2026-10-18 17:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0002_brand_productattribute_productattributelists_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["name", "id"], name="product_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="productinventory",
+            index=models.Index(
+                fields=["created_at", "id"], name="inventory_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productinventory",
+            index=models.Index(fields=["sale_price", "id"], name="inventory_price_idx"),
+        ),
+    ]
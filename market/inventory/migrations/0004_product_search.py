@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from market.inventory import search
+
+
+def create_search_index(apps, schema_editor):
+    if search.is_supported(schema_editor.connection.alias):
+        search.create_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    if search.is_supported(schema_editor.connection.alias):
+        search.drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0003_listing_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
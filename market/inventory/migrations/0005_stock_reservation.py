@@ -0,0 +1,79 @@
+# Generated by Django 4.1.3 on 2026-10-18 17:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0004_product_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="stock",
+            name="units_reserved",
+            field=models.IntegerField(
+                default=0,
+                help_text="format: required, default-0",
+                verbose_name="units held by open reservations",
+            ),
+        ),
+        migrations.CreateModel(
+            name="StockReservation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "reservation_id",
+                    models.UUIDField(
+                        db_index=True,
+                        help_text="format: required, shared by every line of a cart",
+                        verbose_name="reservation ID",
+                    ),
+                ),
+                (
+                    "units",
+                    models.PositiveIntegerField(
+                        help_text="format: required", verbose_name="units reserved"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="format: Y-m-d H:M:S",
+                        verbose_name="date reservation created",
+                    ),
+                ),
+                (
+                    "expires_at",
+                    models.DateTimeField(
+                        db_index=True,
+                        help_text="format: Y-m-d H:M:S",
+                        verbose_name="date reservation expires",
+                    ),
+                ),
+                (
+                    "product_inventory",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="stock_reservations",
+                        to="inventory.productinventory",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "stock reservation",
+                "verbose_name_plural": "stock reservations",
+            },
+        ),
+    ]
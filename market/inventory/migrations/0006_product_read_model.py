@@ -0,0 +1,107 @@
+# Generated by Django 4.1.3 on 2026-10-18 17:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0005_stock_reservation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductReadModel",
+            fields=[
+                (
+                    "product_inventory",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="read_model",
+                        serialize=False,
+                        to="inventory.productinventory",
+                    ),
+                ),
+                ("sku", models.CharField(max_length=20, unique=True)),
+                ("upc", models.CharField(max_length=12)),
+                ("web_id", models.CharField(db_index=True, max_length=50)),
+                ("slug", models.SlugField(max_length=255)),
+                ("name", models.CharField(max_length=255)),
+                ("description", models.TextField()),
+                ("brand_name", models.CharField(max_length=255)),
+                ("product_type_name", models.CharField(max_length=255)),
+                (
+                    "is_active",
+                    models.BooleanField(
+                        help_text="format: true=item and product visible",
+                        verbose_name="item visibility",
+                    ),
+                ),
+                ("retail_price", models.DecimalField(decimal_places=2, max_digits=6)),
+                ("store_price", models.DecimalField(decimal_places=2, max_digits=6)),
+                ("sale_price", models.DecimalField(decimal_places=2, max_digits=6)),
+                ("weight", models.FloatField()),
+                ("image", models.CharField(blank=True, max_length=255)),
+                ("image_alt_text", models.CharField(blank=True, max_length=255)),
+                (
+                    "units",
+                    models.IntegerField(default=0, verbose_name="units/qty of stock"),
+                ),
+                ("in_stock", models.BooleanField(default=False)),
+                (
+                    "attributes",
+                    models.JSONField(
+                        default=dict,
+                        help_text="format: {attribute name: value}",
+                        verbose_name="attribute values",
+                    ),
+                ),
+                (
+                    "product_min_price",
+                    models.DecimalField(
+                        decimal_places=2,
+                        max_digits=6,
+                        null=True,
+                        verbose_name="lowest sale price of the product",
+                    ),
+                ),
+                (
+                    "product_max_price",
+                    models.DecimalField(
+                        decimal_places=2,
+                        max_digits=6,
+                        null=True,
+                        verbose_name="highest sale price of the product",
+                    ),
+                ),
+                (
+                    "product_in_stock",
+                    models.BooleanField(
+                        default=False, verbose_name="any item of the product in stock"
+                    ),
+                ),
+                (
+                    "refreshed_at",
+                    models.DateTimeField(
+                        auto_now=True,
+                        help_text="format: Y-m-d H:M:S",
+                        verbose_name="date read model refreshed",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="read_models",
+                        to="inventory.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "product read model",
+                "verbose_name_plural": "product read models",
+            },
+        ),
+    ]
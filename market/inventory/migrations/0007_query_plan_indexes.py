@@ -0,0 +1,36 @@
+# Generated by Django 4.1.3 on 2026-10-18 17:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0006_product_read_model"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="media",
+            index=models.Index(
+                condition=models.Q(("is_featured", True)),
+                fields=["product_inventory"],
+                name="media_featured_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["created_at", "id"],
+                name="product_active_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productinventory",
+            index=models.Index(
+                fields=["product", "is_active"],
+                name="inventory_product_active_idx",
+            ),
+        ),
+    ]
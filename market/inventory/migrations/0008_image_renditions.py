@@ -0,0 +1,79 @@
+# Generated by Django 4.1.3 on 2026-10-18 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0007_query_plan_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="brand",
+            name="height",
+            field=models.PositiveIntegerField(
+                blank=True,
+                editable=False,
+                help_text="format: pixels, set when renditions are generated",
+                null=True,
+                verbose_name="image height",
+            ),
+        ),
+        migrations.AddField(
+            model_name="brand",
+            name="renditions",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                help_text="format: rendition name to storage name and size",
+                verbose_name="image renditions",
+            ),
+        ),
+        migrations.AddField(
+            model_name="brand",
+            name="width",
+            field=models.PositiveIntegerField(
+                blank=True,
+                editable=False,
+                help_text="format: pixels, set when renditions are generated",
+                null=True,
+                verbose_name="image width",
+            ),
+        ),
+        migrations.AddField(
+            model_name="media",
+            name="height",
+            field=models.PositiveIntegerField(
+                blank=True,
+                editable=False,
+                help_text="format: pixels, set when renditions are generated",
+                null=True,
+                verbose_name="image height",
+            ),
+        ),
+        migrations.AddField(
+            model_name="media",
+            name="renditions",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                help_text="format: rendition name to storage name and size",
+                verbose_name="image renditions",
+            ),
+        ),
+        migrations.AddField(
+            model_name="media",
+            name="width",
+            field=models.PositiveIntegerField(
+                blank=True,
+                editable=False,
+                help_text="format: pixels, set when renditions are generated",
+                null=True,
+                verbose_name="image width",
+            ),
+        ),
+    ]
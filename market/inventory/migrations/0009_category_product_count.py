@@ -0,0 +1,49 @@
+# Generated by Django 4.1.3 on 2026-10-18 18:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0008_image_renditions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategoryProductCount",
+            fields=[
+                (
+                    "category",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="product_count",
+                        serialize=False,
+                        to="inventory.category",
+                    ),
+                ),
+                (
+                    "direct",
+                    models.IntegerField(
+                        default=0,
+                        help_text="format: required, default-0",
+                        verbose_name="active products in the category",
+                    ),
+                ),
+                (
+                    "cumulative",
+                    models.IntegerField(
+                        default=0,
+                        help_text="format: required, default-0",
+                        verbose_name="active products in the category and below",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "category product count",
+                "verbose_name_plural": "category product counts",
+            },
+        ),
+    ]
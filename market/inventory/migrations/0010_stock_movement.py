@@ -0,0 +1,96 @@
+# Generated by Django 4.1.3 on 2026-10-18 18:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0009_category_product_count"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "delta",
+                    models.IntegerField(
+                        help_text="format: required, negative for units leaving stock",
+                        verbose_name="change in units on hand",
+                    ),
+                ),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("sale", "sale"),
+                            ("restock", "restock"),
+                            ("return", "return"),
+                            ("adjustment", "adjustment"),
+                        ],
+                        help_text="format: required",
+                        max_length=20,
+                        verbose_name="reason for the change",
+                    ),
+                ),
+                (
+                    "reference",
+                    models.CharField(
+                        blank=True,
+                        help_text="format: not required",
+                        max_length=64,
+                        verbose_name="order, reservation or document reference",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="format: Y-m-d H:M:S",
+                        verbose_name="date of the movement",
+                    ),
+                ),
+                (
+                    "compacted_at",
+                    models.DateTimeField(
+                        blank=True,
+                        editable=False,
+                        help_text="format: Y-m-d H:M:S, null until compacted",
+                        null=True,
+                        verbose_name="date folded into stock",
+                    ),
+                ),
+                (
+                    "product_inventory",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="stock_movements",
+                        to="inventory.productinventory",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "stock movement",
+                "verbose_name_plural": "stock movements",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="stockmovement",
+            index=models.Index(
+                condition=models.Q(("compacted_at__isnull", True)),
+                fields=["product_inventory", "id"],
+                name="stockmovement_pending_idx",
+            ),
+        ),
+    ]
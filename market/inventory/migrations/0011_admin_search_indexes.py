@@ -0,0 +1,25 @@
+# Generated by Django 4.1.3 on 2026-10-18 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0010_stock_movement"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="productattributevalue",
+            index=models.Index(
+                fields=["attribute_value"], name="attribute_value_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stockmovement",
+            index=models.Index(
+                fields=["reference"], name="stockmovement_reference_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.1.3 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+
+def copy_product_names(apps, schema_editor):
+    Product = apps.get_model("inventory", "Product")
+    ProductInventory = apps.get_model("inventory", "ProductInventory")
+    ProductInventory.objects.using(schema_editor.connection.alias).update(
+        product_name=models.Subquery(
+            Product.objects.filter(pk=models.OuterRef("product_id")).values(
+                "name"
+            )[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0011_admin_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productinventory",
+            name="product_name",
+            field=models.CharField(
+                default="",
+                editable=False,
+                max_length=255,
+                verbose_name="product name",
+            ),
+        ),
+        migrations.RunPython(copy_product_names, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="productinventory",
+            index=models.Index(
+                fields=["product_name", "id"], name="inventory_name_idx"
+            ),
+        ),
+    ]
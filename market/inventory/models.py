@@ -1,7 +1,57 @@
 from django.db import models
+from django.db.models import DEFERRED
+from django.db.models.functions import Coalesce
 from django.utils.translation import gettext_lazy as _
 from mptt.models import MPTTModel, TreeForeignKey, TreeManyToManyField
 
+from market.inventory.pagination import (
+    DEFAULT_PAGE_SIZE,
+    keyset_page,
+    keyset_queryset,
+)
+from market.inventory.search import search as full_text_search
+
+
+class LoadedRowMixin:
+    """Remembers the row an instance was loaded with or last saved, so
+    signal receivers can tell what a save changes without a SELECT"""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Kept as is; most loaded instances are never saved
+        instance._loaded_row = (field_names, values)
+        return instance
+
+    def loaded_values(self):
+        """{attname: value} as loaded or last saved. Deferred fields are
+        missing, and every field is for an instance never loaded."""
+        row = self.__dict__.get("_loaded_row")
+        if row is None:
+            return {}
+        if isinstance(row, tuple):
+            field_names, values = row
+            row = self._loaded_row = {
+                name: value
+                for name, value in zip(field_names, values)
+                if value is not DEFERRED
+            }
+        return row
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # After the post_save receivers compared against the old row
+        update_fields = kwargs.get("update_fields")
+        self._loaded_row = dict(
+            self.loaded_values(),
+            **{
+                field.attname: self.__dict__[field.attname]
+                for field in self._meta.concrete_fields
+                if field.attname in self.__dict__
+                and (update_fields is None or field.name in update_fields)
+            },
+        )
+
 
 class Category(MPTTModel):
     """Inventoryt category table implemented with MPTT"""
@@ -48,7 +98,56 @@ class Category(MPTTModel):
         return self.name
 
 
-class Product(models.Model):
+def category_links(category, product, include_descendants=True):
+    """Product.category link rows of ``product`` inside a category.
+
+    ``category`` may be a Category, a node of the category tree snapshot
+    or a primary key, which is resolved from the snapshot without a
+    query. The subtree is matched on the lft/rght range so callers can
+    wrap this in EXISTS instead of joining and using DISTINCT.
+    """
+    if not hasattr(category, "lft"):
+        from market.inventory.category_tree import get_category_tree
+
+        category = get_category_tree().get(int(category))
+    links = Product.category.through.objects.filter(product_id=product)
+    if include_descendants:
+        return links.filter(
+            category__tree_id=category.tree_id,
+            category__lft__gte=category.lft,
+            category__rght__lte=category.rght,
+        )
+    return links.filter(category_id=category.id)
+
+
+class ProductQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(is_active=True)
+
+    def in_category(self, category, include_descendants=True):
+        return self.filter(
+            models.Exists(
+                category_links(
+                    category, models.OuterRef("pk"), include_descendants
+                )
+            )
+        )
+
+    def search(self, query, category=None, is_active=True):
+        """Full text search on name and description, best match first.
+
+        Optionally restricted to a category subtree and to products with
+        the given visibility (pass is_active=None for all products).
+        """
+        queryset = self
+        if is_active is not None:
+            queryset = queryset.filter(is_active=is_active)
+        if category is not None:
+            queryset = queryset.in_category(category)
+        return full_text_search(queryset, query)
+
+
+class Product(LoadedRowMixin, models.Model):
     """
     Product details table
     """
@@ -107,9 +206,31 @@ class Product(models.Model):
         help_text=_("format: Y-m-d H:M:S"),
     )
 
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Products sorted by name
+            models.Index(fields=["name", "id"], name="product_name_idx"),
+            # Newest visible products; hidden ones are left out
+            models.Index(
+                fields=["created_at", "id"],
+                condition=models.Q(is_active=True),
+                name="product_active_created_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        renamed = self.loaded_values().get("name", self.name) != self.name
+        super().save(*args, **kwargs)
+        if renamed:
+            ProductInventory.objects.using(self._state.db).filter(
+                product=self
+            ).update(product_name=self.name)
+
 
 class ProductType(models.Model):
     """
@@ -151,6 +272,27 @@ class Brand(models.Model):
         default="images/default.png",
         help_text=_("format: required, default-default.png"),
     )
+    width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("image width"),
+        help_text=_("format: pixels, set when renditions are generated"),
+    )
+    height = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("image height"),
+        help_text=_("format: pixels, set when renditions are generated"),
+    )
+    renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name=_("image renditions"),
+        help_text=_("format: rendition name to storage name and size"),
+    )
 
 
 class ProductAttribute(models.Model):
@@ -193,11 +335,78 @@ class ProductAttributeValue(models.Model):
         help_text=_("format: required, max characters-255"),
     )
 
+    class Meta:
+        indexes = [
+            # Admin search
+            models.Index(
+                fields=["attribute_value"], name="attribute_value_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.product_attribute.name} : {self.attribute_value}"
 
 
-class ProductInventory(models.Model):
+class ProductInventoryQuerySet(models.QuerySet):
+    # Public sort names accepted by subtree_listing and their lookups.
+    # The keyset is (lookup, id), so each one is a column of
+    # ProductInventory with a (column, id) index.
+    LISTING_ORDERINGS = {
+        "created_at": "created_at",
+        "sale_price": "sale_price",
+        "name": "product_name",
+    }
+
+    def active(self):
+        return self.filter(is_active=True, product__is_active=True)
+
+    def sync_product_names(self):
+        """Copy each product's name to its items, after writes that
+        bypass Product.save(); returns the number of items"""
+        return self.update(
+            product_name=models.Subquery(
+                Product.objects.filter(
+                    pk=models.OuterRef("product_id")
+                ).values("name")[:1]
+            )
+        )
+
+    def in_category(self, category, include_descendants=True):
+        """Items whose product is linked to the category or, by default,
+        to any category in its subtree. See category_links()."""
+        return self.filter(
+            models.Exists(
+                category_links(
+                    category,
+                    models.OuterRef("product_id"),
+                    include_descendants,
+                )
+            )
+        )
+
+    def subtree_listing(
+        self, category, order="-created_at", cursor=None, page_size=None
+    ):
+        """One keyset paginated page of the active items under a
+        category, sorted by created_at, sale_price or name"""
+        return keyset_page(
+            self.subtree_keyset(category, order, cursor),
+            order,
+            page_size or DEFAULT_PAGE_SIZE,
+        )
+
+    def subtree_keyset(self, category, order="-created_at", cursor=None):
+        """The sorted queryset behind subtree_listing(), before it is cut
+        to a page"""
+        return keyset_queryset(
+            self.active().in_category(category).select_related("product"),
+            order,
+            self.LISTING_ORDERINGS,
+            cursor=cursor,
+        )
+
+
+class ProductInventory(LoadedRowMixin, models.Model):
     """Product inventory table"""
 
     sku = models.CharField(
@@ -222,6 +431,14 @@ class ProductInventory(models.Model):
     product = models.ForeignKey(
         Product, related_name="product", on_delete=models.PROTECT
     )
+    # Copy of product.name for name ordered listings, kept in step by
+    # Product.save() and ProductInventory.save()
+    product_name = models.CharField(
+        max_length=255,
+        default="",
+        editable=False,
+        verbose_name=_("product name"),
+    )
     brand = models.ForeignKey(
         Brand, related_name="brand", on_delete=models.PROTECT
     )
@@ -295,9 +512,39 @@ class ProductInventory(models.Model):
         help_text=_("format: Y-m-d H:M:S"),
     )
 
+    objects = ProductInventoryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of listings (sort key, id)
+            models.Index(
+                fields=["created_at", "id"], name="inventory_created_idx"
+            ),
+            models.Index(
+                fields=["sale_price", "id"], name="inventory_price_idx"
+            ),
+            models.Index(
+                fields=["product_name", "id"], name="inventory_name_idx"
+            ),
+            # Visible items of a product
+            models.Index(
+                fields=["product", "is_active"],
+                name="inventory_product_active_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.product.name
 
+    def save(self, *args, **kwargs):
+        loaded = self.loaded_values().get("product_id")
+        if self._state.adding or loaded != self.product_id:
+            self.product_name = self.product.name
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "product" in update_fields:
+                kwargs["update_fields"] = {*update_fields, "product_name"}
+        super().save(*args, **kwargs)
+
 
 class Media(models.Model):
     """
@@ -318,6 +565,27 @@ class Media(models.Model):
         default="images/default.png",
         help_text=_("format: required, default-default.png"),
     )
+    width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("image width"),
+        help_text=_("format: pixels, set when renditions are generated"),
+    )
+    height = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("image height"),
+        help_text=_("format: pixels, set when renditions are generated"),
+    )
+    renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name=_("image renditions"),
+        help_text=_("format: rendition name to storage name and size"),
+    )
     alt_text = models.CharField(
         max_length=255,
         unique=False,
@@ -346,6 +614,14 @@ class Media(models.Model):
     class Meta:
         verbose_name = _("product image")
         verbose_name_plural = _("product images")
+        indexes = [
+            # The featured image of an item; most images are not featured
+            models.Index(
+                fields=["product_inventory"],
+                condition=models.Q(is_featured=True),
+                name="media_featured_idx",
+            ),
+        ]
 
 
 class Stock(models.Model):
@@ -377,6 +653,144 @@ class Stock(models.Model):
         verbose_name=_("units sold to date"),
         help_text=_("format: required, default-0"),
     )
+    units_reserved = models.IntegerField(
+        default=0,
+        unique=False,
+        null=False,
+        blank=False,
+        verbose_name=_("units held by open reservations"),
+        help_text=_("format: required, default-0"),
+    )
+
+
+class StockReservation(models.Model):
+    """Units of stock held for a cart until checkout or expiry.
+
+    One row per product in the cart; all rows of a cart share the same
+    reservation_id.
+    """
+
+    reservation_id = models.UUIDField(
+        db_index=True,
+        verbose_name=_("reservation ID"),
+        help_text=_("format: required, shared by every line of a cart"),
+    )
+    product_inventory = models.ForeignKey(
+        ProductInventory,
+        related_name="stock_reservations",
+        on_delete=models.PROTECT,
+    )
+    units = models.PositiveIntegerField(
+        verbose_name=_("units reserved"),
+        help_text=_("format: required"),
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        editable=False,
+        verbose_name=_("date reservation created"),
+        help_text=_("format: Y-m-d H:M:S"),
+    )
+    expires_at = models.DateTimeField(
+        db_index=True,
+        verbose_name=_("date reservation expires"),
+        help_text=_("format: Y-m-d H:M:S"),
+    )
+
+    class Meta:
+        verbose_name = _("stock reservation")
+        verbose_name_plural = _("stock reservations")
+
+
+def pending_units(product_inventory):
+    """Sum of the stock movements of ``product_inventory`` (an id or an
+    OuterRef) not yet compacted into its Stock row, 0 if there are none.
+
+    Units on hand are Stock.units plus this; see market.inventory.stock.
+    """
+    movements = (
+        StockMovement.objects.pending()
+        .filter(product_inventory_id=product_inventory)
+        .order_by()
+        .values("product_inventory_id")
+        .annotate(total=models.Sum("delta"))
+        .values("total")
+    )
+    return Coalesce(
+        models.Subquery(movements, output_field=models.IntegerField()), 0
+    )
+
+
+class StockMovementQuerySet(models.QuerySet):
+    def pending(self):
+        return self.filter(compacted_at__isnull=True)
+
+
+class StockMovement(models.Model):
+    """Signed change to the units on hand of an item.
+
+    Rows are only ever inserted; compaction folds them into Stock and
+    sets compacted_at, and the rows remain as the audit trail.
+    """
+
+    class Reason(models.TextChoices):
+        SALE = "sale", _("sale")
+        RESTOCK = "restock", _("restock")
+        RETURN = "return", _("return")
+        ADJUSTMENT = "adjustment", _("adjustment")
+
+    product_inventory = models.ForeignKey(
+        ProductInventory,
+        related_name="stock_movements",
+        on_delete=models.PROTECT,
+    )
+    delta = models.IntegerField(
+        verbose_name=_("change in units on hand"),
+        help_text=_("format: required, negative for units leaving stock"),
+    )
+    reason = models.CharField(
+        max_length=20,
+        choices=Reason.choices,
+        verbose_name=_("reason for the change"),
+        help_text=_("format: required"),
+    )
+    reference = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name=_("order, reservation or document reference"),
+        help_text=_("format: not required"),
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        editable=False,
+        verbose_name=_("date of the movement"),
+        help_text=_("format: Y-m-d H:M:S"),
+    )
+    compacted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("date folded into stock"),
+        help_text=_("format: Y-m-d H:M:S, null until compacted"),
+    )
+
+    objects = StockMovementQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _("stock movement")
+        verbose_name_plural = _("stock movements")
+        indexes = [
+            # Pending movements per item, for available stock and for
+            # compaction; compacted rows are left out of the index
+            models.Index(
+                fields=["product_inventory", "id"],
+                condition=models.Q(compacted_at__isnull=True),
+                name="stockmovement_pending_idx",
+            ),
+            # Admin search
+            models.Index(
+                fields=["reference"], name="stockmovement_reference_idx"
+            ),
+        ]
 
 
 class ProductAttributeLists(models.Model):
@@ -399,3 +813,106 @@ class ProductAttributeLists(models.Model):
     class Meta:
         # Both values can not be repeated, ONLY unique values together
         unique_together = (("attributevalues", "productinventory"),)
+
+
+class ProductReadModel(models.Model):
+    """Flattened, read only copy of a sellable item.
+
+    One row per ProductInventory with its product, brand, type, featured
+    image, stock and attributes already joined, plus price and stock
+    roll-ups over every item of the same product. Maintained by
+    market.inventory.read_model; never edit rows directly.
+    """
+
+    product_inventory = models.OneToOneField(
+        ProductInventory,
+        primary_key=True,
+        related_name="read_model",
+        on_delete=models.CASCADE,
+    )
+    product = models.ForeignKey(
+        Product,
+        related_name="read_models",
+        on_delete=models.CASCADE,
+    )
+    sku = models.CharField(max_length=20, unique=True)
+    upc = models.CharField(max_length=12)
+    web_id = models.CharField(max_length=50, db_index=True)
+    slug = models.SlugField(max_length=255)
+    name = models.CharField(max_length=255)
+    description = models.TextField()
+    brand_name = models.CharField(max_length=255)
+    product_type_name = models.CharField(max_length=255)
+    is_active = models.BooleanField(
+        verbose_name=_("item visibility"),
+        help_text=_("format: true=item and product visible"),
+    )
+    retail_price = models.DecimalField(max_digits=6, decimal_places=2)
+    store_price = models.DecimalField(max_digits=6, decimal_places=2)
+    sale_price = models.DecimalField(max_digits=6, decimal_places=2)
+    weight = models.FloatField()
+    image = models.CharField(max_length=255, blank=True)
+    image_alt_text = models.CharField(max_length=255, blank=True)
+    units = models.IntegerField(
+        default=0,
+        verbose_name=_("units/qty of stock"),
+    )
+    in_stock = models.BooleanField(default=False)
+    attributes = models.JSONField(
+        default=dict,
+        verbose_name=_("attribute values"),
+        help_text=_("format: {attribute name: value}"),
+    )
+    product_min_price = models.DecimalField(
+        max_digits=6,
+        decimal_places=2,
+        null=True,
+        verbose_name=_("lowest sale price of the product"),
+    )
+    product_max_price = models.DecimalField(
+        max_digits=6,
+        decimal_places=2,
+        null=True,
+        verbose_name=_("highest sale price of the product"),
+    )
+    product_in_stock = models.BooleanField(
+        default=False,
+        verbose_name=_("any item of the product in stock"),
+    )
+    refreshed_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_("date read model refreshed"),
+        help_text=_("format: Y-m-d H:M:S"),
+    )
+
+    class Meta:
+        verbose_name = _("product read model")
+        verbose_name_plural = _("product read models")
+
+
+class CategoryProductCount(models.Model):
+    """Number of active products linked to a category, directly and
+    across its whole subtree. Maintained by
+    market.inventory.category_counts; never edit rows directly.
+    """
+
+    category = models.OneToOneField(
+        Category,
+        primary_key=True,
+        related_name="product_count",
+        on_delete=models.CASCADE,
+    )
+    direct = models.IntegerField(
+        default=0,
+        verbose_name=_("active products in the category"),
+        help_text=_("format: required, default-0"),
+    )
+    cumulative = models.IntegerField(
+        default=0,
+        verbose_name=_("active products in the category and below"),
+        help_text=_("format: required, default-0"),
+    )
+
+    class Meta:
+        verbose_name = _("category product count")
+        verbose_name_plural = _("category product counts")
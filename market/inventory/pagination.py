@@ -0,0 +1,136 @@
+"""Keyset (cursor) pagination.
+
+Pages are selected with a WHERE clause on the last seen (sort key, id)
+pair instead of OFFSET, so the database seeks straight to the page and
+deep pages cost the same as the first one. Cursors are opaque, URL safe
+tokens that encode the sort order and the last row of the page.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor can not be decoded or belongs to another
+    sort order"""
+
+
+class KeysetPage:
+    """One page of results plus the cursor of the following page"""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(order, values):
+    payload = json.dumps([order] + [str(value) for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, order):
+    """Return the raw (sort value, id) strings stored in a cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        cursor_order, value, pk = payload
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+    if cursor_order != order:
+        raise InvalidCursor("Cursor does not match the ordering")
+    return value, pk
+
+
+def resolve_field(model, path):
+    """Return the model field at the end of a lookup path such as
+    "product__name" """
+    field = None
+    for name in path.split("__"):
+        field = model._meta.get_field(name)
+        model = field.related_model
+    return field
+
+
+def keyset_queryset(queryset, order, orderings, cursor=None):
+    """``queryset`` sorted by ``order`` and filtered to the rows after
+    ``cursor``, not yet sliced to a page.
+
+    ``orderings`` maps public sort names (e.g. "sale_price") to lookup
+    paths on the queryset model; prefix ``order`` with "-" for
+    descending order. The primary key breaks ties, so the sort is total
+    and no row is skipped or repeated between pages.
+    """
+    descending = order.startswith("-")
+    name = order.lstrip("-")
+    if name not in orderings:
+        raise InvalidCursor("Unsupported ordering '%s'" % order)
+    path = orderings[name]
+    model = queryset.model
+    pk_name = model._meta.pk.name
+    prefix = "-" if descending else ""
+
+    if cursor:
+        raw_value, raw_pk = decode_cursor(cursor, order)
+        try:
+            value = resolve_field(model, path).to_python(raw_value)
+            pk = model._meta.pk.to_python(raw_pk)
+        except (ValidationError, ValueError, TypeError):
+            raise InvalidCursor("Malformed cursor")
+        op = "lt" if descending else "gt"
+        # The redundant bound on the sort key alone is what lets the
+        # database seek on the (sort key, id) index; the OR can't
+        queryset = queryset.filter(
+            Q(**{"%s__%se" % (path, op): value}),
+            Q(**{"%s__%s" % (path, op): value})
+            | Q(**{path: value, "%s__%s" % (pk_name, op): pk}),
+        )
+
+    return queryset.annotate(keyset_value=F(path)).order_by(
+        prefix + path, prefix + pk_name
+    )
+
+
+def page_window(queryset, page_size=DEFAULT_PAGE_SIZE):
+    """The rows of a page of a keyset_queryset() plus one, which tells
+    whether another page follows"""
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    return queryset[: page_size + 1]
+
+
+def keyset_page(queryset, order, page_size=DEFAULT_PAGE_SIZE):
+    """Fetch the first page of a keyset_queryset()"""
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    rows = list(page_window(queryset, page_size))
+    items = rows[:page_size]
+    next_cursor = None
+    if len(rows) > page_size:
+        last = items[-1]
+        next_cursor = encode_cursor(order, [last.keyset_value, last.pk])
+    return KeysetPage(items, next_cursor)
+
+
+def paginate_keyset(
+    queryset, order, orderings, cursor=None, page_size=DEFAULT_PAGE_SIZE
+):
+    """Return a KeysetPage of ``queryset`` sorted by ``order``; see
+    keyset_queryset()"""
+    return keyset_page(
+        keyset_queryset(queryset, order, orderings, cursor),
+        order,
+        page_size,
+    )
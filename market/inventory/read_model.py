@@ -0,0 +1,319 @@
+"""Maintenance of the denormalized ProductReadModel table.
+
+refresh() rebuilds the rows of a set of ProductInventory ids with a
+fixed number of queries per chunk and upserts them, then recomputes the
+per-product price and stock roll-ups. Signal receivers work out which
+items a change affects and refresh them once the transaction commits.
+Stock changed through market.inventory.stock (queryset updates and
+ledger movements, no signals) is refreshed when stock.compact() folds
+the movements.
+
+Storefront reads become single-row lookups by sku or inventory id, or a
+single range by product.
+"""
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import (
+    BooleanField,
+    Exists,
+    ExpressionWrapper,
+    Max,
+    Min,
+    OuterRef,
+    Prefetch,
+    Q,
+    Subquery,
+)
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from market.inventory.models import (
+    Brand,
+    Media,
+    Product,
+    ProductAttribute,
+    ProductAttributeLists,
+    ProductAttributeValue,
+    ProductInventory,
+    ProductReadModel,
+    ProductType,
+    Stock,
+    pending_units,
+)
+
+CHUNK_SIZE = 1000
+
+# Django 4.1 writes upsert field names into the SQL verbatim, so the
+# column names (attname) are used rather than the field names.
+UPDATE_FIELDS = [
+    field.attname
+    for field in ProductReadModel._meta.concrete_fields
+    if not field.primary_key
+]
+
+
+def build_row(item):
+    """Flatten a ProductInventory fetched by items_queryset()"""
+    product = item.product
+    media = item.media_product_inventory.all()
+    image = media[0] if media else None
+    try:
+        units = item.product_inventory.units
+    except Stock.DoesNotExist:
+        units = 0
+    # Movements not compacted into the Stock row yet
+    units += item.pending_units
+    return ProductReadModel(
+        product_inventory_id=item.pk,
+        product_id=product.pk,
+        sku=item.sku,
+        upc=item.upc,
+        web_id=product.web_id,
+        slug=product.slug,
+        name=product.name,
+        description=product.description,
+        brand_name=item.brand.name,
+        product_type_name=item.product_type.name,
+        is_active=item.is_active and product.is_active,
+        retail_price=item.retail_price,
+        store_price=item.store_price,
+        sale_price=item.sale_price,
+        weight=item.weight,
+        image=image.image.name if image else "",
+        image_alt_text=image.alt_text if image else "",
+        units=units,
+        in_stock=units > 0,
+        attributes={
+            link.attributevalues.product_attribute.name: (
+                link.attributevalues.attribute_value
+            )
+            for link in item.product_inventory_atribute.all()
+        },
+    )
+
+
+def items_queryset(using=DEFAULT_DB_ALIAS):
+    return (
+        ProductInventory.objects.using(using)
+        .select_related(
+            "product", "brand", "product_type", "product_inventory"
+        )
+        .annotate(pending_units=pending_units(OuterRef("pk")))
+        .prefetch_related(
+            # Featured image first
+            Prefetch(
+                "media_product_inventory",
+                queryset=Media.objects.order_by("-is_featured", "id"),
+            ),
+            Prefetch(
+                "product_inventory_atribute",
+                queryset=ProductAttributeLists.objects.select_related(
+                    "attributevalues__product_attribute"
+                ),
+            ),
+        )
+    )
+
+
+def refresh(product_inventory_ids, product_ids=(), using=DEFAULT_DB_ALIAS):
+    """Rebuild the rows of these items and the roll-ups of their
+    products; rows of deleted items are dropped. ``product_ids`` adds
+    products whose roll-ups must be recomputed too, e.g. the product of
+    a deleted item."""
+    ids = sorted(set(product_inventory_ids))
+    read_models = ProductReadModel.objects.using(using)
+    product_ids = set(product_ids)
+    product_ids.update(
+        read_models.filter(product_inventory_id__in=ids).values_list(
+            "product_id", flat=True
+        )
+    )
+    with transaction.atomic(using=using):
+        for start in range(0, len(ids), CHUNK_SIZE):
+            chunk = ids[start : start + CHUNK_SIZE]
+            rows = [
+                build_row(item)
+                for item in items_queryset(using).filter(pk__in=chunk)
+            ]
+            read_models.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["product_inventory_id"],
+                update_fields=UPDATE_FIELDS,
+            )
+            found = {row.product_inventory_id for row in rows}
+            read_models.filter(
+                product_inventory_id__in=set(chunk) - found
+            ).delete()
+            product_ids.update(row.product_id for row in rows)
+        refresh_products(product_ids, using=using)
+
+
+def refresh_products(product_ids, using=DEFAULT_DB_ALIAS):
+    """Recompute min/max price and in-stock roll-ups in one UPDATE"""
+    siblings = ProductReadModel.objects.filter(
+        product_id=OuterRef("product_id"), is_active=True
+    )
+    prices = siblings.values("product_id")
+    ProductReadModel.objects.using(using).filter(
+        product_id__in=product_ids
+    ).update(
+        product_min_price=Subquery(
+            prices.annotate(price=Min("sale_price")).values("price")
+        ),
+        product_max_price=Subquery(
+            prices.annotate(price=Max("sale_price")).values("price")
+        ),
+        product_in_stock=Exists(siblings.filter(in_stock=True)),
+    )
+
+
+def refresh_stock(product_inventory_ids, using=DEFAULT_DB_ALIAS):
+    """Copy stock levels into the rows of these items with two UPDATEs
+    and no Python round trip, for stock compaction"""
+    rows = ProductReadModel.objects.using(using).filter(
+        product_inventory_id__in=list(product_inventory_ids)
+    )
+    rows.update(
+        units=Coalesce(
+            Subquery(
+                Stock.objects.filter(
+                    product_inventory_id=OuterRef("product_inventory_id")
+                ).values("units")[:1]
+            ),
+            0,
+        )
+        + pending_units(OuterRef("product_inventory_id"))
+    )
+    rows.update(
+        in_stock=ExpressionWrapper(Q(units__gt=0), output_field=BooleanField())
+    )
+    refresh_products(
+        rows.values_list("product_id", flat=True).distinct(), using=using
+    )
+
+
+def refresh_prices(product_inventory_ids, using=DEFAULT_DB_ALIAS):
+    """Copy prices into the rows of these items with one UPDATE, for
+    bulk repricing (see market.inventory.pricing)"""
+    rows = ProductReadModel.objects.using(using).filter(
+        product_inventory_id__in=list(product_inventory_ids)
+    )
+    items = ProductInventory.objects.filter(
+        pk=OuterRef("product_inventory_id")
+    )
+    rows.update(
+        **{
+            name: Subquery(items.values(name)[:1])
+            for name in ("retail_price", "store_price", "sale_price")
+        }
+    )
+    refresh_products(
+        rows.values_list("product_id", flat=True).distinct(), using=using
+    )
+
+
+def rebuild(using=DEFAULT_DB_ALIAS):
+    """Refresh every row; returns the number of items"""
+    ids = list(
+        ProductInventory.objects.using(using)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    with transaction.atomic(using=using):
+        ProductReadModel.objects.using(using).exclude(
+            product_inventory_id__in=ProductInventory.objects.using(
+                using
+            ).values("pk")
+        ).delete()
+        refresh(ids, using=using)
+    return len(ids)
+
+
+def schedule_refresh(
+    product_inventory_ids, using=DEFAULT_DB_ALIAS, product_ids=()
+):
+    """Refresh these items after the current transaction commits"""
+    ids = list(product_inventory_ids)
+    product_ids = list(product_ids)
+    if ids or product_ids:
+        transaction.on_commit(
+            lambda: refresh(ids, product_ids=product_ids, using=using),
+            using=using,
+        )
+
+
+def _items(using, **filters):
+    return (
+        ProductInventory.objects.using(using)
+        .filter(**filters)
+        .values_list("pk", flat=True)
+    )
+
+
+@receiver(post_save, sender=ProductInventory)
+@receiver(post_delete, sender=ProductInventory)
+def inventory_changed(sender, instance, using, **kwargs):
+    # Pass the product too: a deleted item has no row left to find it by.
+    schedule_refresh([instance.pk], using, product_ids=[instance.product_id])
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+@receiver(post_save, sender=Media)
+@receiver(post_delete, sender=Media)
+def inventory_part_changed(sender, instance, using, **kwargs):
+    schedule_refresh([instance.product_inventory_id], using)
+
+
+@receiver(post_save, sender=ProductAttributeLists)
+@receiver(post_delete, sender=ProductAttributeLists)
+def attribute_link_changed(sender, instance, using, **kwargs):
+    schedule_refresh([instance.productinventory_id], using)
+
+
+@receiver(m2m_changed, sender=ProductInventory.attribute_values.through)
+def attribute_links_added(
+    sender, instance, action, reverse, pk_set, using, **kwargs
+):
+    # add() and set() bulk create the links without post_save; remove()
+    # and clear() delete them with post_delete
+    if action != "post_add" or not pk_set:
+        return
+    schedule_refresh(pk_set if reverse else [instance.pk], using)
+
+
+@receiver(post_save, sender=Product)
+def product_changed(sender, instance, using, **kwargs):
+    schedule_refresh(_items(using, product=instance), using)
+
+
+@receiver(post_save, sender=Brand)
+def brand_changed(sender, instance, using, **kwargs):
+    schedule_refresh(_items(using, brand=instance), using)
+
+
+@receiver(post_save, sender=ProductType)
+def product_type_changed(sender, instance, using, **kwargs):
+    schedule_refresh(_items(using, product_type=instance), using)
+
+
+@receiver(post_save, sender=ProductAttributeValue)
+def attribute_value_changed(sender, instance, using, **kwargs):
+    schedule_refresh(
+        _items(using, product_inventory_atribute__attributevalues=instance),
+        using,
+    )
+
+
+@receiver(post_save, sender=ProductAttribute)
+def attribute_changed(sender, instance, using, **kwargs):
+    schedule_refresh(
+        _items(
+            using,
+            product_inventory_atribute__attributevalues__product_attribute=(
+                instance
+            ),
+        ).distinct(),
+        using,
+    )
@@ -0,0 +1,270 @@
+"""Resized derivatives of catalog images.
+
+Every ``Media`` and ``Brand`` image gets the renditions declared in
+RENDITIONS, saved to the same storage as ``<name>.<rendition>.<format>``
+(content-addressed storage files them by hash next to the original).
+The original's width and height and a manifest of the renditions
+(storage name, width and height of each) are recorded on the row, so
+pages can emit URLs and dimensions without opening a file.
+
+Decoding and resizing is CPU bound, so generate() fans the originals out
+over a process pool; the workers only touch storage and the parent
+writes the results back in bulk. Rows sharing an original, such as a
+placeholder image, are rendered once per run. A manifest records the
+original name and rendition spec it was made from, so replacing an
+image or changing a spec makes it stale rather than silently wrong.
+
+With IMAGE_RENDITIONS_LAZY, images without a current manifest are
+served through the media-rendition view, which renders them on the
+first request. The ``generate-renditions`` command backfills everything
+ahead of time.
+"""
+import io
+import logging
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils import timezone
+from PIL import ExifTags, Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Rendition:
+    width: int
+    height: int
+    format: str = "WEBP"
+    quality: int = 80
+
+    @property
+    def extension(self):
+        return "jpg" if self.format == "JPEG" else self.format.lower()
+
+    @property
+    def spec(self):
+        return "%dx%d.%s.q%d" % (
+            self.width,
+            self.height,
+            self.extension,
+            self.quality,
+        )
+
+
+RENDITIONS = getattr(
+    settings,
+    "IMAGE_RENDITIONS",
+    {
+        "thumbnail": Rendition(160, 160),
+        "listing": Rendition(480, 480),
+        "zoom": Rendition(1600, 1600, "JPEG", quality=85),
+    },
+)
+LAZY = getattr(settings, "IMAGE_RENDITIONS_LAZY", False)
+BATCH_SIZE = 200
+# EXIF orientations that swap width and height
+ROTATED = (5, 6, 7, 8)
+
+
+def rendition_name(name, rendition_key):
+    root, _ = os.path.splitext(name)
+    return "%s.%s.%s" % (
+        root,
+        rendition_key,
+        RENDITIONS[rendition_key].extension,
+    )
+
+
+def is_current(name, manifest):
+    """Whether ``manifest`` holds every declared rendition of ``name``"""
+    return all(
+        manifest.get(key, {}).get("source") == name
+        and manifest[key].get("spec") == rendition.spec
+        for key, rendition in RENDITIONS.items()
+    )
+
+
+def encode(image, rendition):
+    if rendition.format == "JPEG" or image.mode not in ("RGB", "RGBA"):
+        has_alpha = "A" in image.getbands() or "transparency" in image.info
+        keep_alpha = has_alpha and rendition.format != "JPEG"
+        image = image.convert("RGBA" if keep_alpha else "RGB")
+    buffer = io.BytesIO()
+    options = {"quality": rendition.quality}
+    if rendition.format == "JPEG":
+        options.update(optimize=True, progressive=True)
+    image.save(buffer, rendition.format, **options)
+    return buffer.getvalue()
+
+
+def render(name, storage=None):
+    """Write the renditions of the image stored as ``name``; returns
+    (width, height, manifest). Runs in the worker processes."""
+    storage = storage or default_storage
+    with storage.open(name) as file:
+        original = Image.open(file)
+        width, height = original.size
+        if original.getexif().get(ExifTags.Base.Orientation) in ROTATED:
+            width, height = height, width
+        # JPEGs decode at the smallest scale still covering every box
+        side = max(max(r.width, r.height) for r in RENDITIONS.values())
+        original.draft(original.mode, (side, side))
+        original = ImageOps.exif_transpose(original)
+        original.load()
+    manifest = {}
+    for key, rendition in RENDITIONS.items():
+        image = original.copy()
+        # Fits within the box, keeps the aspect ratio, never upscales
+        image.thumbnail(
+            (rendition.width, rendition.height), Image.Resampling.LANCZOS
+        )
+        target = rendition_name(name, key)
+        if storage.exists(target):
+            storage.delete(target)
+        saved = storage.save(target, ContentFile(encode(image, rendition)))
+        manifest[key] = {
+            "name": saved,
+            "width": image.width,
+            "height": image.height,
+            "source": name,
+            "spec": rendition.spec,
+        }
+    return width, height, manifest
+
+
+def safe_render(name):
+    try:
+        return render(name)
+    except (OSError, Image.DecompressionBombError) as e:
+        logger.warning("Cannot render %s: %s", name, e)
+        return None
+
+
+def updated_fields(model):
+    fields = ["width", "height", "renditions"]
+    if any(field.name == "updated_at" for field in model._meta.fields):
+        fields.append("updated_at")
+    return fields
+
+
+def apply(instance, result):
+    instance.width, instance.height, instance.renditions = result
+    if "updated_at" in updated_fields(type(instance)):
+        # bulk_update() bypasses auto_now; cached responses must change
+        instance.updated_at = timezone.now()
+
+
+def refresh(instance):
+    """Render one instance's image in this process and save the
+    manifest; returns False if the original cannot be read"""
+    result = safe_render(instance.image.name)
+    if result is None:
+        return False
+    apply(instance, result)
+    instance.save(update_fields=updated_fields(type(instance)))
+    return True
+
+
+def stale(queryset, force=False, batch_size=BATCH_SIZE):
+    """Batches of the rows of ``queryset`` whose renditions are missing
+    or out of date, read in primary key order"""
+    rows = queryset.order_by("pk").only("pk", "image", "renditions")
+    last = None
+    while True:
+        page = rows if last is None else rows.filter(pk__gt=last)
+        page = list(page[:batch_size])
+        if not page:
+            return
+        last = page[-1].pk
+        batch = [
+            row
+            for row in page
+            if row.image.name
+            and (force or not is_current(row.image.name, row.renditions))
+        ]
+        if batch:
+            yield batch
+
+
+def generate(queryset, workers=None, force=False):
+    """Bring the renditions of ``queryset`` up to date using ``workers``
+    processes (default: one per CPU; 0 renders in this process); returns
+    (rendered, failed) counts"""
+    pool = None
+    if workers != 0:
+        pool = ProcessPoolExecutor(workers, initializer=django.setup)
+    rendered = failed = 0
+    shared = {}
+    try:
+        for batch in stale(queryset, force=force):
+            done = render_batch(queryset.model, batch, pool, shared)
+            rendered += done
+            failed += len(batch) - done
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return rendered, failed
+
+
+def render_batch(model, rows, pool=None, shared=None):
+    """Render and save the renditions of ``rows``, each original once.
+    ``shared`` maps originals to the results of earlier batches; it
+    gains those used by more than one row of this batch."""
+    shared = {} if shared is None else shared
+    counts = Counter(row.image.name for row in rows)
+    names = [name for name in counts if name not in shared]
+    results = dict(zip(names, (pool.map if pool else map)(safe_render, names)))
+    for name in names:
+        if counts[name] > 1:
+            shared[name] = results[name]
+    done = []
+    for row in rows:
+        name = row.image.name
+        result = results[name] if name in results else shared[name]
+        if result is not None:
+            apply(row, result)
+            done.append(row)
+    if done:
+        model._default_manager.bulk_update(done, updated_fields(model))
+    return len(done)
+
+
+def image_json(row):
+    """Payload for one Media row given as a dict with id, image, width,
+    height and renditions: a URL and dimensions per rendition. Stale
+    renditions point at the lazy media-rendition view when
+    IMAGE_RENDITIONS_LAZY is on, and at the original otherwise."""
+    name, manifest = row["image"], row["renditions"]
+    current = is_current(name, manifest)
+    renditions = {}
+    for key in RENDITIONS:
+        if current:
+            entry = manifest[key]
+            renditions[key] = {
+                "url": default_storage.url(entry["name"]),
+                "width": entry["width"],
+                "height": entry["height"],
+            }
+        elif LAZY:
+            renditions[key] = {
+                "url": reverse(
+                    "inventory:media-rendition",
+                    kwargs={"pk": row["id"], "rendition": key},
+                ),
+                "width": None,
+                "height": None,
+            }
+        else:
+            renditions[key] = {
+                "url": default_storage.url(name),
+                "width": row["width"],
+                "height": row["height"],
+            }
+    return renditions
@@ -0,0 +1,211 @@
+"""Read replicas for the catalog, with write-after-read stickiness.
+
+The catalog is read about fifty times for every write, so ReplicaRouter
+sends reads of the catalog models (CATALOG_MODELS) to one of the aliases
+in settings.DATABASE_REPLICAS, chosen at random once per request so a
+page is built from a single replica. Everything else stays on the
+primary ("default"):
+
+- every write, and every read inside a transaction on the primary;
+- Stock, StockReservation and ProductReadModel, which carry units on
+  hand and must never be served stale;
+- sessions, users, admin log and the rest of the project.
+
+A replica lags behind the primary, so a user who has just written must
+not read from one until it has caught up. Once a request writes, the
+rest of it reads from the primary, and ReplicaPinMiddleware sets a
+cookie that pins the user's next requests to the primary for
+REPLICA_PIN_SECONDS; unsafe methods set it too, whether or not they
+wrote. Pick a window longer than the time between two refreshes.
+
+Replicas can be plain SQLite copies of the primary, refreshed with the
+refresh-replicas command. It copies the database with SQLite's online
+backup API, which holds the destination's write lock for the whole copy:
+connections already reading a replica finish on the old data, new ones
+see the new copy, and nobody sees half of it.
+
+The in-process snapshots (category tree, product counts, facets) are
+cached until the next change, so their loaders always read the primary.
+"""
+import asyncio
+import contextvars
+import random
+import sqlite3
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Models whose reads may be served by a replica
+CATALOG_MODELS = {
+    "inventory.brand",
+    "inventory.category",
+    "inventory.categoryproductcount",
+    "inventory.media",
+    "inventory.product",
+    "inventory.productattribute",
+    "inventory.productattributelists",
+    "inventory.productattributevalue",
+    "inventory.productinventory",
+    "inventory.producttype",
+}
+PIN_COOKIE_NAME = "replica_pin"
+
+# Reads of the current request or task go to the primary
+_pinned = contextvars.ContextVar("replica_pinned", default=False)
+# The current request or task has written to the primary
+_wrote = contextvars.ContextVar("replica_wrote", default=False)
+# Replica chosen for the current request or task
+_replica = contextvars.ContextVar("replica_alias", default=None)
+
+
+def replicas():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+def pin_seconds():
+    return getattr(settings, "REPLICA_PIN_SECONDS", 10)
+
+
+def pin():
+    """Read from the primary for the rest of the request or task"""
+    _pinned.set(True)
+
+
+def is_pinned():
+    return _pinned.get() or _wrote.get()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if (
+            not aliases
+            or model._meta.label_lower not in CATALOG_MODELS
+            or is_pinned()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        alias = _replica.get()
+        if alias not in aliases:
+            alias = random.choice(aliases)
+            _replica.set(alias)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaPinMiddleware:
+    """Route the reads of users who wrote recently to the primary.
+
+    The routing state lives in context variables, which sync_to_async()
+    carries to the database thread and back, so the middleware runs on
+    the event loop under ASGI as well.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark the instance as a coroutine function the way Django
+            # 4.1's MiddlewareMixin does; asgiref 3.5 has no helper
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        tokens = self.start(request)
+        try:
+            return self.pin(request, self.get_response(request))
+        finally:
+            self.finish(tokens)
+
+    async def __acall__(self, request):
+        tokens = self.start(request)
+        try:
+            return self.pin(request, await self.get_response(request))
+        finally:
+            self.finish(tokens)
+
+    def start(self, request):
+        return (
+            _pinned.set(PIN_COOKIE_NAME in request.COOKIES),
+            _wrote.set(False),
+            _replica.set(None),
+        )
+
+    def pin(self, request, response):
+        # Reading alone does not extend the window
+        if _wrote.get() or request.method not in (
+            "GET",
+            "HEAD",
+            "OPTIONS",
+            "TRACE",
+        ):
+            response.set_cookie(
+                PIN_COOKIE_NAME,
+                "1",
+                max_age=pin_seconds(),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def finish(self, tokens):
+        pinned, wrote, replica = tokens
+        _pinned.reset(pinned)
+        _wrote.reset(wrote)
+        _replica.reset(replica)
+
+
+def copy_database(source, target):
+    """Copy the SQLite database file ``source`` onto ``target`` with the
+    online backup API; returns the number of pages copied"""
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target, timeout=30)
+    try:
+        # One step, so the copy is taken from a single snapshot of source
+        src.backup(dst)
+        return src.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        dst.close()
+        src.close()
+
+
+def refresh(aliases=None, using=DEFAULT_DB_ALIAS):
+    """Copy the primary onto each SQLite replica; returns alias -> pages"""
+    source = connections[using]
+    if source.vendor != "sqlite" or source.is_in_memory_db():
+        raise ValueError("The primary is not an SQLite database on disk")
+    copied = {}
+    for alias in replicas() if aliases is None else aliases:
+        # Never overwrite a database that is not a replica
+        if alias not in replicas():
+            raise ValueError("%s is not in DATABASE_REPLICAS" % alias)
+        target = connections[alias]
+        if target.vendor != "sqlite" or target.is_in_memory_db():
+            raise ValueError("%s is not an SQLite database on disk" % alias)
+        if str(target.settings_dict["NAME"]) == str(
+            source.settings_dict["NAME"]
+        ):
+            raise ValueError("%s is the primary's own file" % alias)
+        copied[alias] = copy_database(
+            source.settings_dict["NAME"], target.settings_dict["NAME"]
+        )
+    return copied
@@ -0,0 +1,155 @@
+"""Full text product search backed by an SQLite FTS5 index.
+
+inventory_product_fts is an external content FTS5 table over the name
+and description of inventory_product. Triggers created by migration
+0004 keep it in sync with every insert, update and delete, including
+bulk_create and queryset.update() which send no signals. Other database
+backends fall back to icontains filtering.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "inventory_product_fts"
+
+# Name matches weigh more than description matches when ranking.
+RANK_SQL = "bm25(%s, 10.0, 1.0)" % FTS_TABLE
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE %(fts)s USING fts5(
+        name,
+        description,
+        content='inventory_product',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER %(fts)s_ai AFTER INSERT ON inventory_product BEGIN
+        INSERT INTO %(fts)s(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER %(fts)s_ad AFTER DELETE ON inventory_product BEGIN
+        INSERT INTO %(fts)s(%(fts)s, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER %(fts)s_au AFTER UPDATE OF name, description
+    ON inventory_product BEGIN
+        INSERT INTO %(fts)s(%(fts)s, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO %(fts)s(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS %(fts)s_au",
+    "DROP TRIGGER IF EXISTS %(fts)s_ad",
+    "DROP TRIGGER IF EXISTS %(fts)s_ai",
+    "DROP TABLE IF EXISTS %(fts)s",
+]
+
+
+def is_supported(using=DEFAULT_DB_ALIAS):
+    return connections[using].vendor == "sqlite"
+
+
+def search_terms(query):
+    """Split user input into plain word tokens"""
+    return re.findall(r"\w+", query or "")
+
+
+def match_expression(query):
+    """Build a safe FTS5 MATCH expression from user input.
+
+    Every word is quoted, so FTS5 operators typed by shoppers are
+    searched for literally instead of raising syntax errors. The last
+    word is a prefix match to support search-as-you-type.
+    """
+    terms = ['"%s"' % term for term in search_terms(query)]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search(queryset, query):
+    """Filter a Product queryset to matches for ``query``, best first"""
+    match = match_expression(query)
+    if not match:
+        return queryset.none()
+    if not is_supported(queryset.db):
+        return queryset.filter(fallback_condition(query))
+    return queryset.extra(
+        select={"search_rank": RANK_SQL},
+        tables=[FTS_TABLE],
+        where=[
+            "%s.rowid = inventory_product.id" % FTS_TABLE,
+            "%s MATCH %%s" % FTS_TABLE,
+        ],
+        params=[match],
+        order_by=["search_rank", "id"],
+    )
+
+
+def fallback_condition(query):
+    condition = Q()
+    for term in search_terms(query):
+        condition &= Q(name__icontains=term) | Q(description__icontains=term)
+    return condition
+
+
+def match_filter(query, using=DEFAULT_DB_ALIAS):
+    """A Q object for products matching ``query``, unranked, to combine
+    with other conditions. The ids come straight from the index, so the
+    subquery is evaluated once rather than per product row."""
+    match = match_expression(query)
+    if not match:
+        return Q(pk__in=[])
+    if not is_supported(using):
+        return fallback_condition(query)
+    return Q(
+        pk__in=RawSQL(
+            "SELECT rowid FROM %s WHERE %s MATCH %%s" % (FTS_TABLE, FTS_TABLE),
+            [match],
+        )
+    )
+
+
+def create_index(connection):
+    with connection.cursor() as cursor:
+        for sql in CREATE_SQL:
+            cursor.execute(sql % {"fts": FTS_TABLE})
+    rebuild_index(connection)
+
+
+def drop_index(connection):
+    with connection.cursor() as cursor:
+        for sql in DROP_SQL:
+            cursor.execute(sql % {"fts": FTS_TABLE})
+
+
+def rebuild_index(connection):
+    """Re-read every product into the index"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO %(fts)s(%(fts)s) VALUES ('rebuild')"
+            % {"fts": FTS_TABLE}
+        )
+
+
+def optimize_index(connection):
+    """Merge the index b-trees into one for faster queries"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO %(fts)s(%(fts)s) VALUES ('optimize')"
+            % {"fts": FTS_TABLE}
+        )
@@ -0,0 +1,94 @@
+"""Performance profile for SQLite databases.
+
+Every new SQLite connection is set up from two settings:
+
+- SQLITE_PRAGMAS, applied in order: busy_timeout first, so the switch to
+  WAL waits for other connections instead of failing, then journal_mode,
+  synchronous, cache_size, mmap_size and temp_store. In WAL mode readers
+  and the single writer no longer block each other, and
+  synchronous=NORMAL only syncs at checkpoints.
+- SQLITE_TRANSACTION_MODE: "IMMEDIATE" makes Django's transactions
+  start with BEGIN IMMEDIATE and take the write lock up front. A
+  deferred transaction that reads and then writes can not wait for
+  another writer (SQLite returns "database is locked" at once, whatever
+  the busy timeout), so every worker process that writes needs it.
+  Django 4.1 has no option for it; 5.1 added OPTIONS["transaction_mode"].
+
+Connections are kept between requests with CONN_MAX_AGE, so the setup
+runs once per worker thread rather than per request. The
+sqlite-maintenance command runs PRAGMA optimize and checkpoints the WAL.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Used when settings.SQLITE_PRAGMAS is not set
+DEFAULT_PRAGMAS = {
+    "busy_timeout": 5000,
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    # Negative sizes are in KiB: 64MB of page cache per connection
+    "cache_size": -64000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "memory",
+}
+
+
+def pragmas():
+    return getattr(settings, "SQLITE_PRAGMAS", DEFAULT_PRAGMAS)
+
+
+def apply_pragmas(connection, values=None):
+    """Run ``PRAGMA name = value`` on an open DB-API connection"""
+    values = pragmas() if values is None else values
+    for name, value in values.items():
+        if not name.replace("_", "").isalnum():
+            raise ValueError("Invalid pragma name %r" % name)
+        if not str(value).replace("-", "").isalnum():
+            raise ValueError("Invalid value %r for pragma %s" % (value, name))
+        connection.execute("PRAGMA %s = %s" % (name, value))
+
+
+def read_pragmas(connection, names=None):
+    """Current values of these pragmas on a Django connection"""
+    names = pragmas() if names is None else names
+    with connection.cursor() as cursor:
+        values = {}
+        for name in names:
+            cursor.execute("PRAGMA %s" % name)
+            row = cursor.fetchone()
+            # e.g. mmap_size has no value for in-memory databases
+            values[name] = row[0] if row else None
+    return values
+
+
+def optimize(connection):
+    """Let SQLite refresh the statistics the planner is missing"""
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA optimize")
+
+
+def checkpoint(connection, mode="TRUNCATE"):
+    """Copy the WAL back into the database file and, with TRUNCATE,
+    shrink it; returns (busy, wal pages, pages checkpointed)"""
+    if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+        raise ValueError("Invalid checkpoint mode %r" % mode)
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA wal_checkpoint(%s)" % mode)
+        return tuple(cursor.fetchone())
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    apply_pragmas(connection.connection)
+    mode = getattr(settings, "SQLITE_TRANSACTION_MODE", None)
+    if mode:
+        if mode.upper() not in ("DEFERRED", "IMMEDIATE", "EXCLUSIVE"):
+            raise ValueError("Invalid SQLITE_TRANSACTION_MODE %r" % mode)
+        begin = "BEGIN %s" % mode.upper()
+        # Replaces the backend's plain BEGIN for this connection only
+        connection._start_transaction_under_autocommit = (
+            lambda: connection.cursor().execute(begin)
+        )
@@ -0,0 +1,168 @@
+// Lazy category tree for the admin changelist.
+//
+// Each level is fetched from the children endpoint when it is first
+// expanded, a page at a time. Dragging a category onto another one (or
+// onto the top level drop zone) only records the move; "Save moves"
+// posts every pending move in one request, so the server renumbers the
+// tree once for the whole batch.
+'use strict';
+{
+    const app = document.getElementById('category-tree-app');
+    const childrenUrl = app.dataset.childrenUrl;
+    const moveUrl = app.dataset.moveUrl;
+    const canMove = app.dataset.canMove === '1';
+    const csrfToken = app.querySelector('[name=csrfmiddlewaretoken]').value;
+    // category id -> new parent id (null for the top level)
+    const moves = new Map();
+    let dragged = null;
+
+    function loadChildren(list, parent, cursor) {
+        const params = new URLSearchParams();
+        if (parent) {
+            params.set('parent', parent);
+        }
+        if (cursor) {
+            params.set('cursor', cursor);
+        }
+        return fetch(childrenUrl + '?' + params, {credentials: 'same-origin'})
+            .then((response) => response.json())
+            .then((data) => {
+                list.querySelector(':scope > .more')?.remove();
+                for (const category of data.results) {
+                    list.appendChild(nodeItem(category));
+                }
+                if (data.next) {
+                    const more = document.createElement('li');
+                    more.className = 'more';
+                    const link = document.createElement('a');
+                    link.href = '#';
+                    link.textContent = gettext('Show more');
+                    link.addEventListener('click', (event) => {
+                        event.preventDefault();
+                        loadChildren(list, parent, data.next);
+                    });
+                    more.appendChild(link);
+                    list.appendChild(more);
+                }
+            });
+    }
+
+    function nodeItem(category) {
+        const item = document.createElement('li');
+        item.dataset.id = category.id;
+        if (!category.is_active) {
+            item.classList.add('inactive');
+        }
+        const node = document.createElement('div');
+        node.className = 'node';
+        const toggle = document.createElement('span');
+        toggle.className = 'toggle';
+        const link = document.createElement('a');
+        link.href = category.url;
+        link.textContent = category.name;
+        node.append(toggle, link, ' (' + interpolate(
+            ngettext('%s product', '%s products', category.products),
+            [category.products]
+        ) + ')');
+        if (category.descendants) {
+            toggle.textContent = '+';
+            toggle.addEventListener('click', () => expand(item, toggle));
+        }
+        item.appendChild(node);
+        if (canMove) {
+            node.draggable = true;
+            node.addEventListener('dragstart', (event) => {
+                dragged = item;
+                event.dataTransfer.effectAllowed = 'move';
+            });
+            dropTarget(node, () => item);
+        }
+        return item;
+    }
+
+    function expand(item, toggle) {
+        let list = item.querySelector(':scope > ul');
+        if (list) {
+            list.hidden = !list.hidden;
+            toggle.textContent = list.hidden ? '+' : '−';
+            return Promise.resolve(list);
+        }
+        list = document.createElement('ul');
+        item.appendChild(list);
+        toggle.textContent = '−';
+        return loadChildren(list, item.dataset.id).then(() => list);
+    }
+
+    function dropTarget(element, parentItem) {
+        element.addEventListener('dragover', (event) => {
+            const parent = parentItem();
+            // Never into itself or its own subtree
+            if (dragged && !(parent && dragged.contains(parent))) {
+                event.preventDefault();
+                element.classList.add('drop-target');
+            }
+        });
+        element.addEventListener('dragleave', () => {
+            element.classList.remove('drop-target');
+        });
+        element.addEventListener('drop', (event) => {
+            event.preventDefault();
+            element.classList.remove('drop-target');
+            move(dragged, parentItem());
+            dragged = null;
+        });
+    }
+
+    function move(item, parent) {
+        const parentId = parent ? parent.dataset.id : null;
+        moves.set(item.dataset.id, parentId);
+        item.classList.add('moved');
+        if (!parent) {
+            document.getElementById('category-tree').appendChild(item);
+        } else {
+            const list = parent.querySelector(':scope > ul');
+            // Unexpanded levels are loaded later with the item in place
+            if (list && !list.hidden) {
+                list.appendChild(item);
+            } else {
+                item.remove();
+            }
+        }
+        updateStatus();
+    }
+
+    function updateStatus() {
+        const count = moves.size;
+        document.getElementById('category-moves').textContent = count ?
+            interpolate(ngettext('%s pending move.', '%s pending moves.', count), [count]) :
+            gettext('No pending moves.');
+        document.getElementById('category-save').disabled = !count;
+        document.getElementById('category-discard').disabled = !count;
+    }
+
+    function save() {
+        fetch(moveUrl, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrfToken},
+            body: JSON.stringify({moves: Array.from(moves)}),
+        })
+            .then((response) => response.json().then((data) => [response.ok, data]))
+            .then(([ok, data]) => {
+                if (!ok) {
+                    window.alert(data.error);
+                    return;
+                }
+                window.location.reload();
+            });
+    }
+
+    loadChildren(document.getElementById('category-tree'), null);
+    if (canMove) {
+        dropTarget(document.getElementById('category-roots'), () => null);
+        document.getElementById('category-save').addEventListener('click', save);
+        document.getElementById('category-discard').addEventListener('click', () => {
+            window.location.reload();
+        });
+    }
+}
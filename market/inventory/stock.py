@@ -0,0 +1,376 @@
+"""Stock reservation, sale and movement service.
+
+Units on hand are kept in two parts: the Stock row (units, units_sold),
+and the StockMovement ledger of signed changes not yet folded into it.
+Sales and restocks insert movements instead of rewriting units,
+units_sold and the ProductReadModel rows of the item and its siblings.
+compact(), run periodically by the compact-stock-movements command,
+folds pending movements into Stock in batches, keeps them as the audit
+trail and refreshes the read model of the items it folded, so listings
+lag behind sales by up to one compaction. Every other read adds pending
+movements in: available stock is units + pending movements -
+units_reserved, see available().
+
+Reservations hold their units on the Stock row with a single
+conditional UPDATE with F() expressions, e.g. "units_reserved += 2
+WHERE available >= 2". The database applies the check and the change
+atomically, so concurrent checkouts can never oversell and there is no
+read-modify-write race.
+
+A direct sale locks the Stock rows of its items with SELECT ... FOR
+UPDATE, in id order so two orders can not deadlock, then checks
+availability and appends its movements in the same transaction. Sales
+of one item still take turns on its row lock, but only for a SELECT,
+and sales of different items do not wait for each other. SQLite has no
+row locks and runs one write transaction at a time, which gives the
+same guarantee: with SQLITE_TRANSACTION_MODE = "IMMEDIATE" the next
+checkout waits, otherwise one whose check went stale fails with
+"database is locked".
+"""
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import (
+    Case,
+    F,
+    IntegerField,
+    OuterRef,
+    Sum,
+    Value,
+    When,
+)
+from django.utils import timezone
+
+from market.inventory import read_model
+from market.inventory.models import (
+    Stock,
+    StockMovement,
+    StockReservation,
+    pending_units,
+)
+
+# Seconds a cart reservation holds its units before release_expired()
+# may hand them back.
+DEFAULT_RESERVATION_TTL = getattr(settings, "STOCK_RESERVATION_TTL", 15 * 60)
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+class InsufficientStock(Exception):
+    """Raised when one or more products do not have enough available
+    units; nothing is changed"""
+
+    def __init__(self, product_inventory_ids):
+        self.product_inventory_ids = sorted(product_inventory_ids)
+        super().__init__(
+            "Insufficient stock for product inventory %s"
+            % ", ".join(str(pk) for pk in self.product_inventory_ids)
+        )
+
+
+class ReservationNotFound(Exception):
+    """Raised when a reservation was already committed, released or
+    expired and released"""
+
+
+def normalize_lines(lines):
+    """Merge {product_inventory_id: units} or (id, units) pairs into a
+    sorted list. A fixed order means concurrent multi-row transactions
+    lock rows in the same order and can not deadlock."""
+    if hasattr(lines, "items"):
+        lines = lines.items()
+    merged = {}
+    for pk, units in lines:
+        if units <= 0:
+            raise ValueError("Units must be positive")
+        merged[pk] = merged.get(pk, 0) + units
+    return sorted(merged.items())
+
+
+def available():
+    """Available units of a Stock row, as an expression: units on hand
+    with the pending movements, less the reserved units"""
+    return (
+        F("units")
+        + pending_units(OuterRef("product_inventory_id"))
+        - F("units_reserved")
+    )
+
+
+def available_units(product_inventory_id, using=DEFAULT_DB_ALIAS):
+    stock = (
+        Stock.objects.using(using)
+        .filter(product_inventory_id=product_inventory_id)
+        .values_list(available())
+        .first()
+    )
+    return stock[0] if stock else 0
+
+
+def reserve(lines, ttl=None, using=DEFAULT_DB_ALIAS):
+    """Reserve units for every line of a cart, all or nothing.
+
+    Returns the reservation id used to commit or release the cart.
+    """
+    lines = normalize_lines(lines)
+    ttl = DEFAULT_RESERVATION_TTL if ttl is None else ttl
+    reservation_id = uuid.uuid4()
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    stock = Stock.objects.using(using)
+    with transaction.atomic(using=using):
+        failed = [
+            pk
+            for pk, units in lines
+            if not stock.filter(product_inventory_id=pk)
+            .alias(available=available())
+            .filter(available__gte=units)
+            .update(units_reserved=F("units_reserved") + units)
+        ]
+        if failed:
+            # Roll back the lines that did succeed.
+            raise InsufficientStock(failed)
+        StockReservation.objects.using(using).bulk_create(
+            StockReservation(
+                reservation_id=reservation_id,
+                product_inventory_id=pk,
+                units=units,
+                expires_at=expires_at,
+            )
+            for pk, units in lines
+        )
+    return reservation_id
+
+
+def _claim(reservations):
+    """Lock and return the lines of the given reservations as a sorted
+    list of (product_inventory_id, units).
+
+    The no-op UPDATE takes the row locks (and on SQLite the write lock)
+    before reading, so two workers can not both commit or release the
+    same reservation.
+    """
+    if not reservations.update(expires_at=F("expires_at")):
+        return []
+    lines = reservations.values("product_inventory_id").annotate(
+        total=Sum("units")
+    )
+    result = sorted(
+        (line["product_inventory_id"], line["total"]) for line in lines
+    )
+    reservations.delete()
+    return result
+
+
+def commit_reservation(reservation_id, using=DEFAULT_DB_ALIAS):
+    """Turn a reservation into a sale: the reserved units are released
+    and leave the stock as sale movements"""
+    with transaction.atomic(using=using):
+        lines = _claim(
+            StockReservation.objects.using(using).filter(
+                reservation_id=reservation_id
+            )
+        )
+        if not lines:
+            raise ReservationNotFound(reservation_id)
+        _unreserve(lines, using)
+        _append(
+            [(pk, -units) for pk, units in lines],
+            StockMovement.Reason.SALE,
+            str(reservation_id),
+            using,
+        )
+    return dict(lines)
+
+
+def release_reservation(reservation_id, using=DEFAULT_DB_ALIAS):
+    """Give the units of a reservation back to available stock"""
+    with transaction.atomic(using=using):
+        lines = _claim(
+            StockReservation.objects.using(using).filter(
+                reservation_id=reservation_id
+            )
+        )
+        if not lines:
+            raise ReservationNotFound(reservation_id)
+        _unreserve(lines, using)
+    return dict(lines)
+
+
+def release_expired(now=None, using=DEFAULT_DB_ALIAS):
+    """Release every reservation past its expiry; return the number of
+    units handed back to available stock"""
+    now = now or timezone.now()
+    with transaction.atomic(using=using):
+        lines = _claim(
+            StockReservation.objects.using(using).filter(expires_at__lt=now)
+        )
+        _unreserve(lines, using)
+    return sum(units for _, units in lines)
+
+
+def _unreserve(lines, using):
+    stock = Stock.objects.using(using)
+    for pk, units in lines:
+        stock.filter(product_inventory_id=pk).update(
+            units_reserved=F("units_reserved") - units
+        )
+
+
+def decrement(
+    product_inventory_id, units, reference="", using=DEFAULT_DB_ALIAS
+):
+    """Sell units directly, without a prior reservation"""
+    decrement_many(
+        {product_inventory_id: units}, reference=reference, using=using
+    )
+
+
+def decrement_many(
+    lines, reference="", chunk_size=DEFAULT_CHUNK_SIZE, using=DEFAULT_DB_ALIAS
+):
+    """Sell units of many products, all or nothing.
+
+    Each chunk of lines locks its Stock rows and is checked with one
+    SELECT whose per-row amounts come from a CASE expression, then every
+    line is appended as a sale movement, so thousands of order lines
+    cost a handful of statements and no Stock row is written.
+    """
+    lines = normalize_lines(lines)
+    stock = Stock.objects.using(using)
+    with transaction.atomic(using=using):
+        for start in range(0, len(lines), chunk_size):
+            chunk = dict(lines[start : start + chunk_size])
+            # Concurrent sales of these items wait here until this one
+            # has appended its movements; no-op on SQLite
+            list(
+                stock.select_for_update()
+                .filter(product_inventory_id__in=chunk)
+                .order_by("product_inventory_id")
+                .values_list("pk", flat=True)
+            )
+            amount = Case(
+                *[
+                    When(product_inventory_id=pk, then=Value(units))
+                    for pk, units in chunk.items()
+                ],
+                output_field=IntegerField(),
+            )
+            sufficient = set(
+                stock.filter(product_inventory_id__in=chunk)
+                .alias(available=available())
+                .filter(available__gte=amount)
+                .values_list("product_inventory_id", flat=True)
+            )
+            if len(sufficient) != len(chunk):
+                raise InsufficientStock(set(chunk) - sufficient)
+        _append(
+            [(pk, -units) for pk, units in lines],
+            StockMovement.Reason.SALE,
+            reference,
+            using,
+        )
+
+
+def record(lines, reason, reference="", using=DEFAULT_DB_ALIAS):
+    """Append movements of signed units, {product_inventory_id: delta}
+    or (id, delta) pairs: restocks, returns and count adjustments.
+
+    Sales go through decrement_many() or a reservation, which check
+    that the units are available.
+    """
+    if reason not in StockMovement.Reason.values:
+        raise ValueError("Invalid stock movement reason %r" % reason)
+    if reason == StockMovement.Reason.SALE:
+        raise ValueError("Sales must check availability, see decrement()")
+    if hasattr(lines, "items"):
+        lines = lines.items()
+    merged = defaultdict(int)
+    for pk, delta in lines:
+        merged[pk] += delta
+    if not all(merged.values()):
+        raise ValueError("Movements must change the units")
+    lines = sorted(merged.items())
+    with transaction.atomic(using=using):
+        _append(lines, reason, reference, using)
+
+
+def _append(lines, reason, reference, using):
+    StockMovement.objects.using(using).bulk_create(
+        (
+            StockMovement(
+                product_inventory_id=pk,
+                delta=delta,
+                reason=reason,
+                reference=reference,
+            )
+            for pk, delta in lines
+        ),
+        batch_size=DEFAULT_CHUNK_SIZE,
+    )
+
+
+def compact(batch_size=DEFAULT_CHUNK_SIZE, using=DEFAULT_DB_ALIAS):
+    """Fold pending movements into Stock.units and units_sold, oldest
+    first and one transaction per batch; returns how many were folded.
+
+    The read model of the folded items catches up with their sales and
+    restocks in the same transaction. Concurrent compactions take
+    disjoint batches where the backend supports SKIP LOCKED; SQLite runs
+    them one after the other.
+    """
+    movements = StockMovement.objects.using(using)
+    stock = Stock.objects.using(using)
+    sold_reasons = {StockMovement.Reason.SALE, StockMovement.Reason.RETURN}
+    folded = 0
+    while True:
+        with transaction.atomic(using=using):
+            batch = list(
+                movements.pending()
+                .select_for_update(skip_locked=True)
+                .order_by("pk")
+                .values_list("pk", "product_inventory_id", "delta", "reason")[
+                    :batch_size
+                ]
+            )
+            if not batch:
+                return folded
+            units = defaultdict(int)
+            sold = defaultdict(int)
+            for _, pk, delta, reason in batch:
+                units[pk] += delta
+                if reason in sold_reasons:
+                    sold[pk] -= delta
+            # Restocks of items that had no Stock row yet
+            missing = set(units) - set(
+                stock.filter(product_inventory_id__in=units).values_list(
+                    "product_inventory_id", flat=True
+                )
+            )
+            stock.bulk_create(
+                Stock(product_inventory_id=pk) for pk in sorted(missing)
+            )
+            stock.filter(product_inventory_id__in=units).update(
+                units=F("units") + _per_item(units),
+                units_sold=F("units_sold") + _per_item(sold),
+            )
+            movements.filter(pk__in=[row[0] for row in batch]).update(
+                compacted_at=timezone.now()
+            )
+            read_model.refresh_stock(units, using=using)
+        folded += len(batch)
+        if len(batch) < batch_size:
+            return folded
+
+
+def _per_item(amounts):
+    return Case(
+        *[
+            When(product_inventory_id=pk, then=Value(amount))
+            for pk, amount in amounts.items()
+        ],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
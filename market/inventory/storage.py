@@ -0,0 +1,94 @@
+"""Content-addressed file storage for catalog images.
+
+Saved files are named by the SHA-256 of their content and sharded into
+nested directories under the upload_to prefix:
+
+    images/3f/a2/3fa2...e1.png
+
+Two levels of 256 directories keep every directory small at millions of
+files. Uploading content that is already stored returns the existing
+name without writing anything, so duplicates share one file. Files may
+therefore be referenced by many rows and are never deleted implicitly.
+
+Names written by a plain FileSystemStorage keep working; the
+``migrate-image-storage`` command moves them into the sharded layout.
+"""
+import hashlib
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+
+SHARD_DEPTH = getattr(settings, "IMAGE_STORAGE_SHARD_DEPTH", 2)
+SHARD_WIDTH = 2
+CHUNK_SIZE = 64 * 1024
+
+HASHED_NAME_RE = re.compile(
+    r"(?:^|/)(?:[0-9a-f]{%d}/){%d}[0-9a-f]{64}(?:\.[a-z0-9]+)?$"
+    % (SHARD_WIDTH, SHARD_DEPTH)
+)
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    if hasattr(content, "seek"):
+        content.seek(0)
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    if hasattr(content, "seek"):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def shards(digest):
+    return [
+        digest[i * SHARD_WIDTH : (i + 1) * SHARD_WIDTH]
+        for i in range(SHARD_DEPTH)
+    ]
+
+
+def upload_directory(name):
+    """The directory ``name`` was uploaded to, without the shards when
+    it is derived from a stored name (e.g. an image rendition)"""
+    directory, basename = posixpath.split(name)
+    parts = directory.split("/") if directory else []
+    if parts[-SHARD_DEPTH:] == shards(basename):
+        parts = parts[:-SHARD_DEPTH]
+    return "/".join(parts)
+
+
+def hashed_name(name, digest):
+    """Where content with ``digest`` uploaded as ``name`` is stored"""
+    extension = os.path.splitext(name)[1].lower()
+    return posixpath.join(
+        upload_directory(name), *shards(digest), digest + extension
+    )
+
+
+def is_hashed(name):
+    return bool(HASHED_NAME_RE.search(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        name = hashed_name(self.generate_filename(name), content_hash(content))
+        if max_length is not None and len(name) > max_length:
+            raise SuspiciousFileOperation(
+                "Storage name %r is longer than %d characters"
+                % (name, max_length)
+            )
+        if self.exists(name):
+            return name
+        # Losing a race with an identical upload stores a suffixed copy
+        name = self._save(name, content)
+        validate_file_name(name, allow_relative_path=True)
+        return name
@@ -0,0 +1,161 @@
+import pytest
+from django.urls import reverse
+
+from market.inventory import admin, models, stock
+
+
+@pytest.fixture
+def inventory(db, product_inventory_factory, media_factory, stock_factory):
+    items = product_inventory_factory.create_bulk(30, pool_size=10)
+    for item in items[:10]:
+        media_factory.create(product_inventory=item)
+        stock_factory.create(product_inventory=item)
+    stock.record({item.pk: 1 for item in items[:10]}, "restock")
+    return items
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        models.Product,
+        models.ProductInventory,
+        models.Media,
+        models.Stock,
+        models.StockMovement,
+        models.ProductAttributeValue,
+        models.Brand,
+        models.Category,
+    ],
+)
+def test_inventory_admin_changelist_queries(
+    admin_client, inventory, django_assert_max_num_queries, model
+):
+    url = reverse("admin:inventory_%s_changelist" % model._meta.model_name)
+    # Session, user, count and page; none per row
+    with django_assert_max_num_queries(8):
+        response = admin_client.get(url)
+    assert response.status_code == 200
+
+
+def test_inventory_admin_search_uses_indexed_lookups(admin_client, inventory):
+    item = inventory[3]
+    url = reverse("admin:inventory_productinventory_changelist")
+    response = admin_client.get(url, {"q": item.sku})
+    assert list(response.context["cl"].result_list) == [item]
+
+    url = reverse("admin:inventory_product_changelist")
+    response = admin_client.get(url, {"q": item.product.web_id})
+    assert list(response.context["cl"].result_list) == [item.product]
+    response = admin_client.get(url, {"q": item.product.name})
+    assert item.product in response.context["cl"].result_list
+
+
+@pytest.mark.parametrize(
+    "model, field",
+    [
+        (models.ProductInventory, "sku"),
+        (models.ProductAttributeValue, "attribute_value"),
+        (models.StockMovement, "reference"),
+    ],
+)
+def test_inventory_admin_search_is_not_a_scan(rf, admin_user, model, field):
+    request = rf.get("/")
+    request.user = admin_user
+    model_admin = admin.admin.site._registry[model]
+    queryset, _ = model_admin.get_search_results(
+        request, model.objects.all(), "term"
+    )
+    plan = queryset.explain()
+    assert "SCAN %s" % model._meta.db_table not in plan
+    assert field in str(queryset.query)
+
+
+def test_inventory_admin_autocomplete(admin_client, inventory):
+    response = admin_client.get(
+        reverse("admin:autocomplete"),
+        {
+            "app_label": "inventory",
+            "model_name": "stock",
+            "field_name": "product_inventory",
+            "term": inventory[0].sku,
+        },
+    )
+    assert [result["text"] for result in response.json()["results"]] == [
+        inventory[0].product.name
+    ]
+
+
+def test_inventory_admin_estimated_count(inventory, monkeypatch):
+    queryset = models.ProductInventory.objects.order_by("pk")
+    assert admin.EstimatedCountPaginator(queryset, 10).count == 30
+
+    monkeypatch.setattr(admin, "EXACT_COUNT_THRESHOLD", 5)
+    models.ProductInventory.objects.filter(pk=inventory[-2].pk).delete()
+    # The estimate comes from the rowid, not from counting rows
+    assert admin.EstimatedCountPaginator(queryset, 10).count == (
+        inventory[-1].pk
+    )
+    # Filtered lists are counted exactly
+    filtered = queryset.filter(is_active=True)
+    assert admin.EstimatedCountPaginator(filtered, 10).count == 29
+
+
+def test_inventory_admin_category_tree(admin_client, category_factory):
+    root = category_factory.create(name="root", slug="root")
+    children = [
+        category_factory.create(name="c%03d" % i, slug="c", parent=root)
+        for i in range(105)
+    ]
+    category_factory.create(name="leaf", slug="leaf", parent=children[0])
+    url = reverse("admin:inventory_category_changelist")
+    response = admin_client.get(url)
+    assert response.templates[0].name == "admin/inventory/category/tree.html"
+    response = admin_client.get(url, {"q": "c00"})
+    assert len(response.context["cl"].result_list) == 10
+
+    url = reverse("admin:inventory_category_tree_children")
+    roots = admin_client.get(url).json()
+    assert [
+        (r["name"], r["descendants"], r["products"]) for r in roots["results"]
+    ] == [("root", 106, 0)]
+    page = admin_client.get(url, {"parent": root.pk}).json()
+    assert page["results"][0]["descendants"] == 1
+    page = admin_client.get(
+        url, {"parent": root.pk, "cursor": page["next"]}
+    ).json()
+    assert [r["name"] for r in page["results"]] == [
+        "c100",
+        "c101",
+        "c102",
+        "c103",
+        "c104",
+    ]
+    assert page["next"] is None
+    assert admin_client.get(url, {"cursor": "x"}).status_code == 400
+
+
+def test_inventory_admin_category_tree_moves(
+    admin_client, category_factory, django_capture_on_commit_callbacks
+):
+    a = category_factory.create(name="a", slug="a")
+    b = category_factory.create(name="b", slug="b")
+    c = category_factory.create(name="c", slug="c", parent=a)
+    url = reverse("admin:inventory_category_tree_move")
+    assert admin_client.get(url).status_code == 405
+
+    response = admin_client.post(
+        url, {"moves": [[c.pk, a.pk], [a.pk, c.pk]]}, "application/json"
+    )
+    assert response.status_code == 400
+    with django_capture_on_commit_callbacks(execute=True):
+        response = admin_client.post(
+            url,
+            {"moves": [[str(a.pk), str(b.pk)], [c.pk, None]]},
+            "application/json",
+        )
+    assert response.json() == {"moved": 2, "renumbered": 3}
+    a.refresh_from_db()
+    b.refresh_from_db()
+    assert a.parent_id == b.pk
+    assert list(b.get_descendants()) == [a]
+    assert models.Category.objects.get(pk=c.pk).is_root_node()
@@ -0,0 +1,51 @@
+import pytest
+
+from market.inventory import models
+from market.tests import factories
+
+
+@pytest.fixture(autouse=True)
+def reset_sequences():
+    # Other tests expect values such as "attribute_name_0".
+    yield
+    for factory in (
+        factories.ProductFactory,
+        factories.ProductTypeFactory,
+        factories.BrandFactory,
+        factories.ProductInventoryFactory,
+        factories.ProductAttributeFactory,
+    ):
+        factory.reset_sequence()
+
+
+def test_inventory_bulk_factory_pools_parents(
+    db,
+    category_factory,
+    product_inventory_factory,
+    django_assert_max_num_queries,
+):
+    category = category_factory.create()
+    with django_assert_max_num_queries(10):
+        items = product_inventory_factory.create_bulk(
+            120, pool_size=10, category=[category]
+        )
+    assert len(items) == models.ProductInventory.objects.count() == 120
+    assert models.Product.objects.count() == 10
+    assert models.Brand.objects.count() == 10
+    assert models.Product.objects.filter(category=category).count() == 10
+    assert {item.product_id for item in items[:10]} == set(
+        models.Product.objects.values_list("pk", flat=True)
+    )
+
+
+def test_inventory_bulk_factory_attribute_links(
+    db, product_with_attribute_lists_factory
+):
+    items = product_with_attribute_lists_factory.create_bulk(
+        30, pool_size=5, attributes=3
+    )
+    assert models.ProductAttribute.objects.count() == 3
+    assert models.ProductAttributeValue.objects.count() == 15
+    assert models.ProductAttributeLists.objects.count() == 90
+    item = models.ProductInventory.objects.get(pk=items[0].pk)
+    assert item.attribute_values.count() == 3
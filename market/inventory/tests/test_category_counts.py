@@ -0,0 +1,141 @@
+import io
+
+import pytest
+from django.core.management import call_command
+
+from market.inventory import category_counts, models
+from market.inventory.category_moves import move_categories
+
+
+@pytest.fixture
+def tree(db, category_factory):
+    fashion = category_factory.create(name="fashion", slug="fashion")
+    woman = category_factory.create(name="woman", slug="woman", parent=fashion)
+    shoes = category_factory.create(name="shoes", slug="shoes", parent=woman)
+    men = category_factory.create(name="men", slug="men", parent=fashion)
+    return fashion, woman, shoes, men
+
+
+def counts():
+    return dict(
+        models.CategoryProductCount.objects.values_list(
+            "category_id", "cumulative"
+        )
+    )
+
+
+def recounted():
+    """The counts a full recount gives, leaving the table as it was"""
+    current = list(models.CategoryProductCount.objects.all())
+    category_counts.recount()
+    result = counts()
+    models.CategoryProductCount.objects.bulk_update(
+        current, ["direct", "cumulative"]
+    )
+    return result
+
+
+def test_inventory_category_counts_follow_links(tree, product_factory):
+    fashion, woman, shoes, men = tree
+    boots = product_factory.create(category=[shoes])
+    shirt = product_factory.create(category=[men, woman])
+    hidden = product_factory.create(category=[shoes], is_active=False)
+    assert counts() == {fashion.pk: 3, woman.pk: 2, shoes.pk: 1, men.pk: 1}
+
+    shoes.product_set.add(shirt, hidden)
+    boots.category.remove(shoes, men)
+    hidden.is_active = True
+    hidden.save()
+    assert counts() == recounted()
+    assert counts()[shoes.pk] == 2
+
+    shirt.is_active = False
+    shirt.save()
+    men.product_set.clear()
+    boots.delete()
+    assert counts() == recounted()
+    assert counts() == {fashion.pk: 1, woman.pk: 1, shoes.pk: 1, men.pk: 0}
+    # The same numbers as mptt's correlated subqueries
+    annotated = models.Category.objects.add_related_count(
+        models.Category.objects.all(),
+        models.Product,
+        "category",
+        "products",
+        cumulative=True,
+        extra_filters={"is_active": True},
+    )
+    assert {c.pk: c.products for c in annotated} == counts()
+
+
+def test_inventory_category_counts_after_moves(
+    tree, product_factory, django_capture_on_commit_callbacks
+):
+    fashion, woman, shoes, men = tree
+    product_factory.create(category=[shoes])
+    with django_capture_on_commit_callbacks(execute=True):
+        move_categories({shoes.pk: men.pk})
+    assert counts() == {fashion.pk: 1, woman.pk: 0, shoes.pk: 1, men.pk: 1}
+
+    men.refresh_from_db()
+    men.parent = None
+    with django_capture_on_commit_callbacks(execute=True):
+        men.save()
+    assert counts()[fashion.pk] == 0
+
+
+def test_inventory_category_counts_one_recount_per_transaction(
+    tree, product_factory, django_capture_on_commit_callbacks
+):
+    fashion, woman, shoes, men = tree
+    product_factory.create(category=[fashion])
+    with django_capture_on_commit_callbacks() as callbacks:
+        models.Category.objects.filter(pk__in=[shoes.pk, men.pk]).delete()
+        woman.refresh_from_db()
+        woman.parent = None
+        woman.save()
+    recounts = [
+        c for c in callbacks if isinstance(c, category_counts.ScheduledRecount)
+    ]
+    assert len(recounts) == 1
+    recounts[0]()
+    assert counts() == {fashion.pk: 1, woman.pk: 0}
+
+
+def test_inventory_category_counts_product_saves_without_select(
+    tree, product_factory, django_assert_num_queries
+):
+    fashion, woman, shoes, men = tree
+    product = product_factory.create(category=[shoes])
+    product = models.Product.objects.get(pk=product.pk)
+    product.name = "renamed"
+    with django_assert_num_queries(3):
+        # The UPDATE, the copy of the name to the items and the read
+        # model's lookup of the items, no SELECT of is_active
+        product.save(update_fields=["name"])
+    assert counts()[fashion.pk] == 1
+    product.is_active = False
+    product.save()
+    assert counts() == {fashion.pk: 0, woman.pk: 0, shoes.pk: 0}
+
+
+def test_inventory_category_counts_snapshot(
+    tree,
+    product_factory,
+    django_assert_num_queries,
+    django_capture_on_commit_callbacks,
+):
+    fashion, woman, shoes, men = tree
+    call_command("recount-category-products", stdout=io.StringIO())
+    category_counts.invalidate_product_counts()
+    snapshot = category_counts.get_product_counts()
+    with django_assert_num_queries(0):
+        assert category_counts.get_product_counts() is snapshot
+        assert snapshot.cumulative(fashion.pk) == 0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        product_factory.create(category=[shoes])
+    snapshot = category_counts.get_product_counts()
+    assert (snapshot.direct(fashion.pk), snapshot.cumulative(fashion.pk)) == (
+        0,
+        1,
+    )
@@ -0,0 +1,118 @@
+import pytest
+
+from market.inventory import models
+from market.inventory.category_moves import MoveError, move_categories
+from market.inventory.category_tree import (
+    CategoryTree,
+    get_category_tree,
+    invalidate_category_tree,
+)
+
+
+@pytest.fixture
+def category_tree_data(db, category_factory):
+    fashion = category_factory.create(name="fashion", slug="fashion")
+    woman = category_factory.create(name="woman", slug="woman", parent=fashion)
+    men = category_factory.create(name="men", slug="men", parent=fashion)
+    shoes = category_factory.create(name="shoes", slug="shoes", parent=woman)
+    invalidate_category_tree()
+    return fashion, woman, men, shoes
+
+
+def test_inventory_category_tree_matches_mptt(
+    category_tree_data, django_assert_num_queries
+):
+    fashion, woman, men, shoes = category_tree_data
+    tree = CategoryTree.load()
+    with django_assert_num_queries(0):
+        ancestors = [node.id for node in tree.ancestors(shoes.id)]
+        descendants = list(tree.descendant_ids(fashion.id))
+        children = [node.id for node in tree.children(fashion.id)]
+        path = tree.get(shoes.id).path
+        by_path = tree.get_by_path("fashion/woman").id
+    assert ancestors == [c.id for c in shoes.get_ancestors()]
+    assert descendants == [c.id for c in fashion.get_descendants()]
+    assert children == [c.id for c in fashion.get_children()]
+    assert path == "fashion/woman/shoes"
+    assert by_path == woman.id
+    assert tree.subtree_ids(woman.id) == {woman.id, shoes.id}
+    assert tree.descendant_count(fashion.id) == 3
+
+
+def test_inventory_category_tree_reloads_after_save(
+    category_tree_data,
+    category_factory,
+    django_capture_on_commit_callbacks,
+    django_assert_num_queries,
+):
+    fashion, woman, men, shoes = category_tree_data
+    tree = get_category_tree()
+    with django_assert_num_queries(0):
+        assert get_category_tree() is tree
+
+    with django_capture_on_commit_callbacks(execute=True):
+        boots = category_factory.create(
+            name="boots", slug="boots", parent=shoes
+        )
+    new_tree = get_category_tree()
+    assert new_tree is not tree
+    assert new_tree.version != tree.version
+    assert new_tree.get(boots.id).path == "fashion/woman/shoes/boots"
+    assert boots.id not in tree
+
+    with django_capture_on_commit_callbacks(execute=True):
+        models.Category.objects.get(id=boots.id).delete()
+    assert boots.id not in get_category_tree()
+
+
+def tree_fields():
+    return list(
+        models.Category.objects.order_by("pk").values_list(
+            "pk", "parent_id", "lft", "rght", "level"
+        )
+    )
+
+
+def test_inventory_category_moves_batch_matches_rebuild(
+    category_tree_data,
+    category_factory,
+    django_capture_on_commit_callbacks,
+    django_assert_max_num_queries,
+):
+    fashion, woman, men, shoes = category_tree_data
+    home = category_factory.create(name="home", slug="home")
+    untouched = category_factory.create(name="toys", slug="toys")
+    before = get_category_tree()
+
+    # Lookup, locked read of the trees, next tree id and one UPDATE,
+    # inside a savepoint; then the product count recount (two reads and
+    # an upsert in its own savepoint)
+    with django_assert_max_num_queries(11):
+        with django_capture_on_commit_callbacks(execute=True):
+            move_categories(
+                {shoes.pk: men.pk, woman.pk: home.pk, men.pk: None}
+            )
+    assert models.Category.objects.get(pk=untouched.pk).tree_id == (
+        untouched.tree_id
+    )
+    moved = tree_fields()
+    # rebuild() also renumbers the tree ids of every tree
+    models.Category.objects.rebuild()
+    assert moved == tree_fields()
+    tree = get_category_tree()
+    assert tree is not before
+    assert tree.get(shoes.pk).path == "men/shoes"
+    assert tree.get(woman.pk).path == "home/woman"
+
+
+def test_inventory_category_moves_reject_cycles(category_tree_data):
+    fashion, woman, men, shoes = category_tree_data
+    before = tree_fields()
+    with pytest.raises(MoveError):
+        move_categories({fashion.pk: shoes.pk})
+    with pytest.raises(MoveError):
+        # Each move alone is fine, together they form a loop
+        move_categories({men.pk: shoes.pk, woman.pk: men.pk})
+    with pytest.raises(MoveError):
+        move_categories({men.pk: 0})
+    assert tree_fields() == before
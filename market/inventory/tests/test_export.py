@@ -0,0 +1,91 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import threading
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from market.inventory import export, models, stock
+
+
+def catalog(product_inventory_factory, stock_factory, value_factory):
+    items = product_inventory_factory.create_batch(3)
+    stock_factory.create(product_inventory=items[0], units=5)
+    # Pending, not compacted
+    stock.decrement(items[0].pk, 1)
+    value = value_factory.create(
+        attribute_value="red", product_attribute__name="colour"
+    )
+    models.ProductAttributeLists.objects.create(
+        attributevalues=value, productinventory=items[0]
+    )
+    return items
+
+
+def test_inventory_export_csv_in_chunks(
+    db,
+    tmp_path,
+    product_inventory_factory,
+    stock_factory,
+    product_attribute_value_factory,
+    django_assert_max_num_queries,
+):
+    items = catalog(
+        product_inventory_factory,
+        stock_factory,
+        product_attribute_value_factory,
+    )
+    # Four queries per chunk (ids, items, images, attributes), not per item
+    with django_assert_max_num_queries(3 * 4 + 1):
+        blocks = list(export.export("csv", chunk_size=1))
+    assert len(blocks) == 3
+
+    path = tmp_path / "catalog.csv"
+    call_command("export-catalog", "--output", str(path), stderr=io.StringIO())
+    rows = list(csv.DictReader(path.open()))
+    assert [row["sku"] for row in rows] == [item.sku for item in items]
+    assert rows[0]["units"] == "4"
+    assert json.loads(rows[0]["attributes"]) == {"colour": "red"}
+    assert rows[0]["web_id"] == items[0].product.web_id
+
+
+def test_inventory_export_view_jsonl_gzip(
+    client,
+    admin_user,
+    product_inventory_factory,
+    stock_factory,
+    product_attribute_value_factory,
+):
+    items = catalog(
+        product_inventory_factory,
+        stock_factory,
+        product_attribute_value_factory,
+    )
+    url = reverse("inventory:catalog-export")
+    assert client.get(url).status_code == 403
+    client.force_login(admin_user)
+    assert client.get(url, {"format": "xml"}).status_code == 400
+
+    response = client.get(url, {"format": "jsonl", "gzip": "1"})
+    assert response.streaming
+    assert "catalog.jsonl.gz" in response["Content-Disposition"]
+    body = gzip.decompress(b"".join(response.streaming_content))
+    rows = [json.loads(line) for line in body.decode().splitlines()]
+    assert [row["sku"] for row in rows] == [item.sku for item in items]
+    assert rows[0]["sale_price"] == "46.00"
+
+
+def test_inventory_export_off_event_loop():
+    def blocks():
+        yield threading.get_ident()
+        yield threading.get_ident()
+
+    async def consume():
+        return list(export.off_event_loop(blocks()))
+
+    assert list(export.off_event_loop(blocks())) == [threading.get_ident()] * 2
+    worker_threads = asyncio.run(consume())
+    assert threading.get_ident() not in worker_threads
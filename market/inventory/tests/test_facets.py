@@ -0,0 +1,165 @@
+import pytest
+from django.core.cache import cache
+
+from market.inventory import facets, models
+from market.inventory.facets import (
+    FacetEngine,
+    from_bitmap,
+    get_facet_engine,
+    invalidate_facet_engine,
+    price_bucket,
+    to_bitmap,
+)
+
+
+@pytest.fixture
+def facet_data(
+    db,
+    product_attribute_factory,
+    product_attribute_value_factory,
+    product_inventory_factory,
+):
+    size = product_attribute_factory.create(name="size")
+    colour = product_attribute_factory.create(name="colour")
+    size_10, size_11 = (
+        product_attribute_value_factory.create(
+            product_attribute=size, attribute_value=value
+        )
+        for value in ("10", "11")
+    )
+    red, blue = (
+        product_attribute_value_factory.create(
+            product_attribute=colour, attribute_value=value
+        )
+        for value in ("red", "blue")
+    )
+    combinations = [
+        (size_10, red, 20),
+        (size_10, blue, 30),
+        (size_11, red, 30),
+        (size_11, blue, 120),
+    ]
+    items = []
+    for size_value, colour_value, price in combinations:
+        item = product_inventory_factory.create(sale_price=price)
+        for value in (size_value, colour_value):
+            models.ProductAttributeLists.objects.create(
+                attributevalues=value, productinventory=item
+            )
+        items.append(item)
+    invalidate_facet_engine()
+    return size, colour, size_10, size_11, red, blue, items
+
+
+def test_inventory_facets_bitmap_roundtrip():
+    ids = [0, 3, 8, 64, 1000]
+    assert from_bitmap(to_bitmap(ids)) == ids
+    assert from_bitmap(0) == []
+
+
+def test_inventory_facets_query(facet_data, django_assert_num_queries):
+    size, colour, size_10, size_11, red, blue, items = facet_data
+    engine = get_facet_engine()
+    with django_assert_num_queries(0):
+        result = engine.query({size.id: [size_10.id]})
+    assert result.ids == [items[0].id, items[1].id]
+    # Counts of the selected attribute ignore its own selection.
+    assert result.attribute_counts[size.id] == {size_10.id: 2, size_11.id: 2}
+    assert result.attribute_counts[colour.id] == {red.id: 1, blue.id: 1}
+    assert result.price_counts[price_bucket(20)] == 1
+    assert result.price_counts[price_bucket(30)] == 1
+    assert result.price_counts[price_bucket(120)] == 0
+
+    result = engine.query(
+        {size.id: [size_10.id, size_11.id], colour.id: [red.id]},
+        price_buckets=[price_bucket(30)],
+    )
+    assert result.ids == [items[2].id]
+    assert result.price_counts[price_bucket(20)] == 1
+
+    result = engine.query(within=[items[3].id])
+    assert result.count == 1
+
+
+def test_inventory_facets_incremental_update(
+    facet_data, django_capture_on_commit_callbacks
+):
+    size, colour, size_10, size_11, red, blue, items = facet_data
+    engine = get_facet_engine()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        models.ProductAttributeLists.objects.create(
+            attributevalues=size_10, productinventory=items[3]
+        )
+        items[0].sale_price = 150
+        items[0].save()
+        items[1].is_active = False
+        items[1].save()
+    # Patched in place rather than reloaded.
+    assert get_facet_engine() is engine
+    result = engine.query({size.id: [size_10.id]})
+    assert result.ids == [items[0].id, items[3].id]
+    assert result.price_counts[price_bucket(150)] == 2
+
+    with django_capture_on_commit_callbacks(execute=True):
+        models.ProductAttributeLists.objects.filter(
+            attributevalues=size_10, productinventory=items[3]
+        ).get().delete()
+    assert get_facet_engine().query({size.id: [size_10.id]}).ids == [
+        items[0].id
+    ]
+
+
+def test_inventory_facets_m2m_add(
+    facet_data, django_capture_on_commit_callbacks
+):
+    size, colour, size_10, size_11, red, blue, items = facet_data
+    engine = get_facet_engine()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        items[3].attribute_values.add(size_10)
+        red.product_attribute_values.add(items[1])
+    assert get_facet_engine() is engine
+    assert engine.query({size.id: [size_10.id]}).ids == [
+        items[0].id,
+        items[1].id,
+        items[3].id,
+    ]
+    assert engine.query({colour.id: [red.id]}).ids == [
+        items[0].id,
+        items[1].id,
+        items[2].id,
+    ]
+    assert engine.postings == FacetEngine.load().postings
+
+
+def test_inventory_facets_replay_other_process_changes(
+    facet_data, django_capture_on_commit_callbacks, django_assert_num_queries
+):
+    size, colour, size_10, size_11, red, blue, items = facet_data
+    engine = get_facet_engine()
+    # Another process's engine, built before the change below
+    other = FacetEngine.load(version=engine.version)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        models.ProductAttributeLists.objects.create(
+            attributevalues=size_10, productinventory=items[3]
+        )
+    facets._engine = other
+    with django_assert_num_queries(0):
+        # Replayed from the logged change, not reloaded
+        assert get_facet_engine() is other
+        assert other.query({size.id: [size_10.id]}).ids == [
+            items[0].id,
+            items[1].id,
+            items[3].id,
+        ]
+
+    stale = FacetEngine.load(version=other.version)
+    with django_capture_on_commit_callbacks(execute=True):
+        items[0].sale_price = 150
+        items[0].save()
+    cache.delete(facets.CHANGES_CACHE_KEY % (stale.version + 1))
+    facets._engine = stale
+    # The change expired, so the engine is reloaded
+    assert get_facet_engine() is not stale
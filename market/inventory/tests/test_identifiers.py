@@ -0,0 +1,116 @@
+import io
+
+import pytest
+from django.core.management import call_command
+
+from market.inventory import identifiers, models
+
+
+@pytest.fixture
+def catalog(db, product_inventory_factory):
+    items = product_inventory_factory.create_batch(3)
+    identifiers.invalidate_identifier_index()
+    return items
+
+
+def test_inventory_identifiers_bloom_filter():
+    bloom = identifiers.BloomFilter(5000)
+    for n in range(5000):
+        bloom.add("sku-%d" % n)
+    assert all("sku-%d" % n in bloom for n in range(5000))
+    false_positives = sum("new-%d" % n in bloom for n in range(10000))
+    assert false_positives < 300
+    assert not bloom.saturated
+
+
+@pytest.mark.parametrize("exact", [True, False])
+def test_inventory_identifiers_classify(
+    catalog, settings, django_assert_num_queries, exact
+):
+    settings.IDENTIFIER_INDEX_EXACT = exact
+    skus = [item.sku for item in catalog]
+    # Counts and a single pass over each model
+    with django_assert_num_queries(4):
+        identifiers.get_identifier_index()
+    # Without the exact sets the database settles what the filter passes
+    with django_assert_num_queries(0 if exact else 1):
+        new, existing = identifiers.classify("sku", skus + ["new-1", "new-2"])
+    assert (new, existing) == ({"new-1", "new-2"}, set(skus))
+    new, existing = identifiers.classify("web_id", [catalog[0].product.web_id])
+    assert existing == {catalog[0].product.web_id}
+    with pytest.raises(ValueError):
+        identifiers.classify("name", [])
+
+
+def test_inventory_identifiers_follow_changes(
+    catalog,
+    product_inventory_factory,
+    django_capture_on_commit_callbacks,
+):
+    index = identifiers.get_identifier_index()
+    first, second, third = catalog
+    old_sku = first.sku
+    with django_capture_on_commit_callbacks(execute=True):
+        created = product_inventory_factory.create()
+        first.sku = "renamed"
+        first.save()
+        second.delete()
+        identifiers.add_identifiers("sku", ["bulk-1"])
+    # Patched in place rather than reloaded
+    assert identifiers.get_identifier_index() is index
+    new, existing = identifiers.classify(
+        "sku", [created.sku, "renamed", "bulk-1", old_sku, second.sku]
+    )
+    assert existing == {created.sku, "renamed", "bulk-1"}
+    assert new == {old_sku, second.sku}
+
+
+def test_inventory_identifiers_renames_without_queries(
+    catalog, django_capture_on_commit_callbacks, django_assert_num_queries
+):
+    index = identifiers.get_identifier_index()
+    item = models.ProductInventory.objects.get(pk=catalog[0].pk)
+    old_sku = item.sku
+    with django_capture_on_commit_callbacks(execute=True):
+        item.sale_price = 5
+        with django_assert_num_queries(1):
+            # The UPDATE alone
+            item.save()
+        item.sku = "renamed"
+        with django_assert_num_queries(1):
+            item.save(update_fields=["sku"])
+    assert identifiers.get_identifier_index() is index
+    assert identifiers.classify("sku", ["renamed", old_sku]) == (
+        {old_sku},
+        {"renamed"},
+    )
+
+    # A deferred identifier has no known old value: reload
+    item = models.ProductInventory.objects.only("pk").get(pk=catalog[1].pk)
+    with django_capture_on_commit_callbacks(execute=True):
+        item.sku = "also-renamed"
+        item.save(update_fields=["sku"])
+    assert identifiers.get_identifier_index() is not index
+    assert identifiers.classify("sku", ["also-renamed"])[1] == {"also-renamed"}
+
+
+def test_inventory_identifiers_command(catalog, tmp_path):
+    feed = tmp_path / "feed.csv"
+    feed.write_text(
+        "sku,upc\n%s,%s\nnew-sku,%s\n"
+        % (catalog[0].sku, catalog[0].upc, catalog[1].upc)
+    )
+    out = io.StringIO()
+    call_command(
+        "check-identifiers",
+        str(feed),
+        "--field=sku",
+        "--field=upc",
+        "--list-new",
+        stdout=out,
+    )
+    assert out.getvalue().splitlines()[:3] == [
+        "new-sku",
+        "sku: 1 new, 1 existing",
+        "upc: 0 new, 2 existing",
+    ]
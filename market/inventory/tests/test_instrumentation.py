@@ -0,0 +1,44 @@
+from django.http import HttpResponse
+
+from market.inventory import instrumentation
+from market.inventory.models import ProductInventory
+
+
+def list_items(request):
+    # ProductInventory.__str__ fetches each item's product
+    return HttpResponse(", ".join(map(str, ProductInventory.objects.all())))
+
+
+def test_inventory_fingerprint_collapses_literals():
+    assert instrumentation.fingerprint(
+        "SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"
+    ) == instrumentation.fingerprint(
+        "SELECT * FROM t WHERE id IN (%s) AND name = 'y' LIMIT 21"
+    )
+
+
+def test_inventory_query_count_middleware_flags_n_plus_one(
+    db, rf, product_inventory_factory, caplog
+):
+    product_inventory_factory.create_batch(6)
+    request = rf.get("/items/")
+    response = instrumentation.QueryCountMiddleware(list_items)(request)
+
+    stats = request.query_stats
+    assert stats.count == 7
+    assert stats.duplicates == 5
+    assert response["Server-Timing"].startswith("db;dur=")
+    assert '7 queries, 5 duplicates"' in response["Server-Timing"]
+    [site] = stats.repeated.values()
+    assert "models.py" in site and "__str__" in site
+    assert "Probable N+1 query on /items/: 6 times" in caplog.text
+
+
+def test_inventory_query_count_middleware_sampling(monkeypatch, rf):
+    monkeypatch.setattr(instrumentation, "SAMPLE_RATE", 0)
+    request = rf.get("/")
+    response = instrumentation.QueryCountMiddleware(
+        lambda request: HttpResponse()
+    )(request)
+    assert not response.has_header("Server-Timing")
+    assert not hasattr(request, "query_stats")
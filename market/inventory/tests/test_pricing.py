@@ -0,0 +1,93 @@
+import io
+from decimal import Decimal
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+
+from market.inventory import models, pricing
+
+
+@pytest.fixture
+def items(db, product_inventory_factory, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        return [
+            product_inventory_factory.create(sku="a", sale_price=10),
+            product_inventory_factory.create(sku="b", sale_price=20),
+        ]
+
+
+def prices(sku):
+    return models.ProductInventory.objects.values_list(
+        "retail_price", "store_price", "sale_price"
+    ).get(sku=sku)
+
+
+def test_inventory_pricing_update_csv(items):
+    stream = io.StringIO(
+        "sku,retail_price,sale_price\n"
+        "a,99.50,12.25\n"
+        "b,97,20\n"
+        "missing,1,1\n"
+    )
+    report = pricing.update_prices_from(stream, "csv", chunk_size=2)
+    assert (report.read, report.updated, report.unchanged) == (3, 1, 1)
+    assert report.unknown == 1
+    assert prices("a") == (Decimal("99.50"), 92, Decimal("12.25"))
+    row = models.ProductReadModel.objects.get(sku="a")
+    assert row.sale_price == Decimal("12.25")
+    assert row.product_min_price == Decimal("12.25")
+
+
+def test_inventory_pricing_invalid_records_roll_back(items):
+    stream = io.StringIO(
+        '{"sku": "a", "sale_price": 11}\n'
+        '{"sku": "b", "sale_price": 10000}\n'
+        '{"sku": "b", "store_price": 1.005}\n'
+        "not json\n"
+    )
+    with pytest.raises(pricing.PriceUpdateError) as e:
+        pricing.update_prices_from(stream, "jsonl")
+    assert [line for line, _ in e.value.report.errors] == [2, 3, 4]
+    assert prices("a")[2] == 10
+
+    stream.seek(0)
+    report = pricing.update_prices_from(stream, "jsonl", skip_invalid=True)
+    assert (report.updated, report.invalid) == (1, 3)
+    assert prices("a")[2] == 11
+
+
+def test_inventory_pricing_command_dry_run(items, tmp_path):
+    path = tmp_path / "prices.csv"
+    path.write_text("sku,sale_price\na,15\n")
+    out = io.StringIO()
+    call_command("update-prices", str(path), "--dry-run", stdout=out)
+    assert "a sale_price: 10.00 -> 15" in out.getvalue()
+    assert "Would update 1 item(s)" in out.getvalue()
+    assert prices("a")[2] == 10
+
+    call_command("update-prices", str(path), stdout=out)
+    assert prices("a")[2] == 15
+    with pytest.raises(CommandError):
+        call_command("update-prices", str(tmp_path / "prices.txt"))
+
+
+def test_inventory_pricing_api(client, admin_user, items):
+    url = reverse("inventory:price-update")
+    body = '{"sku": "b", "sale_price": "19.99"}\n'
+    assert (
+        client.post(url, body, content_type="application/jsonl").status_code
+        == 403
+    )
+    client.force_login(admin_user)
+    assert client.post(url, body, content_type="text/plain").status_code == 415
+
+    response = client.post(
+        url + "?dry_run=1", body, content_type="application/jsonl"
+    )
+    assert response.json()["changes"] == [
+        {"sku": "b", "field": "sale_price", "old": "20.00", "new": "19.99"}
+    ]
+    response = client.post(url, body, content_type="application/jsonl")
+    assert response.json()["updated"] == 1
+    assert prices("b")[2] == Decimal("19.99")
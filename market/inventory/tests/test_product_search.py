@@ -0,0 +1,59 @@
+from django.core.management import call_command
+
+from market.inventory import models
+from market.inventory.category_tree import invalidate_category_tree
+from market.inventory.search import match_expression
+
+
+def test_inventory_search_match_expression():
+    assert match_expression('run* "shoe" OR') == '"run" "shoe" "OR"*'
+    assert match_expression("  ") == ""
+
+
+def test_inventory_search_tracks_product_changes(db, product_factory):
+    sneaker = product_factory.create(
+        name="wildstar running sneakers", description="eco friendly"
+    )
+    boot = product_factory.create(
+        name="hiking boot", description="good for running uphill"
+    )
+    product_factory.create(name="dance shoe", description="light")
+
+    # Name matches rank above description matches.
+    result = list(models.Product.objects.search("running"))
+    assert result == [sneaker, boot]
+    assert list(models.Product.objects.search("sneak")) == [sneaker]
+
+    models.Product.objects.filter(pk=boot.pk).update(name="trail runner")
+    assert list(models.Product.objects.search("trail")) == [boot]
+    assert list(models.Product.objects.search("hiking")) == []
+
+    sneaker.delete()
+    assert list(models.Product.objects.search("wildstar")) == []
+
+
+def test_inventory_search_filters(db, product_factory, category_factory):
+    fashion = category_factory.create(name="fashion", slug="fashion")
+    shoes = category_factory.create(name="shoes", slug="shoes", parent=fashion)
+    sport = category_factory.create(name="sport", slug="sport")
+    invalidate_category_tree()
+    in_shoes = product_factory.create(name="red shoe", category=[shoes])
+    product_factory.create(name="red ball", category=[sport])
+    hidden = product_factory.create(
+        name="red hidden shoe", is_active=False, category=[shoes]
+    )
+
+    assert list(models.Product.objects.search("red", category=fashion)) == [
+        in_shoes
+    ]
+    assert set(
+        models.Product.objects.search(
+            "shoe", category=fashion.id, is_active=None
+        )
+    ) == {in_shoes, hidden}
+
+
+def test_inventory_search_rebuild_command(db, product_factory):
+    product = product_factory.create(name="velvet slipper")
+    call_command("rebuild-search-index", "--optimize")
+    assert list(models.Product.objects.search("velvet")) == [product]
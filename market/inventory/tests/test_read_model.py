@@ -0,0 +1,93 @@
+from market.inventory import models, read_model, stock
+
+
+def test_inventory_read_model_tracks_changes(
+    db,
+    product_inventory_factory,
+    media_factory,
+    stock_factory,
+    product_attribute_value_factory,
+    django_capture_on_commit_callbacks,
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        item = product_inventory_factory.create(sale_price=40)
+        sibling = product_inventory_factory.create(
+            product=item.product, sale_price=25
+        )
+        media_factory.create(product_inventory=item, is_featured=False)
+        featured = media_factory.create(
+            product_inventory=item, image="images/featured.png"
+        )
+        stock_factory.create(product_inventory=item, units=3)
+        value = product_attribute_value_factory.create(
+            attribute_value="10", product_attribute__name="size"
+        )
+        models.ProductAttributeLists.objects.create(
+            attributevalues=value, productinventory=item
+        )
+
+    row = models.ProductReadModel.objects.get(product_inventory=item)
+    assert row.name == item.product.name
+    assert row.brand_name == item.brand.name
+    assert row.image == featured.image
+    assert row.attributes == {"size": "10"}
+    assert (row.units, row.in_stock) == (3, True)
+    assert (row.product_min_price, row.product_max_price) == (25, 40)
+    assert row.product_in_stock
+
+    with django_capture_on_commit_callbacks(execute=True):
+        item.brand.name = "renamed"
+        item.brand.save()
+        sibling.sale_price = 10
+        sibling.save()
+    row.refresh_from_db()
+    assert row.brand_name == "renamed"
+    assert row.product_min_price == 10
+
+    stock.decrement(item.pk, 3)
+    stock.compact()
+    row.refresh_from_db()
+    assert (row.units, row.in_stock, row.product_in_stock) == (0, False, False)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        sibling.delete()
+    row.refresh_from_db()
+    assert not models.ProductReadModel.objects.filter(
+        product_inventory_id=sibling.pk
+    ).exists()
+    assert row.product_min_price == 40
+
+
+def test_inventory_read_model_rebuild(db, product_inventory_factory):
+    items = product_inventory_factory.create_batch(3)
+    models.ProductReadModel.objects.all().delete()
+    assert read_model.rebuild() == 3
+    assert set(
+        models.ProductReadModel.objects.values_list("sku", flat=True)
+    ) == {item.sku for item in items}
+
+
+def test_inventory_read_model_m2m_add(
+    db,
+    product_inventory_factory,
+    product_attribute_value_factory,
+    django_capture_on_commit_callbacks,
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        item, other = product_inventory_factory.create_batch(2)
+        size, colour = (
+            product_attribute_value_factory.create(
+                attribute_value=value, product_attribute__name=name
+            )
+            for name, value in (("size", "10"), ("colour", "red"))
+        )
+    with django_capture_on_commit_callbacks(execute=True):
+        item.attribute_values.add(size)
+        colour.product_attribute_values.add(item, other)
+    assert models.ProductReadModel.objects.get(pk=item.pk).attributes == {
+        "size": "10",
+        "colour": "red",
+    }
+    assert models.ProductReadModel.objects.get(pk=other.pk).attributes == {
+        "colour": "red"
+    }
@@ -0,0 +1,99 @@
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.urls import reverse
+from PIL import Image
+
+from market.inventory import renditions
+
+
+@pytest.fixture
+def image_name(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    image = Image.new("RGBA", (1000, 500), (200, 30, 30, 128))
+    content = ContentFile(b"")
+    image.save(content, "PNG")
+    return default_storage.save("images/photo.png", content)
+
+
+def test_inventory_renditions_generate(db, image_name, media_factory):
+    media = media_factory.create(image=image_name)
+    missing = media_factory.create(image="images/missing.png")
+
+    assert renditions.generate(media.__class__.objects.all(), workers=0) == (
+        1,
+        1,
+    )
+    media.refresh_from_db()
+    assert (media.width, media.height) == (1000, 500)
+    thumbnail = media.renditions["thumbnail"]["name"]
+    assert thumbnail.startswith("images/") and thumbnail.endswith(".webp")
+    assert (
+        media.renditions["thumbnail"]["width"],
+        media.renditions["thumbnail"]["height"],
+    ) == (160, 80)
+    # Smaller originals are not upscaled
+    assert media.renditions["zoom"]["width"] == 1000
+    with default_storage.open(media.renditions["zoom"]["name"]) as file:
+        assert Image.open(file).format == "JPEG"
+
+    # Current renditions are skipped; a replaced image is stale again
+    assert renditions.generate(
+        media.__class__.objects.filter(pk=media.pk), workers=0
+    ) == (0, 0)
+    assert not renditions.is_current("images/other.png", media.renditions)
+    missing.refresh_from_db()
+    assert missing.renditions == {}
+
+
+def test_inventory_renditions_shared_originals(
+    db, image_name, media_factory, monkeypatch
+):
+    rendered = []
+    render = renditions.render
+
+    def counting_render(name, storage=None):
+        rendered.append(name)
+        return render(name, storage)
+
+    monkeypatch.setattr(renditions, "render", counting_render)
+    media = media_factory.create_batch(3, image=image_name)
+    queryset = media[0].__class__.objects.order_by("pk")
+    shared = {}
+    assert renditions.render_batch(queryset.model, media[:2], shared=shared)
+    # Reused by a later batch of the same run
+    assert renditions.render_batch(queryset.model, media[2:], shared=shared)
+    assert rendered == [image_name]
+    assert len({row.renditions["zoom"]["name"] for row in queryset}) == 1
+
+
+def test_inventory_renditions_command_process_pool(
+    db, image_name, brand_factory
+):
+    brand = brand_factory.create(image=image_name)
+    call_command("generate-renditions", "brand", "--workers=2")
+    brand.refresh_from_db()
+    assert renditions.is_current(image_name, brand.renditions)
+    assert brand.width == 1000
+
+
+def test_inventory_renditions_lazy_view(client, db, image_name, media_factory):
+    media = media_factory.create(image=image_name)
+    url = reverse(
+        "inventory:media-rendition",
+        kwargs={"pk": media.pk, "rendition": "listing"},
+    )
+    response = client.get(url)
+    assert response.status_code == 302
+    assert response["Location"].endswith(".webp")
+    media.refresh_from_db()
+    row = {"id": media.pk, "image": image_name, "renditions": media.renditions}
+    listing = renditions.image_json(row)["listing"]
+    assert (listing["width"], listing["height"]) == (480, 240)
+
+    wrong = reverse(
+        "inventory:media-rendition",
+        kwargs={"pk": media.pk, "rendition": "poster"},
+    )
+    assert client.get(wrong).status_code == 404
@@ -0,0 +1,104 @@
+import asyncio
+import contextvars
+import sqlite3
+
+import pytest
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from market.inventory import models, replicas
+
+
+@pytest.fixture
+def router(settings):
+    settings.DATABASE_REPLICAS = ["replica1", "replica2"]
+    return replicas.ReplicaRouter()
+
+
+def test_inventory_replicas_routing(router):
+    def route():
+        reads = [
+            router.db_for_read(model)
+            for model in (models.Product, models.ProductInventory)
+        ]
+        primary = [
+            router.db_for_read(model)
+            for model in (models.Stock, models.ProductReadModel)
+        ]
+        router.db_for_write(models.Product)
+        return reads, primary, router.db_for_read(models.Product)
+
+    # A new context, as for a request
+    reads, primary, after_write = contextvars.Context().run(route)
+    # One replica for the whole request
+    assert reads[0] in ("replica1", "replica2") and reads[1] == reads[0]
+    assert primary == ["default", "default"]
+    assert after_write == "default"
+
+
+def test_inventory_replicas_primary_in_transactions(db, router):
+    # pytest-django runs the test inside a transaction on the primary
+    assert router.db_for_read(models.Product) == "default"
+    assert router.allow_migrate("replica1", "inventory") is False
+
+
+def test_inventory_replicas_pin_cookie(router):
+    def view(request):
+        if request.method == "POST":
+            router.db_for_write(models.Product)
+        return HttpResponse(router.db_for_read(models.Category))
+
+    middleware = replicas.ReplicaPinMiddleware(view)
+    factory = RequestFactory()
+
+    response = middleware(factory.get("/"))
+    assert response.content.startswith(b"replica")
+    assert replicas.PIN_COOKIE_NAME not in response.cookies
+
+    response = middleware(factory.post("/"))
+    cookie = response.cookies[replicas.PIN_COOKIE_NAME]
+    assert cookie["max-age"] == 10
+
+    request = factory.get("/")
+    request.COOKIES[replicas.PIN_COOKIE_NAME] = "1"
+    response = middleware(request)
+    assert response.content == b"default"
+    # Reads alone leave the window to expire
+    assert replicas.PIN_COOKIE_NAME not in response.cookies
+
+
+def test_inventory_replicas_pin_cookie_async(router):
+    async def view(request):
+        if request.method == "POST":
+            # Routed in the database thread, as an ORM write would be
+            await sync_to_async(router.db_for_write)(models.Product)
+        return HttpResponse(router.db_for_read(models.Category))
+
+    middleware = replicas.ReplicaPinMiddleware(view)
+    # Kept on the event loop rather than adapted to sync
+    assert asyncio.iscoroutinefunction(middleware)
+    factory = RequestFactory()
+
+    response = asyncio.run(middleware(factory.get("/")))
+    assert response.content.startswith(b"replica")
+    assert replicas.PIN_COOKIE_NAME not in response.cookies
+
+    response = asyncio.run(middleware(factory.post("/")))
+    assert response.content == b"default"
+    assert response.cookies[replicas.PIN_COOKIE_NAME]["max-age"] == 10
+
+
+def test_inventory_replicas_copy(router, tmp_path):
+    source, target = tmp_path / "db.sqlite3", tmp_path / "replica.sqlite3"
+    with sqlite3.connect(source) as connection:
+        connection.execute("CREATE TABLE item (name TEXT)")
+        connection.execute("INSERT INTO item VALUES ('boots')")
+    connection.close()
+
+    assert replicas.copy_database(source, target) > 0
+    copy = sqlite3.connect(target)
+    assert copy.execute("SELECT name FROM item").fetchall() == [("boots",)]
+    copy.close()
+    with pytest.raises(ValueError):
+        replicas.refresh(["default"])
@@ -0,0 +1,48 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test.utils import CaptureQueriesContext
+
+from market.inventory import sqlite
+
+
+def test_inventory_sqlite_pragmas_on_connect(db, settings, tmp_path):
+    settings.SQLITE_PRAGMAS = {**sqlite.DEFAULT_PRAGMAS, "cache_size": -1000}
+    file_connection = DatabaseWrapper(
+        {**connection.settings_dict, "NAME": str(tmp_path / "db.sqlite3")}
+    )
+    try:
+        values = sqlite.read_pragmas(file_connection)
+        with pytest.raises(ValueError):
+            sqlite.apply_pragmas(
+                file_connection.connection, {"cache_size": "1; DROP TABLE x"}
+            )
+    finally:
+        file_connection.close()
+    # synchronous NORMAL is 1, temp_store MEMORY is 2
+    assert values == {
+        "busy_timeout": 5000,
+        "journal_mode": "wal",
+        "synchronous": 1,
+        "cache_size": -1000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": 2,
+    }
+
+
+def test_inventory_sqlite_transaction_mode(transactional_db):
+    with CaptureQueriesContext(connection) as queries:
+        with transaction.atomic():
+            pass
+    assert queries[0]["sql"] == "BEGIN IMMEDIATE"
+
+
+def test_inventory_sqlite_maintenance_command(db):
+    out = io.StringIO()
+    call_command("sqlite-maintenance", "--show", stdout=out)
+    assert "busy_timeout: 5000" in out.getvalue()
+    # The in-memory test database has no WAL
+    assert "no WAL to checkpoint (journal_mode=memory)" in out.getvalue()
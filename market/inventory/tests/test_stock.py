@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from market.inventory import models, read_model, stock
+
+
+@pytest.fixture
+def stocked_items(db, stock_factory):
+    # StockFactory hardcodes units=2; give each item a different level.
+    return [
+        stock_factory.create(units=units, units_sold=0).product_inventory_id
+        for units in (5, 3, 1)
+    ]
+
+
+def stock_levels(pk):
+    """Units, reserved and sold once the ledger is compacted"""
+    stock.compact()
+    return (
+        models.Stock.objects.filter(product_inventory_id=pk)
+        .values_list("units", "units_reserved", "units_sold")
+        .get()
+    )
+
+
+def test_inventory_stock_reserve_and_commit(stocked_items):
+    first, second, third = stocked_items
+    reservation = stock.reserve({first: 2, second: 3})
+    assert stock.available_units(first) == 3
+    assert stock.available_units(second) == 0
+
+    assert stock.commit_reservation(reservation) == {first: 2, second: 3}
+    assert stock_levels(first) == (3, 0, 2)
+    assert stock_levels(second) == (0, 0, 3)
+    with pytest.raises(stock.ReservationNotFound):
+        stock.commit_reservation(reservation)
+
+
+def test_inventory_stock_reserve_all_or_nothing(stocked_items):
+    first, second, third = stocked_items
+    with pytest.raises(stock.InsufficientStock) as error:
+        stock.reserve([(first, 1), (third, 1), (third, 1)])
+    assert error.value.product_inventory_ids == [third]
+    assert stock_levels(first) == (5, 0, 0)
+    assert not models.StockReservation.objects.exists()
+
+
+def test_inventory_stock_release_and_expiry(stocked_items):
+    first, second, third = stocked_items
+    released = stock.reserve({first: 4})
+    stock.release_reservation(released)
+    assert stock.available_units(first) == 5
+
+    stock.reserve({first: 1}, ttl=60)
+    stock.reserve({first: 2, third: 1}, ttl=0)
+    later = timezone.now() + timedelta(seconds=1)
+    assert stock.release_expired(now=later) == 3
+    assert stock_levels(first) == (5, 1, 0)
+    assert stock_levels(third) == (1, 0, 0)
+
+
+def test_inventory_stock_decrement_many(stocked_items):
+    first, second, third = stocked_items
+    stock.reserve({second: 2})
+    stock.decrement_many({first: 5, second: 1, third: 1}, chunk_size=2)
+    assert stock_levels(first) == (0, 0, 5)
+    assert stock_levels(second) == (2, 2, 1)
+
+    with pytest.raises(stock.InsufficientStock) as error:
+        # Only one unit of the second item is unreserved.
+        stock.decrement_many({second: 1, first: 1}, chunk_size=1)
+    assert error.value.product_inventory_ids == [first]
+    assert stock_levels(second) == (2, 2, 1)
+
+
+def test_inventory_stock_ledger(stocked_items, django_assert_num_queries):
+    first, second, third = stocked_items
+    read_model.refresh(stocked_items)
+    stock.decrement_many({first: 2, second: 1}, reference="order-1")
+    stock.record({third: 4}, models.StockMovement.Reason.RESTOCK)
+    stock.record([(first, 1)], models.StockMovement.Reason.RETURN)
+    # The sales are still pending, but already unavailable
+    assert models.Stock.objects.get(product_inventory_id=first).units == 5
+    assert stock.available_units(first) == 4
+    assert stock.available_units(third) == 5
+    # The read model catches up on compaction
+    assert models.ProductReadModel.objects.get(pk=first).units == 5
+    with pytest.raises(stock.InsufficientStock):
+        stock.decrement_many({third: 6})
+    with pytest.raises(stock.InsufficientStock):
+        stock.reserve({first: 5})
+
+    with django_assert_num_queries(18):
+        # Two batches of savepoint, SELECT, Stock rows, UPDATE Stock, mark
+        # compacted, three read model UPDATEs, release
+        assert stock.compact(batch_size=3) == 4
+    assert stock.compact() == 0
+    assert models.ProductReadModel.objects.get(pk=first).units == 4
+    assert models.ProductReadModel.objects.get(pk=third).units == 5
+    assert stock_levels(first) == (4, 0, 1)
+    assert stock_levels(second) == (2, 0, 1)
+    assert stock_levels(third) == (5, 0, 0)
+    # The movements stay as the audit trail
+    assert list(
+        models.StockMovement.objects.filter(product_inventory_id=first)
+        .order_by("pk")
+        .values_list("delta", "reason", "reference")
+    ) == [(-2, "sale", "order-1"), (1, "return", "")]
+    assert not models.StockMovement.objects.pending().exists()
+
+
+def test_inventory_stock_record_checks(stocked_items):
+    first, second, third = stocked_items
+    with pytest.raises(ValueError):
+        stock.record({first: -1}, models.StockMovement.Reason.SALE)
+    with pytest.raises(ValueError):
+        stock.record({first: 2, second: 0}, "restock")
+    with pytest.raises(ValueError):
+        stock.record({first: 1}, "gift")
+    assert not models.StockMovement.objects.exists()
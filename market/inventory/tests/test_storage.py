@@ -0,0 +1,54 @@
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management import call_command
+
+from market.inventory import models
+from market.inventory.storage import is_hashed
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+def test_inventory_storage_deduplicates_sharded_names(media_root):
+    first = default_storage.save("images/a.PNG", ContentFile(b"pixels"))
+    second = default_storage.save("images/b.png", ContentFile(b"pixels"))
+    other = default_storage.save("images/a.png", ContentFile(b"other"))
+
+    assert first == second != other
+    assert is_hashed(first)
+    directory, shard_1, shard_2, basename = first.split("/")
+    assert directory == "images"
+    assert basename.startswith(shard_1 + shard_2)
+    assert basename.endswith(".png")
+    assert len(list(media_root.rglob("*.png"))) == 2
+
+
+def test_inventory_storage_migrate_command(
+    db, media_root, media_factory, brand_factory
+):
+    legacy = FileSystemStorage()
+    legacy.save("images/default.png", ContentFile(b"default"))
+    legacy.save("images/copy.png", ContentFile(b"default"))
+    media = media_factory.create_batch(3)
+    brand = brand_factory.create(image="images/copy.png")
+    lost = media_factory.create(image="images/lost.png")
+
+    call_command("migrate-image-storage", "--dry-run")
+    assert models.Media.objects.filter(image="images/default.png").count() == 3
+
+    call_command("migrate-image-storage", "--delete-originals")
+    names = {
+        row.image.name
+        for row in models.Media.objects.filter(pk__in=[m.pk for m in media])
+    }
+    brand.refresh_from_db()
+    assert names == {brand.image.name}
+    assert is_hashed(brand.image.name)
+    assert not legacy.exists("images/default.png")
+    assert default_storage.open(brand.image.name).read() == b"default"
+    lost.refresh_from_db()
+    assert lost.image.name == "images/lost.png"
@@ -0,0 +1,126 @@
+from decimal import Decimal
+
+import pytest
+
+from market.inventory import models
+from market.inventory.category_tree import invalidate_category_tree
+from market.inventory.pagination import InvalidCursor
+
+
+@pytest.fixture
+def subtree_listing_data(db, category_factory, product_inventory_factory):
+    fashion = category_factory.create(name="fashion", slug="fashion")
+    shoes = category_factory.create(name="shoes", slug="shoes", parent=fashion)
+    boots = category_factory.create(name="boots", slug="boots", parent=shoes)
+    sport = category_factory.create(name="sport", slug="sport")
+
+    items = []
+    for n, category in enumerate([shoes, boots, boots, fashion, shoes, sport]):
+        item = product_inventory_factory.create(
+            product__name="product_%d" % (n % 3),
+            sale_price=Decimal(10 + n % 4),
+        )
+        item.product.category.add(category)
+        items.append(item)
+    # The same product linked twice inside the subtree is listed once.
+    items[1].product.category.add(shoes)
+    # Inactive items are never listed.
+    inactive = product_inventory_factory.create(is_active=False)
+    inactive.product.category.add(shoes)
+    # Test transactions never commit, so refresh the tree snapshot here.
+    invalidate_category_tree()
+    return fashion, shoes, boots, items
+
+
+def all_pages(category, order, page_size):
+    ids, cursor = [], None
+    while True:
+        page = models.ProductInventory.objects.subtree_listing(
+            category, order=order, cursor=cursor, page_size=page_size
+        )
+        ids += [item.id for item in page]
+        if not page.has_next:
+            return ids
+        cursor = page.next_cursor
+
+
+@pytest.mark.parametrize(
+    "order, sort_key",
+    [
+        ("sale_price", lambda i: (i.sale_price, i.id)),
+        ("-sale_price", lambda i: (-i.sale_price, -i.id)),
+        ("name", lambda i: (i.product.name, i.id)),
+        ("-created_at", lambda i: (-i.created_at.timestamp(), -i.id)),
+    ],
+)
+def test_inventory_subtree_listing_pages(
+    subtree_listing_data, order, sort_key
+):
+    fashion, shoes, boots, items = subtree_listing_data
+    expected = [item.id for item in sorted(items[:5], key=sort_key)]
+    assert all_pages(fashion, order, page_size=2) == expected
+    assert all_pages(shoes.id, order, page_size=4) == [
+        pk for pk in expected if pk != items[3].id
+    ]
+
+
+def test_inventory_subtree_listing_single_query(
+    subtree_listing_data, django_assert_num_queries
+):
+    fashion, shoes, boots, items = subtree_listing_data
+    page = models.ProductInventory.objects.subtree_listing(
+        fashion, order="name", page_size=2
+    )
+    with django_assert_num_queries(1):
+        page = models.ProductInventory.objects.subtree_listing(
+            fashion, order="name", cursor=page.next_cursor, page_size=2
+        )
+        [item.product.name for item in page]
+
+
+def test_inventory_subtree_listing_invalid_cursor(subtree_listing_data):
+    fashion, shoes, boots, items = subtree_listing_data
+    page = models.ProductInventory.objects.subtree_listing(
+        fashion, order="name", page_size=1
+    )
+    with pytest.raises(InvalidCursor):
+        models.ProductInventory.objects.subtree_listing(
+            fashion, order="sale_price", cursor=page.next_cursor
+        )
+    with pytest.raises(InvalidCursor):
+        models.ProductInventory.objects.subtree_listing(
+            fashion, cursor="not-a-cursor"
+        )
+
+
+def test_inventory_subtree_listing_name_follows_renames(
+    subtree_listing_data,
+):
+    fashion, shoes, boots, items = subtree_listing_data
+    product = models.Product.objects.get(pk=items[0].product_id)
+    product.name = "a renamed product"
+    product.save()
+    page = models.ProductInventory.objects.subtree_listing(
+        fashion, order="name", page_size=1
+    )
+    assert [item.pk for item in page] == [items[0].pk]
+
+    # Queryset updates bypass save(); the bulk loaders copy names over
+    models.Product.objects.filter(pk=product.pk).update(name="z")
+    assert models.ProductInventory.objects.sync_product_names() == 7
+    page = models.ProductInventory.objects.subtree_listing(
+        fashion, order="-name", page_size=1
+    )
+    assert [item.pk for item in page] == [items[0].pk]
+
+
+def test_inventory_subtree_listing_name_seeks_on_index(subtree_listing_data):
+    fashion, shoes, boots, items = subtree_listing_data
+    page = models.ProductInventory.objects.subtree_listing(
+        fashion, order="name", page_size=1
+    )
+    plan = models.ProductInventory.objects.subtree_keyset(
+        fashion, order="name", cursor=page.next_cursor
+    ).explain()
+    assert "USING INDEX inventory_name_idx (product_name>?)" in plan
+    assert "TEMP B-TREE" not in plan
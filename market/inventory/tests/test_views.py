@@ -0,0 +1,120 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
+
+from market.inventory import models
+from market.inventory.category_tree import invalidate_category_tree
+
+
+@pytest.fixture
+def catalog_item(
+    db,
+    category_factory,
+    product_inventory_factory,
+    media_factory,
+    stock_factory,
+    product_attribute_value_factory,
+):
+    shoes = category_factory.create(name="shoes", slug="shoes")
+    boots = category_factory.create(name="boots", slug="boots", parent=shoes)
+    item = product_inventory_factory.create(product__web_id="boot-1")
+    item.product.category.add(boots)
+    product_inventory_factory.create(product=item.product, is_active=False)
+    media_factory.create(product_inventory=item, is_featured=False)
+    media_factory.create(product_inventory=item, image="images/boot.png")
+    stock_factory.create(product_inventory=item, units=5, units_reserved=2)
+    value = product_attribute_value_factory.create(
+        attribute_value="42", product_attribute__name="size"
+    )
+    models.ProductAttributeLists.objects.create(
+        attributevalues=value, productinventory=item
+    )
+    invalidate_category_tree()
+    return item
+
+
+def test_inventory_views_product_detail(client, catalog_item):
+    response = client.get(
+        reverse("inventory:product-detail", kwargs={"web_id": "boot-1"})
+    )
+    assert response.status_code == 200
+    [item] = response.json()["items"]
+    assert item["sku"] == catalog_item.sku
+    assert item["available"] == 3
+    assert item["attributes"] == {"size": "42"}
+    assert [image["image"] for image in item["images"]][0] == (
+        "images/boot.png"
+    )
+    assert response.json()["categories"][0]["slug"] == "boots"
+    # Renditions not generated yet are rendered on first request
+    thumbnail = item["images"][0]["renditions"]["thumbnail"]
+    assert thumbnail["url"].startswith("/api/catalog/media/")
+
+    missing = reverse("inventory:product-detail", kwargs={"web_id": "nope"})
+    assert client.get(missing).status_code == 404
+
+
+def test_inventory_views_category_listing(client, catalog_item):
+    url = reverse("inventory:category-listing", kwargs={"path": "shoes"})
+    data = client.get(url).json()
+    assert [item["sku"] for item in data["items"]] == [catalog_item.sku]
+    assert data["next_cursor"] is None
+    assert client.get(url + "?order=colour").status_code == 400
+    assert client.get(url + "?cursor=junk").status_code == 400
+    missing = reverse("inventory:category-listing", kwargs={"path": "x/y"})
+    assert client.get(missing).status_code == 404
+
+
+def test_inventory_views_stock_availability_asgi(catalog_item):
+    async def fetch():
+        return await AsyncClient().get(
+            reverse("inventory:stock-availability"),
+            {"sku": [catalog_item.sku, "unknown"]},
+        )
+
+    response = async_to_sync(fetch)()
+    assert response.json()["stock"] == {
+        catalog_item.sku: {"available": 3, "in_stock": True},
+        "unknown": {"available": 0, "in_stock": False},
+    }
+    # The async middleware chain measured the request too
+    assert response["Server-Timing"].startswith("db;dur=")
+
+
+def test_inventory_views_product_detail_conditional(client, catalog_item):
+    url = reverse("inventory:product-detail", kwargs={"web_id": "boot-1"})
+    response = client.get(url)
+    etag = response["ETag"]
+    not_modified = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert not_modified.status_code == 304
+    assert not_modified["ETag"] == etag
+    # Stock and links have no timestamp, so dates alone prove nothing
+    assert not response.has_header("Last-Modified")
+    assert (
+        client.get(
+            url, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT"
+        ).status_code
+        == 200
+    )
+
+    # Stock changes leave no timestamp but still change the ETag
+    models.Stock.objects.filter(product_inventory=catalog_item).update(units=4)
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()["items"][0]["available"] == 2
+    assert response["ETag"] != etag
+
+
+def test_inventory_views_category_listing_conditional(
+    client, catalog_item, product_inventory_factory
+):
+    url = reverse("inventory:category-listing", kwargs={"path": "shoes"})
+    etag = client.get(url)["ETag"]
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    item = product_inventory_factory.create()
+    item.product.category.add(catalog_item.product.category.get())
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 2
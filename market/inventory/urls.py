@@ -0,0 +1,26 @@
+from django.urls import path
+
+from market.inventory import views
+
+app_name = "inventory"
+
+urlpatterns = [
+    path(
+        "products/<str:web_id>/",
+        views.product_detail,
+        name="product-detail",
+    ),
+    path(
+        "categories/<path:path>/",
+        views.category_listing,
+        name="category-listing",
+    ),
+    path("stock/", views.stock_availability, name="stock-availability"),
+    path("prices/", views.price_update, name="price-update"),
+    path("export/", views.catalog_export, name="catalog-export"),
+    path(
+        "media/<int:pk>/<str:rendition>/",
+        views.media_rendition,
+        name="media-rendition",
+    ),
+]
@@ -1,3 +1,388 @@
-from django.shortcuts import render
+"""Async JSON catalog endpoints.
 
-# Create your views here.
+The views run on the event loop under ASGI, so a request waiting on the
+database does not hold a worker thread. Django 4.1 still runs every
+async ORM call on the request's one database thread, one after another,
+so starting independent queries together would not overlap them: a
+product's variants, stock, images, attributes and categories are read
+in a single sync_to_async() call, one hop to that thread instead of
+five.
+
+Product and listing responses carry an ETag from a single aggregate
+query (see market.inventory.conditional) and answer 304 before building
+the payload when the client is current.
+
+Bulk endpoints (price_update, catalog_export) are plain views: they
+stream a request or response body through long running queries, which
+run in a thread either way.
+"""
+from asgiref.sync import sync_to_async
+from django.core.files.storage import default_storage
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum
+from django.http import (
+    Http404,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.views.decorators.http import require_GET, require_POST
+
+from market.inventory import export, pricing, renditions
+from market.inventory.category_tree import get_category_tree
+from market.inventory.conditional import Validators, make_etag
+from market.inventory.models import (
+    Media,
+    Product,
+    ProductAttributeLists,
+    ProductInventory,
+    Stock,
+)
+from market.inventory.pagination import (
+    DEFAULT_PAGE_SIZE,
+    InvalidCursor,
+    keyset_page,
+    page_window,
+)
+from market.inventory.stock import available as stock_available
+
+# Most SKUs a single stock request may ask for
+MAX_STOCK_SKUS = 100
+
+
+async def alist(queryset):
+    return [row async for row in queryset]
+
+
+def item_json(item):
+    return {
+        "sku": item.sku,
+        "upc": item.upc,
+        "brand": item.brand.name,
+        "product_type": item.product_type.name,
+        "retail_price": item.retail_price,
+        "store_price": item.store_price,
+        "sale_price": item.sale_price,
+        "weight": item.weight,
+    }
+
+
+def rollup(queryset, group, aggregate):
+    """A subquery computing one aggregate over the rows of queryset"""
+    return Subquery(
+        queryset.order_by()
+        .values(group)
+        .annotate(value=aggregate)
+        .values("value")
+    )
+
+
+def with_validator_state(products):
+    """Annotate everything a product response depends on: timestamps,
+    plus counts and checksums for changes that leave no timestamp"""
+    product = OuterRef("pk")
+    items = ProductInventory.objects.filter(product=product)
+    media = Media.objects.filter(product_inventory__product=product)
+    stock = Stock.objects.filter(product_inventory__product=product)
+    links = ProductAttributeLists.objects.filter(
+        productinventory__product=product
+    )
+    categories = Product.category.through.objects.filter(product=product)
+    return products.annotate(
+        items_updated=rollup(items, "product", Max("updated_at")),
+        items_count=rollup(items, "product", Count("pk")),
+        media_updated=rollup(
+            media, "product_inventory__product", Max("updated_at")
+        ),
+        media_count=rollup(media, "product_inventory__product", Count("pk")),
+        stock_checksum=rollup(
+            stock,
+            "product_inventory__product",
+            Sum(stock_available() * F("product_inventory_id")),
+        ),
+        attributes_checksum=rollup(
+            links,
+            "productinventory__product",
+            Sum(F("attributevalues_id") * F("productinventory_id")),
+        ),
+        categories_checksum=rollup(categories, "product", Sum("category_id")),
+    )
+
+
+def product_validators(product):
+    return Validators(
+        make_etag(
+            product.pk,
+            product.updated_at,
+            product.items_updated,
+            product.items_count,
+            product.media_updated,
+            product.media_count,
+            product.stock_checksum,
+            product.attributes_checksum,
+            product.categories_checksum,
+        )
+    )
+
+
+def product_parts(product):
+    """The variants, stock, images, attributes and categories of a
+    product, as lists"""
+    return (
+        list(
+            ProductInventory.objects.filter(product=product, is_active=True)
+            .select_related("brand", "product_type")
+            .order_by("pk")
+        ),
+        list(
+            Stock.objects.filter(
+                product_inventory__product=product
+            ).values_list("product_inventory_id", stock_available())
+        ),
+        list(
+            Media.objects.filter(product_inventory__product=product)
+            .order_by("-is_featured", "pk")
+            .values(
+                "id",
+                "product_inventory_id",
+                "image",
+                "alt_text",
+                "is_featured",
+                "width",
+                "height",
+                "renditions",
+            )
+        ),
+        list(
+            ProductAttributeLists.objects.filter(
+                productinventory__product=product
+            ).values_list(
+                "productinventory_id",
+                "attributevalues__product_attribute__name",
+                "attributevalues__attribute_value",
+            )
+        ),
+        list(product.category.values("id", "name", "slug")),
+    )
+
+
+async def product_detail(request, web_id):
+    """An active product with its active variants, their stock, images
+    and attributes"""
+    try:
+        product = await with_validator_state(Product.objects.active()).aget(
+            web_id=web_id
+        )
+    except Product.DoesNotExist:
+        raise Http404("No such product")
+    validators = product_validators(product)
+    not_modified = validators.not_modified(request)
+    if not_modified is not None:
+        return not_modified
+
+    items, stock, media, attributes, categories = await sync_to_async(
+        product_parts
+    )(product)
+
+    available = dict(stock)
+    images, item_attributes = {}, {}
+    for row in media:
+        images.setdefault(row["product_inventory_id"], []).append(
+            {
+                "image": row["image"],
+                "alt_text": row["alt_text"],
+                "is_featured": row["is_featured"],
+                "width": row["width"],
+                "height": row["height"],
+                "renditions": renditions.image_json(row),
+            }
+        )
+    for item_id, name, value in attributes:
+        item_attributes.setdefault(item_id, {})[name] = value
+    return validators.apply(
+        JsonResponse(
+            {
+                "web_id": product.web_id,
+                "slug": product.slug,
+                "name": product.name,
+                "description": product.description,
+                "categories": categories,
+                "items": [
+                    dict(
+                        item_json(item),
+                        available=max(available.get(item.pk, 0), 0),
+                        images=images.get(item.pk, []),
+                        attributes=item_attributes.get(item.pk, {}),
+                    )
+                    for item in items
+                ],
+            }
+        )
+    )
+
+
+async def category_listing(request, path):
+    """One keyset page of the active items under a category, addressed
+    by its slug path; ?order=, ?cursor= and ?page_size= as accepted by
+    ProductInventoryQuerySet.subtree_listing()"""
+    tree = await sync_to_async(get_category_tree)()
+    try:
+        category = tree.get_by_path(path.strip("/"))
+    except KeyError:
+        raise Http404("No such category")
+    if not category.is_active:
+        raise Http404("No such category")
+    order = request.GET.get("order", "-created_at")
+    try:
+        page_size = int(request.GET.get("page_size", DEFAULT_PAGE_SIZE))
+        keyset = ProductInventory.objects.subtree_keyset(
+            category, order=order, cursor=request.GET.get("cursor")
+        )
+    except (InvalidCursor, ValueError) as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    state = await page_window(keyset, page_size).aaggregate(
+        updated=Max("updated_at"),
+        product_updated=Max("product__updated_at"),
+        count=Count("pk"),
+        checksum=Sum("pk"),
+    )
+    validators = Validators(make_etag(category.path, *state.values()))
+    not_modified = validators.not_modified(request)
+    if not_modified is not None:
+        return not_modified
+
+    page = await sync_to_async(keyset_page)(keyset, order, page_size)
+    return validators.apply(
+        JsonResponse(
+            {
+                "category": {"id": category.id, "path": category.path},
+                "items": [
+                    {
+                        "sku": item.sku,
+                        "web_id": item.product.web_id,
+                        "name": item.product.name,
+                        "sale_price": item.sale_price,
+                        "created_at": item.created_at,
+                    }
+                    for item in page
+                ],
+                "next_cursor": page.next_cursor,
+            }
+        )
+    )
+
+
+async def stock_availability(request):
+    """Available units of up to MAX_STOCK_SKUS items, ?sku=a&sku=b"""
+    skus = request.GET.getlist("sku")[:MAX_STOCK_SKUS]
+    rows = await alist(
+        Stock.objects.filter(product_inventory__sku__in=skus).values_list(
+            "product_inventory__sku", stock_available()
+        )
+    )
+    available = {sku: max(units, 0) for sku, units in rows}
+    return JsonResponse(
+        {
+            "stock": {
+                sku: {
+                    "available": available.get(sku, 0),
+                    "in_stock": available.get(sku, 0) > 0,
+                }
+                for sku in skus
+            }
+        }
+    )
+
+
+async def media_rendition(request, pk, rendition):
+    """Redirect to one rendition of a product image, rendering the
+    image's renditions first if they are missing or stale"""
+    if rendition not in renditions.RENDITIONS:
+        raise Http404("No such rendition")
+    try:
+        media = await Media.objects.aget(pk=pk)
+    except Media.DoesNotExist:
+        raise Http404("No such image")
+    name = media.image.name
+    if not renditions.is_current(name, media.renditions):
+        if not await sync_to_async(renditions.refresh)(media):
+            # Unreadable original: serve it as it is
+            return HttpResponseRedirect(default_storage.url(name))
+    return HttpResponseRedirect(
+        default_storage.url(media.renditions[rendition]["name"])
+    )
+
+
+# Content types accepted by price_update
+PRICE_FORMATS = {
+    "text/csv": "csv",
+    "application/jsonl": "jsonl",
+    "application/x-ndjson": "jsonl",
+}
+# Price changes listed in a dry run response
+MAX_DIFF_LINES = 1000
+
+
+@require_POST
+def price_update(request):
+    """Reprice items from a CSV or JSONL request body, see
+    market.inventory.pricing; ?dry_run=1 only reports the changes and
+    ?skip_invalid=1 applies the valid records of a partly bad file"""
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Staff only"}, status=403)
+    format = PRICE_FORMATS.get(request.content_type)
+    if format is None:
+        return JsonResponse(
+            {"error": "Send one of " + ", ".join(PRICE_FORMATS)}, status=415
+        )
+    dry_run = request.GET.get("dry_run") == "1"
+    changes = []
+
+    def diff(sku, field, old, new):
+        if len(changes) < MAX_DIFF_LINES:
+            changes.append(
+                {"sku": sku, "field": field, "old": old, "new": new}
+            )
+
+    try:
+        report = pricing.update_prices_from(
+            request,
+            format,
+            dry_run=dry_run,
+            skip_invalid=request.GET.get("skip_invalid") == "1",
+            diff=diff if dry_run else None,
+        )
+    except pricing.PriceUpdateError as e:
+        return JsonResponse(e.report.as_dict(), status=400)
+    data = report.as_dict()
+    if dry_run:
+        data["changes"] = changes
+    return JsonResponse(data)
+
+
+@require_GET
+def catalog_export(request):
+    """The whole catalog as a streamed CSV or JSONL download, see
+    market.inventory.export; ?format=csv|jsonl, ?gzip=1, ?active=1"""
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Staff only"}, status=403)
+    format = request.GET.get("format", "csv")
+    if format not in export.FORMATS:
+        return JsonResponse(
+            {"error": "Format must be one of " + ", ".join(export.FORMATS)},
+            status=400,
+        )
+    gzip = request.GET.get("gzip") == "1"
+    filename = "catalog.%s%s" % (format, ".gz" if gzip else "")
+    response = StreamingHttpResponse(
+        export.off_event_loop(
+            export.export(
+                format,
+                gzip=gzip,
+                active_only=request.GET.get("active") == "1",
+            )
+        ),
+        content_type="application/gzip" if gzip else export.FORMATS[format],
+    )
+    response["Content-Disposition"] = 'attachment; filename="%s"' % filename
+    return response
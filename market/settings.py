@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,8 +47,13 @@ INSTALLED_APPS = [
     # External apps
     "mptt",
 ]
+# Benchmark commands, for development only
+if DEBUG or os.environ.get("MARKET_BENCHMARKS"):
+    INSTALLED_APPS.append("market.benchmarks")
 
 MIDDLEWARE = [
+    "market.inventory.instrumentation.QueryCountMiddleware",
+    "market.inventory.replicas.ReplicaPinMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -57,6 +63,10 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Share of requests whose SQL is measured, see market.inventory.instrumentation
+SQL_INSTRUMENTATION_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+SQL_N_PLUS_ONE_THRESHOLD = 5
+
 ROOT_URLCONF = "market.urls"
 
 TEMPLATES = [
@@ -85,9 +95,40 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Keep connections, and the pragmas set on them, across requests
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Applied to every new SQLite connection, see market.inventory.sqlite
+SQLITE_PRAGMAS = {
+    "busy_timeout": 5000,
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "cache_size": -64000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "memory",
+}
+SQLITE_TRANSACTION_MODE = "IMMEDIATE"
+
+# Catalog reads go to these aliases, see market.inventory.replicas.
+# MARKET_SQLITE_REPLICAS=2 adds two local SQLite copies of the primary,
+# kept current with the refresh-replicas command.
+DATABASE_REPLICAS = []
+for n in range(1, int(os.environ.get("MARKET_SQLITE_REPLICAS", 0)) + 1):
+    DATABASES["replica%d" % n] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / ("db.replica%d.sqlite3" % n),
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append("replica%d" % n)
+DATABASE_ROUTERS = ["market.inventory.replicas.ReplicaRouter"]
+# After writing, a user reads from the primary for this many seconds
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -125,6 +166,21 @@ USE_I18N = True
 
 STATIC_URL = "static/"
 
+MEDIA_URL = "media/"
+MEDIA_ROOT = BASE_DIR / "media"
+# Uploads are named by content hash and sharded, see
+# market.inventory.storage; migrate-image-storage moves older files
+DEFAULT_FILE_STORAGE = "market.inventory.storage.ContentAddressedStorage"
+
+# Render missing image renditions on first request, see
+# market.inventory.renditions; generate-renditions backfills them
+IMAGE_RENDITIONS_LAZY = True
+
+# Keep exact sets of every sku, upc and web_id next to their Bloom
+# filters, see market.inventory.identifiers; False saves memory in
+# processes that rarely classify and lets the database settle matches
+IDENTIFIER_INDEX_EXACT = True
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -7,6 +7,27 @@ fake = Faker()
 
 from market.inventory import models
 
+# Parents shared by the rows of a bulk batch, see create_bulk().
+DEFAULT_POOL_SIZE = 50
+BULK_BATCH_SIZE = 1000
+
+
+class BulkFactoryMixin:
+    """Bulk generation for large test and load datasets.
+
+    Instances are built in memory with the factory's declarations and
+    saved with one bulk_create per batch instead of one INSERT each.
+    Like every bulk_create no save signals are sent, so snapshots such
+    as the facet engine and the read model are not updated.
+    """
+
+    @classmethod
+    def bulk_create_batch(cls, size, **kwargs):
+        """Build ``size`` instances and save them with bulk_create"""
+        objs = cls.build_batch(size, **kwargs)
+        manager = cls._get_manager(cls._meta.model)
+        return manager.bulk_create(objs, batch_size=BULK_BATCH_SIZE)
+
 
 class CategoryFactory(factory.django.DjangoModelFactory):
     class Meta:
@@ -16,7 +37,7 @@ class CategoryFactory(factory.django.DjangoModelFactory):
     slug = fake.lexify(text="cat_slug_??????")
 
 
-class ProductFactory(factory.django.DjangoModelFactory):
+class ProductFactory(BulkFactoryMixin, factory.django.DjangoModelFactory):
     class Meta:
         model = models.Product
 
@@ -38,22 +59,40 @@ class ProductFactory(factory.django.DjangoModelFactory):
             for cat in extracted:
                 self.category.add(cat)
 
-
-class ProductTypeFactory(factory.django.DjangoModelFactory):
+    @classmethod
+    def bulk_create_batch(cls, size, category=(), **kwargs):
+        # post_generation does not run for built instances, so the
+        # categories are linked with one bulk insert into the M2M table.
+        products = super().bulk_create_batch(size, **kwargs)
+        through = models.Product.category.through
+        through.objects.bulk_create(
+            [
+                through(product_id=product.pk, category_id=cat.pk)
+                for product in products
+                for cat in category
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        return products
+
+
+class ProductTypeFactory(BulkFactoryMixin, factory.django.DjangoModelFactory):
     class Meta:
         model = models.ProductType
 
     name = factory.Sequence(lambda n: "type_%d" % n)
 
 
-class BrandFactory(factory.django.DjangoModelFactory):
+class BrandFactory(BulkFactoryMixin, factory.django.DjangoModelFactory):
     class Meta:
         model = models.Brand
 
     name = factory.Sequence(lambda n: "brand_%d" % n)
 
 
-class ProductInventoryFactory(factory.django.DjangoModelFactory):
+class ProductInventoryFactory(
+    BulkFactoryMixin, factory.django.DjangoModelFactory
+):
     class Meta:
         model = models.ProductInventory
 
@@ -61,6 +100,8 @@ class ProductInventoryFactory(factory.django.DjangoModelFactory):
     upc = factory.Sequence(lambda n: "upc_%d" % n)
     product_type = factory.SubFactory(ProductTypeFactory)
     product = factory.SubFactory(ProductFactory)
+    # Set by save(), but bulk_create_batch() skips it
+    product_name = factory.SelfAttribute("product.name")
     brand = factory.SubFactory(BrandFactory)
     is_active = 1
     retail_price = 97
@@ -68,8 +109,27 @@ class ProductInventoryFactory(factory.django.DjangoModelFactory):
     sale_price = 46
     weight = 987
 
-
-class MediaFactory(factory.django.DjangoModelFactory):
+    @classmethod
+    def create_bulk(
+        cls, size, pool_size=DEFAULT_POOL_SIZE, category=(), **kwargs
+    ):
+        """Create ``size`` items whose product, product type and brand are
+        drawn in turn from pools of ``pool_size`` bulk created parents.
+        ``category`` links every pooled product to these categories."""
+        pool_size = min(size, pool_size)
+        parents = {
+            "product": ProductFactory.bulk_create_batch(
+                pool_size, category=category
+            ),
+            "product_type": ProductTypeFactory.bulk_create_batch(pool_size),
+            "brand": BrandFactory.bulk_create_batch(pool_size),
+        }
+        for name, pool in parents.items():
+            kwargs.setdefault(name, factory.Iterator(pool))
+        return cls.bulk_create_batch(size, **kwargs)
+
+
+class MediaFactory(BulkFactoryMixin, factory.django.DjangoModelFactory):
     class Meta:
         model = models.Media
 
@@ -80,7 +140,7 @@ class MediaFactory(factory.django.DjangoModelFactory):
     is_featured = True
 
 
-class StockFactory(factory.django.DjangoModelFactory):
+class StockFactory(BulkFactoryMixin, factory.django.DjangoModelFactory):
     class Meta:
         model = models.Stock
 
@@ -90,7 +150,9 @@ class StockFactory(factory.django.DjangoModelFactory):
     units_sold = 100
 
 
-class ProductAttributeFactory(factory.django.DjangoModelFactory):
+class ProductAttributeFactory(
+    BulkFactoryMixin, factory.django.DjangoModelFactory
+):
     class Meta:
         model = models.ProductAttribute
 
@@ -98,7 +160,9 @@ class ProductAttributeFactory(factory.django.DjangoModelFactory):
     description = factory.Sequence(lambda n: "description_%d" % n)
 
 
-class ProductAttributeValueFactory(factory.django.DjangoModelFactory):
+class ProductAttributeValueFactory(
+    BulkFactoryMixin, factory.django.DjangoModelFactory
+):
     class Meta:
         model = models.ProductAttributeValue
 
@@ -106,7 +170,9 @@ class ProductAttributeValueFactory(factory.django.DjangoModelFactory):
     attribute_value = fake.lexify(text="attribute_value_??????")
 
 
-class ProductAttributeListsFactory(factory.django.DjangoModelFactory):
+class ProductAttributeListsFactory(
+    BulkFactoryMixin, factory.django.DjangoModelFactory
+):
     class Meta:
         model = models.ProductAttributeLists
 
@@ -129,6 +195,37 @@ class ProductWithAttributeListsFactory(ProductInventoryFactory):
     )
     # Adding 2 attributes to product, but could be any number of them.
 
+    @classmethod
+    def create_bulk(
+        cls, size, pool_size=DEFAULT_POOL_SIZE, attributes=2, **kwargs
+    ):
+        """Like ProductInventoryFactory.create_bulk, linking every item to
+        one value of each of ``attributes`` pooled attributes. Instead of
+        two new attribute chains per item the values come from pools of
+        ``pool_size`` values per attribute."""
+        # Providing a value skips the RelatedFactory declarations.
+        kwargs.update(attributevalues1=None, attributevalues2=None)
+        items = super().create_bulk(size, pool_size=pool_size, **kwargs)
+        values = [
+            ProductAttributeValueFactory.bulk_create_batch(
+                min(size, pool_size), product_attribute=attribute
+            )
+            for attribute in ProductAttributeFactory.bulk_create_batch(
+                attributes
+            )
+        ]
+        models.ProductAttributeLists.objects.bulk_create(
+            [
+                models.ProductAttributeLists(
+                    attributevalues=pool[n % len(pool)], productinventory=item
+                )
+                for n, item in enumerate(items)
+                for pool in values
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        return items
+
 
 register(CategoryFactory)
 register(ProductFactory)
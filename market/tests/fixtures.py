@@ -2,6 +2,8 @@ import pytest
 from django.contrib.auth.models import User
 from django.core.management import call_command
 
+from market.demo import snapshot
+
 
 @pytest.fixture
 def create_super_user(django_user_model):
@@ -12,19 +14,15 @@ def create_super_user(django_user_model):
 
 
 @pytest.fixture(scope="session")
-def django_fixture_setup(django_db_blocker, django_db_setup):
+def django_fixture_setup(pytestconfig, django_db_blocker, django_db_setup):
     """Load DB data fixtures"""
     # Unblock database access since its not allowed by default.
     with django_db_blocker.unblock():
-        # Loading fixtures with management command
-        call_command("loaddata", "db_admin_fixture.json")
-        call_command("loaddata", "db_category_fixture.json")
-        call_command("loaddata", "db_product_fixture.json")
-        call_command("loaddata", "db_type_fixture.json")
-        call_command("loaddata", "db_brand_fixture.json")
-        call_command("loaddata", "db_product_inventory_fixture.json")
-        call_command("loaddata", "db_media_fixture.json")
-        call_command("loaddata", "db_stock_fixture.json")
-        call_command("loaddata", "db_product_attribute_fixture.json")
-        call_command("loaddata", "db_product_attribute_value_fixture.json")
-        call_command("loaddata", "db_product_attribute_lists_fixture.json")
+        cache = getattr(pytestconfig, "cache", None)
+        if cache is None:
+            # Bulk loading all catalog fixtures with management command
+            call_command("load-catalog")
+            return
+        # Restore the database image saved by an earlier session, or
+        # load the fixtures and save one. See market.demo.snapshot.
+        snapshot.load_cached(cache.mkdir("catalog-snapshots"))